@@ -512,6 +512,90 @@ def test_event_endpoints(headers):
     else:
         print_error("No club ID available for event creation")
 
+def test_deletion_endpoints(leader_headers, leader_id, admin_headers):
+    """Test deleting events and clubs, and that only the club leader or admins can."""
+    print_test("Testing Deletion Endpoints")
+    
+    # A club led by the user, with one event the leader takes part in
+    club_data = {
+        "club_name": f"Deletion Club {random_string()}",
+        "description": "A club created to test deletion",
+        "leader_id": leader_id
+    }
+    response = requests.post(f"{BASE_URL}/clubs", json=club_data, headers=admin_headers)
+    if response.status_code != 200:
+        print_error("Failed to create a club for deletion tests")
+        print_response(response)
+        return
+    club_id = response.json().get("club_id")
+    
+    event_data = {
+        "event_name": f"Deletion Event {random_string()}",
+        "event_date": str(date.today() + timedelta(days=7)),
+        "club_id": club_id
+    }
+    response = requests.post(f"{BASE_URL}/events", json=event_data, headers=leader_headers)
+    if response.status_code != 200:
+        print_error("Failed to create an event for deletion tests")
+        print_response(response)
+        return
+    event_id = response.json().get("event_id")
+    requests.post(f"{BASE_URL}/event-participation", json={"user_id": leader_id, "event_id": event_id}, headers=leader_headers)
+    
+    # Someone who neither leads the club nor is an admin
+    username = f"outsider_{random_string()}"
+    outsider_data = {
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "password123",
+        "role": "student",
+        "first_name": "Out",
+        "last_name": "Sider",
+        "date_of_birth": str(date.today() - timedelta(days=365*20))
+    }
+    requests.post(f"{BASE_URL}/auth/signup", json=outsider_data)
+    response = requests.post(f"{BASE_URL}/auth/login", json={"username": username, "password": "password123"})
+    outsider_headers = {"Authorization": f"Bearer {response.json().get('auth_token')}"}
+    
+    print_test(f"DELETE /events/{event_id} - Deleting an event as an outsider")
+    response = requests.delete(f"{BASE_URL}/events/{event_id}", headers=outsider_headers)
+    print_response(response)
+    if response.status_code == 403:
+        print_success("Outsider was refused")
+    else:
+        print_error("Outsider was not refused")
+    
+    print_test(f"DELETE /events/{event_id} - Deleting an event as the club leader")
+    response = requests.delete(f"{BASE_URL}/events/{event_id}", headers=leader_headers)
+    print_info(f"Status Code: {response.status_code}")
+    if response.status_code == 204 and requests.get(f"{BASE_URL}/events/{event_id}", headers=leader_headers).status_code == 404:
+        print_success("Event deleted successfully")
+    else:
+        print_error("Failed to delete event")
+    
+    print_test(f"DELETE /events/{event_id} - Deleting the event again")
+    response = requests.delete(f"{BASE_URL}/events/{event_id}", headers=leader_headers)
+    if response.status_code == 404:
+        print_success("Deleted event is not found")
+    else:
+        print_error(f"Expected 404, got {response.status_code}")
+    
+    print_test(f"DELETE /clubs/{club_id} - Deleting a club as an outsider")
+    response = requests.delete(f"{BASE_URL}/clubs/{club_id}", headers=outsider_headers)
+    print_response(response)
+    if response.status_code == 403:
+        print_success("Outsider was refused")
+    else:
+        print_error("Outsider was not refused")
+    
+    print_test(f"DELETE /clubs/{club_id} - Deleting a club as an admin")
+    response = requests.delete(f"{BASE_URL}/clubs/{club_id}", headers=admin_headers)
+    print_info(f"Status Code: {response.status_code}")
+    if response.status_code == 204 and requests.get(f"{BASE_URL}/clubs/{club_id}", headers=admin_headers).status_code == 404:
+        print_success("Club deleted successfully")
+    else:
+        print_error("Failed to delete club")
+
 def run_all_tests():
     print_test("Starting API Tests")
     print_info("Testing against: " + BASE_URL)
@@ -534,6 +618,10 @@ def run_all_tests():
         
         # Run event tests
         test_event_endpoints(student_headers)
+        
+        # Run deletion tests; the student was made a club leader above
+        if leader_headers:
+            test_deletion_endpoints(student_headers, student_id, leader_headers)
     else:
         print_error("Authentication failed, cannot continue with other tests")
     
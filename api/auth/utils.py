@@ -1,14 +1,23 @@
 from passlib.context import CryptContext
+import hashlib
+import os
 import secrets
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from api.models.models import User
-from api.database.connection import get_db
+from api.database.connection import get_db, SessionLocal
+from api.cache import get_cache
+
+# How long a token -> user id lookup is reused; the user's current token is checked on every hit
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "600"))
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Same scheme without the automatic 401, for endpoints that also accept other credentials
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
@@ -19,11 +28,64 @@ def verify_password(plain_password, hashed_password):
 def generate_token():
     return secrets.token_urlsafe(32)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _token_key(token: str) -> str:
+    # Tokens are credentials; a shared cache only ever sees their hash
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+def user_for_token(db: Session, token: Optional[str]) -> Optional[User]:
+    """The user whose current auth token is `token`, or None."""
+    if not token:
+        return None
+    cache = get_cache("auth")
+    key = _token_key(token)
+    user_id = cache.get(key)
+    if user_id is not None:
+        # A primary-key lookup instead of a scan on auth_token
+        user = db.get(User, user_id)
+        if user and user.auth_token == token:
+            return user
     user = db.query(User).filter(User.auth_token == token).first()
+    if user:
+        cache.set(key, user.user_id, ttl=AUTH_CACHE_TTL)
+    return user
+
+def user_id_for_token(token: Optional[str]) -> Optional[int]:
+    """`user_for_token` with its own short-lived session, for middleware that runs before the endpoint."""
+    if not token:
+        return None
+    db = SessionLocal()
+    try:
+        user = user_for_token(db, token)
+        return user.user_id if user else None
+    finally:
+        db.close()
+
+def remember_token(token: str, user_id: int):
+    """Cache the lookup of a newly issued token, so its first requests need no query."""
+    get_cache("auth").set(_token_key(token), user_id, ttl=AUTH_CACHE_TTL)
+
+def cached_user_id(token: str) -> Optional[int]:
+    """The user id `token` last resolved to, from the cache only, without checking it is still current."""
+    return get_cache("auth").get(_token_key(token))
+
+def forget_token(token: Optional[str]):
+    """Drop the cached lookup of a token that is being replaced."""
+    if token:
+        get_cache("auth").delete(_token_key(token))
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = user_for_token(db, token)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token"
         )
-    return user 
\ No newline at end of file
+    return user
+
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
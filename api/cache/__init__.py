@@ -0,0 +1,49 @@
+"""
+Key-value cache with pluggable backends.
+
+CACHE_BACKEND picks where entries live:
+
+- `memory`: an LRU in each worker. No setup, but every worker warms its own
+  copy and sees only its own invalidations.
+- `sqlite` (default): a WAL-mode SQLite file at CACHE_SQLITE_PATH, shared by
+  every worker on the host. Reads cost tens of microseconds.
+- `redis`: any server speaking the Redis protocol at CACHE_URL, shared by
+  every host. `python -m api.cache.resp_server` is a stand-in for local use.
+
+Callers take a namespaced `Cache` from `get_cache()`; serialization, TTLs and
+failure handling are described in `api.cache.base`.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+from api.cache.base import Backend, Cache, CacheError
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+
+_lock = threading.Lock()
+_backend: Optional[Backend] = None
+_caches: Dict[str, Cache] = {}
+
+def create_backend(name: str = CACHE_BACKEND) -> Backend:
+    if name == "memory":
+        from api.cache.memory import MemoryBackend
+        return MemoryBackend()
+    if name == "sqlite":
+        from api.cache.sqlite import SQLiteBackend
+        return SQLiteBackend()
+    if name == "redis":
+        from api.cache.resp import RespBackend
+        return RespBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+def get_cache(namespace: str) -> Cache:
+    """The cache for `namespace`. Every namespace shares the process's one backend."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = create_backend()
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = Cache(_backend, namespace)
+        return cache
@@ -0,0 +1,170 @@
+"""
+The cache interface shared by every backend.
+
+Backends only store bytes under string keys with an absolute expiry time.
+`Cache` adds what must behave the same whichever backend is configured:
+
+- Serialization: values are encoded as JSON (`pydantic_core.to_json`), so
+  dicts, lists, strings, numbers and None round-trip exactly. Dates and
+  datetimes come back as ISO strings, and bytes must be base64-encoded by
+  the caller. Every reader gets its own copy, so mutating a cached value
+  never changes the cache.
+- TTL: every entry expires. `ttl` is in seconds, and None means
+  CACHE_DEFAULT_TTL. An expired entry is never returned, even if the
+  backend has not purged it yet.
+- Namespaces: each `Cache` prefixes its keys, so callers can share one
+  backend without colliding.
+- Tags: an entry can be stored with the generations of the tags its data
+  depends on, taken with `snapshot()` before the data was read. It is a miss
+  once any of those tags is bumped (see `api.cache.generations`).
+- Failures: reads of an unreachable backend are misses, and `set` and
+  `delete` are skipped, with a warning in both cases, so a cache outage
+  only costs speed. `add` and `incr` coordinate between requests and raise
+  CacheError instead, so their callers can decide what to do.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pydantic_core import to_json
+
+from api.cache import generations
+
+logger = logging.getLogger(__name__)
+
+CACHE_DEFAULT_TTL = float(os.environ.get("CACHE_DEFAULT_TTL", "300"))
+# Marks a tagged entry; plain entries are JSON, which never starts with this byte
+TAGGED = b"\x01"
+_MISSING = object()
+
+class CacheError(Exception):
+    pass
+
+def encode(value: Any) -> bytes:
+    return to_json(value)
+
+def decode(data: bytes) -> Any:
+    return json.loads(data)
+
+class Backend:
+    """Byte storage. `expires_at` is a `time.time()` timestamp."""
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError
+
+    def set(self, key: str, data: bytes, expires_at: float):
+        raise NotImplementedError
+
+    def add(self, key: str, data: bytes, expires_at: float) -> bool:
+        """Store only if the key is absent or expired. Returns whether it was stored."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, expires_at: float) -> int:
+        """Add one to an integer, starting from 0. The expiry only applies when the key is created."""
+        raise NotImplementedError
+
+class Cache:
+    def __init__(self, backend: Backend, namespace: str):
+        self.backend = backend
+        self.prefix = f"{namespace}:"
+
+    def _expires_at(self, ttl: Optional[float]) -> float:
+        ttl = CACHE_DEFAULT_TTL if ttl is None else ttl
+        if ttl <= 0:
+            raise ValueError("Cache entries need a positive TTL")
+        return time.time() + ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of the keys that are present; missing keys are left out."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            found = self.backend.get_many([self.prefix + key for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache read failed, treating as a miss: {e}")
+            return {}
+
+        values, tagged = {}, {}
+        for key, data in zip(keys, found):
+            if data is None:
+                continue
+            if data[:1] == TAGGED:
+                tagged[key] = decode(data[1:])
+            else:
+                values[key] = decode(data)
+        if tagged:
+            tags = {tag for recorded, _ in tagged.values() for tag in recorded}
+            try:
+                current = generations.get_generations().current(tags)
+            except Exception as e:
+                logger.warning(f"Generation read failed, treating tagged entries as misses: {e}")
+                return values
+            for key, (recorded, value) in tagged.items():
+                if all(current.get(tag) == generation for tag, generation in recorded.items()):
+                    values[key] = value
+        return values
+
+    def snapshot(self, tags: Iterable[str]) -> Optional[Dict[str, int]]:
+        """Current generations of the tags, to pass to `set()`. None if they cannot be read."""
+        try:
+            return generations.get_generations().current(tags)
+        except Exception as e:
+            logger.warning(f"Generation read failed: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Optional[Dict[str, int]] = None):
+        """Store a value. `tags` is a `snapshot()` taken before the value was read."""
+        data = encode(value) if tags is None else TAGGED + encode([tags, value])
+        try:
+            self.backend.set(self.prefix + key, data, self._expires_at(ttl))
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    def get_or_set(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None,
+                   tags: Optional[Iterable[str]] = None) -> Any:
+        """The cached value, or `compute()` stored for next time, tagged with `tags` if given."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        snapshot = None
+        if tags is not None:
+            snapshot = self.snapshot(tags)
+            if snapshot is None:
+                # Without generations the entry could not be invalidated
+                return compute()
+        value = compute()
+        self.set(key, value, ttl, tags=snapshot)
+        return value
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        try:
+            return self.backend.add(self.prefix + key, encode(value), self._expires_at(ttl))
+        except ValueError:
+            raise
+        except Exception as e:
+            raise CacheError(f"Cache add failed: {e}") from e
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed: {e}")
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        try:
+            return self.backend.incr(self.prefix + key, self._expires_at(ttl))
+        except ValueError:
+            raise
+        except Exception as e:
+            raise CacheError(f"Cache incr failed: {e}") from e
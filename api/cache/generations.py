@@ -0,0 +1,166 @@
+"""
+Generation counters for tag-based cache invalidation.
+
+Cached entries can be stored with tags such as `club:12`. Each tag has a
+generation number, and an entry records the generations of its tags when its
+data was read. Bumping a tag makes every entry recorded with an older
+generation a miss, in every worker, without finding or deleting the entries.
+
+For the memory and sqlite backends the counters live in a table of
+GENERATION_SLOTS 8-byte slots in a memory-mapped file (GENERATION_TABLE_PATH,
+under /dev/shm where available), shared by every worker on the host. Reading
+a generation is a hash and an 8-byte load from shared memory, with no lock
+and no system call. Bumps take an fcntl lock on the file. Tags are hashed to
+slots, so two tags can share a slot; a collision only causes extra misses.
+Slot 0 holds a random epoch chosen when the file is created, so entries from
+before a reset of the table can never match again.
+
+For the redis backend the counters are keys on the cache server, so a bump
+reaches every host, at the cost of one more round trip per tagged read.
+
+Bumps should happen after the change commits, or another request could cache
+the old data again in between: endpoints call `bump_on_commit()`.
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+GENERATION_TABLE_PATH = os.environ.get("GENERATION_TABLE_PATH", os.path.join(_SHM_DIR, "univibe-generations"))
+GENERATION_SLOTS = int(os.environ.get("GENERATION_SLOTS", "65536"))
+# Generation keys on a cache server outlive every entry that was recorded against them
+GENERATION_KEY_TTL = float(os.environ.get("GENERATION_KEY_TTL", str(30 * 86400)))
+EPOCH_TAG = "@epoch"
+# Tag -> slot lookups remembered per process
+SLOT_MEMO_SIZE = 100000
+
+_SLOT = struct.Struct("<Q")
+
+class SharedMemoryGenerations:
+    def __init__(self, path: str = GENERATION_TABLE_PATH, slots: int = GENERATION_SLOTS):
+        self.slots = slots
+        self._memo: Dict[str, int] = {}
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * _SLOT.size
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size < size:
+                os.ftruncate(self.fd, size)
+            self.table = mmap.mmap(self.fd, size)
+            if self._read(0) == 0:
+                self._write(0, secrets.randbits(63) or 1)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    def _slot(self, tag: str) -> int:
+        slot = self._memo.get(tag)
+        if slot is None:
+            digest = hashlib.blake2b(tag.encode(), digest_size=8).digest()
+            # Slot 0 is the epoch
+            slot = 1 + int.from_bytes(digest, "little") % (self.slots - 1)
+            if len(self._memo) >= SLOT_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[tag] = slot
+        return slot
+
+    def _read(self, slot: int) -> int:
+        return _SLOT.unpack_from(self.table, slot * _SLOT.size)[0]
+
+    def _write(self, slot: int, value: int):
+        _SLOT.pack_into(self.table, slot * _SLOT.size, value)
+
+    def current(self, tags: Iterable[str]) -> Dict[str, int]:
+        generations = {tag: self._read(self._slot(tag)) for tag in tags}
+        generations[EPOCH_TAG] = self._read(0)
+        return generations
+
+    def bump(self, tags: Iterable[str]):
+        slots = {self._slot(tag) for tag in tags}
+        if not slots:
+            return
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            for slot in slots:
+                self._write(slot, self._read(slot) + 1)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+class BackendGenerations:
+    """Generations kept as keys in a cache backend shared by every host."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(tag: str) -> str:
+        return f"generation:{tag}"
+
+    def current(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        if not tags:
+            return {}
+        found = self.backend.get_many([self._key(tag) for tag in tags])
+        generations = {}
+        for tag, data in zip(tags, found):
+            if data is None:
+                # Start from a random generation, so a key that expired or was
+                # evicted never comes back with a number old entries recorded
+                self.backend.add(self._key(tag), str(secrets.randbits(48)).encode(), time.time() + GENERATION_KEY_TTL)
+                data = self.backend.get_many([self._key(tag)])[0]
+            generations[tag] = int(data)
+        return generations
+
+    def bump(self, tags: Iterable[str]):
+        for tag in set(tags):
+            self.backend.incr(self._key(tag), time.time() + GENERATION_KEY_TTL)
+
+_lock = threading.Lock()
+_generations = None
+
+def get_generations():
+    """The generation table that matches CACHE_BACKEND."""
+    global _generations
+    with _lock:
+        if _generations is None:
+            from api.cache import CACHE_BACKEND, get_cache
+            if CACHE_BACKEND == "redis":
+                _generations = BackendGenerations(get_cache("generation").backend)
+            else:
+                _generations = SharedMemoryGenerations()
+        return _generations
+
+def bump(*tags: str):
+    """Invalidate every entry cached with any of the tags, now."""
+    get_generations().bump(tags)
+
+def _bump_pending(session):
+    tags = session.info.pop("generation_tags", None)
+    if tags:
+        try:
+            bump(*tags)
+        except Exception as e:
+            # The change is committed either way; entries expire on their own
+            logger.warning(f"Generation bump for {sorted(tags)} failed: {e}")
+
+def _drop_pending(session):
+    session.info.pop("generation_tags", None)
+
+def bump_on_commit(db: Session, *tags: str):
+    """Bump the tags once the caller's transaction commits; nothing happens on rollback."""
+    db.info.setdefault("generation_tags", set()).update(tags)
+    if not event.contains(db, "after_commit", _bump_pending):
+        event.listen(db, "after_commit", _bump_pending)
+        event.listen(db, "after_rollback", _drop_pending)
@@ -0,0 +1,66 @@
+"""
+In-process LRU backend. Fastest, but private to one worker, so it suits
+data that every worker may hold its own copy of for a short TTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from api.cache.base import Backend
+
+CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+
+class MemoryBackend(Backend):
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, data: bytes, expires_at: float):
+        self._entries[key] = (data, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        with self._lock:
+            found = []
+            for key in keys:
+                entry = self._live(key, now)
+                found.append(entry[0] if entry else None)
+            return found
+
+    def set(self, key: str, data: bytes, expires_at: float):
+        with self._lock:
+            self._store(key, data, expires_at)
+
+    def add(self, key: str, data: bytes, expires_at: float) -> bool:
+        with self._lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self._store(key, data, expires_at)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str, expires_at: float) -> int:
+        with self._lock:
+            entry = self._live(key, time.time())
+            value = int(entry[0]) + 1 if entry else 1
+            self._store(key, str(value).encode(), entry[1] if entry else expires_at)
+            return value
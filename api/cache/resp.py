@@ -0,0 +1,127 @@
+"""
+Redis-protocol (RESP) backend, for a cache shared by workers on every host.
+
+A minimal client for the commands the cache needs: MGET, SET with PX and NX,
+DEL and INCR. It works against Redis, its compatible forks, or the stand-in
+in `api.cache.resp_server`. Each thread keeps its own connection; after a
+network error the connection is dropped and the next call reconnects.
+
+    CACHE_BACKEND=redis CACHE_URL=redis://cache.internal:6379/0
+"""
+import os
+import socket
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from api.cache.base import Backend
+
+CACHE_URL = os.environ.get("CACHE_URL", "redis://127.0.0.1:6379/0")
+CACHE_REDIS_TIMEOUT = float(os.environ.get("CACHE_REDIS_TIMEOUT", "0.25"))
+
+class RespError(Exception):
+    pass
+
+def pack(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+class _Connection:
+    def __init__(self, host: str, port: int, password: Optional[str], db: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.call(pack("AUTH", password))
+        if db:
+            self.call(pack("SELECT", db))
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def read(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from cache server: {line[:20]!r}")
+
+    def call(self, payload: bytes, replies: int = 1):
+        self.sock.sendall(payload)
+        error = None
+        for _ in range(replies):
+            # Read every reply, even after an error, so the next call starts in step
+            try:
+                result = self.read()
+            except RespError as e:
+                error = e
+        if error:
+            raise error
+        return result
+
+class RespBackend(Backend):
+    def __init__(self, url: str = CACHE_URL, timeout: float = CACHE_REDIS_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _call(self, payload: bytes, replies: int = 1):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _Connection(self.host, self.port, self.password, self.db, self.timeout)
+            self._local.conn = conn
+        try:
+            return conn.call(payload, replies)
+        except (OSError, ConnectionError):
+            # The stream is in an unknown state; reconnect next time
+            self._local.conn = None
+            conn.close()
+            raise
+
+    @staticmethod
+    def _ttl_ms(expires_at: float) -> int:
+        return max(1, int((expires_at - time.time()) * 1000))
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self._call(pack("MGET", *keys))
+
+    def set(self, key: str, data: bytes, expires_at: float):
+        self._call(pack("SET", key, data, "PX", self._ttl_ms(expires_at)))
+
+    def add(self, key: str, data: bytes, expires_at: float) -> bool:
+        return self._call(pack("SET", key, data, "PX", self._ttl_ms(expires_at), "NX")) is not None
+
+    def delete(self, key: str):
+        self._call(pack("DEL", key))
+
+    def incr(self, key: str, expires_at: float) -> int:
+        # INCR alone would create the key without an expiry; both go in one round trip
+        payload = pack("SET", key, 0, "PX", self._ttl_ms(expires_at), "NX") + pack("INCR", key)
+        return self._call(payload, replies=2)
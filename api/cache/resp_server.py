@@ -0,0 +1,140 @@
+"""
+Stand-in Redis-protocol server for development and tests.
+
+Implements the commands the cache backend uses (PING, AUTH, SELECT, GET,
+MGET, SET with EX/PX/NX/XX, DEL, INCR) over an in-memory dict. Keys in every
+database share one keyspace. It is single-threaded and keeps nothing on
+disk, so use a real Redis in production.
+
+    python -m api.cache.resp_server --port 6379
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from api.cache.resp import RespError
+
+logger = logging.getLogger(__name__)
+
+# key -> (value, expires at in monotonic seconds or None)
+_data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+PURGE_INTERVAL = 10
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def _get(key: bytes) -> Optional[bytes]:
+    entry = _data.get(key)
+    if entry is None:
+        return None
+    if entry[1] is not None and entry[1] <= time.monotonic():
+        del _data[key]
+        return None
+    return entry[0]
+
+def _set(args: List[bytes]):
+    key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+    expires = None
+    if b"PX" in options:
+        expires = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+    elif b"EX" in options:
+        expires = time.monotonic() + int(options[options.index(b"EX") + 1])
+    exists = _get(key) is not None
+    if (b"NX" in options and exists) or (b"XX" in options and not exists):
+        return None
+    _data[key] = (value, expires)
+    return "OK"
+
+def _incr(key: bytes):
+    current = _get(key)
+    try:
+        value = int(current or 0) + 1
+    except ValueError:
+        return RespError("ERR value is not an integer or out of range")
+    _data[key] = (str(value).encode(), _data[key][1] if current is not None else None)
+    return value
+
+def execute(args: List[bytes]):
+    command = args[0].upper()
+    if command == b"PING":
+        return "PONG"
+    if command in (b"AUTH", b"SELECT"):
+        return "OK"
+    if command == b"GET":
+        return _get(args[1])
+    if command == b"MGET":
+        return [_get(key) for key in args[1:]]
+    if command == b"SET":
+        return _set(args[1:])
+    if command == b"DEL":
+        deleted = [key for key in args[1:] if _get(key) is not None]
+        for key in deleted:
+            del _data[key]
+        return len(deleted)
+    if command == b"INCR":
+        return _incr(args[1])
+    return RespError(f"ERR unknown command '{command.decode(errors='replace')}'")
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            args = await _read_command(reader)
+            if args is None:
+                break
+            if args:
+                try:
+                    reply = execute(args)
+                except (IndexError, ValueError):
+                    reply = RespError("ERR wrong number or type of arguments")
+                writer.write(_encode(reply))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def _purge():
+    while True:
+        await asyncio.sleep(PURGE_INTERVAL)
+        for key in list(_data):
+            _get(key)
+
+async def main(host: str, port: int):
+    server = await asyncio.start_server(_serve, host, port)
+    asyncio.create_task(_purge())
+    logger.info(f"Cache stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stand-in Redis-protocol cache server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,91 @@
+"""
+SQLite-file backend shared by every worker on a host.
+
+The file is in WAL mode, so reads never wait for writers and cost about as
+much as a local syscall or two. Each thread keeps its own connection.
+Writes wait at most CACHE_SQLITE_BUSY_TIMEOUT for the lock, after which they
+fail like any other unreachable backend. Expired rows are ignored on read
+and purged every CACHE_SQLITE_PURGE_EVERY writes.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from api.cache.base import Backend
+
+CACHE_SQLITE_PATH = os.environ.get("CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "univibe-cache.db"))
+CACHE_SQLITE_BUSY_TIMEOUT = float(os.environ.get("CACHE_SQLITE_BUSY_TIMEOUT", "0.2"))
+CACHE_SQLITE_PURGE_EVERY = int(os.environ.get("CACHE_SQLITE_PURGE_EVERY", "5000"))
+# SQLite's default limit on parameters per statement is 999 in older builds
+MAX_KEYS_PER_QUERY = 500
+
+class SQLiteBackend(Backend):
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        # Not kept, so a worker forked after this never shares the connection
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=CACHE_SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, params: tuple) -> sqlite3.Cursor:
+        conn = self._conn()
+        self._writes += 1
+        if self._writes % CACHE_SQLITE_PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        return conn.execute(sql, params)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        conn = self._conn()
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), MAX_KEYS_PER_QUERY):
+            part = keys[start:start + MAX_KEYS_PER_QUERY]
+            placeholders = ",".join("?" * len(part))
+            found.update(conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND expires > ?", (*part, now)
+            ))
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, data: bytes, expires_at: float):
+        self._write("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, data, expires_at))
+
+    def add(self, key: str, data: bytes, expires_at: float) -> bool:
+        # Replaces only an expired row, atomically
+        cursor = self._write(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (key, data, expires_at, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._write("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str, expires_at: float) -> int:
+        now = time.time()
+        rows = self._write(
+            "INSERT INTO cache (key, value, expires) VALUES (?, CAST('1' AS BLOB), ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN cache.expires <= ? THEN CAST('1' AS BLOB) ELSE CAST(CAST(cache.value AS INTEGER) + 1 AS BLOB) END, "
+            "expires = CASE WHEN cache.expires <= ? THEN excluded.expires ELSE cache.expires END "
+            "RETURNING value",
+            (key, expires_at, now, now)
+        ).fetchall()
+        return int(rows[0][0])
@@ -32,6 +32,7 @@ async def update_user_profile(
         setattr(current_user, key, value)
     
     current_user.updated_at = datetime.now()
+    indexing.index_on_commit(db, "user", current_user)
     db.commit()
     db.refresh(current_user)
     
@@ -110,9 +111,8 @@ async def delete_club(
     if club.leader_id != current_user.user_id and current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Only club leader or admin can delete the club")
     
-    # Delete the club (cascade will handle related records)
-    db.delete(club)
-    db.commit()
+    # Delete the club with its members, requests, events and their notifications
+    deletion.delete_club(db, club)
     
     return None
 
@@ -137,8 +137,7 @@ async def delete_event(
     if club.leader_id != current_user.user_id and current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Only club leader or admin can delete the event")
     
-    # Delete the event
-    db.delete(event)
-    db.commit()
+    # Delete the event with its participations, keeping counters and leaderboards in step
+    deletion.delete_event(db, event)
     
     return None
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import logging
@@ -32,3 +32,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def create_missing_indexes(metadata):
+    """
+    create_all() only creates missing tables, so indexes declared later on
+    existing tables are added here.
+    """
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            # Dialect-specific indexes, e.g. MySQL FULLTEXT, are skipped elsewhere
+            ddl_if = getattr(index, "_ddl_if", None)
+            if ddl_if is not None and ddl_if.dialect not in (None, engine.dialect.name):
+                continue
+            try:
+                index.create(bind=engine)
+                logger.info(f"Created index {index.name} on {table.name}")
+            except Exception as e:
+                # Another worker may have created it first
+                logger.warning(f"Could not create index {index.name}: {e}")
@@ -61,21 +61,18 @@ async def request_to_join_club(
     )
     
     db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
-    
-    # Create notification for club leader
-    notification = Notification(
-        user_id=club.leader_id,
-        notification_type="join_request",
-        reference_id=new_request.request_id,
-        notification_text=f"{current_user.username} has requested to join {club.club_name}",
-        is_read=False,
-        notification_date=datetime.now()
+    db.flush()
+    
+    # Notification for club leader, recorded in the same transaction
+    notifications.notify_on_commit(
+        db,
+        club.leader_id,
+        "join_request",
+        f"{current_user.username} has requested to join {club.club_name}",
+        reference_id=new_request.request_id
     )
-    
-    db.add(notification)
     db.commit()
+    db.refresh(new_request)
     
     return new_request
 
@@ -174,18 +171,16 @@ async def approve_join_request(
         user_id=join_request.user_id
     )
     
-    # Create notification for the user
-    notification = Notification(
-        user_id=join_request.user_id,
-        notification_type="approval",
-        reference_id=join_request.request_id,
-        notification_text=f"Your request to join {club.club_name} has been approved",
-        is_read=False,
-        notification_date=datetime.now()
-    )
-    
     db.add(new_membership)
-    db.add(notification)
+    
+    # Notification for the user, recorded in the same transaction
+    notifications.notify_on_commit(
+        db,
+        join_request.user_id,
+        "approval",
+        f"Your request to join {club.club_name} has been approved",
+        reference_id=join_request.request_id
+    )
     db.commit()
     db.refresh(join_request)
     
@@ -226,17 +221,14 @@ async def reject_join_request(
     join_request.status = 'rejected'
     join_request.updated_at = datetime.now()
     
-    # Create notification for the user
-    notification = Notification(
-        user_id=join_request.user_id,
-        notification_type="rejection",
-        reference_id=join_request.request_id,
-        notification_text=f"Your request to join {club.club_name} has been rejected",
-        is_read=False,
-        notification_date=datetime.now()
+    # Notification for the user, recorded in the same transaction
+    notifications.notify_on_commit(
+        db,
+        join_request.user_id,
+        "rejection",
+        f"Your request to join {club.club_name} has been rejected",
+        reference_id=join_request.request_id
     )
-    
-    db.add(notification)
     db.commit()
     db.refresh(join_request)
     
@@ -172,21 +172,18 @@ async def add_event_score(
     participant.participation_score = score_data.score_value
     
     db.add(new_score)
-    db.commit()
-    db.refresh(new_score)
-    
-    # Create notification for the user
-    notification = Notification(
-        user_id=score_data.user_id,
-        notification_type="score",
-        reference_id=new_score.score_id,
-        notification_text=f"You received a score of {score_data.score_value} for event '{event.event_name}'",
-        is_read=False,
-        notification_date=datetime.now()
+    db.flush()
+    
+    # Notification for the user, recorded in the same transaction
+    notifications.notify_on_commit(
+        db,
+        score_data.user_id,
+        "score",
+        f"You received a score of {score_data.score_value} for event '{event.event_name}'",
+        reference_id=new_score.score_id
     )
-    
-    db.add(notification)
     db.commit()
+    db.refresh(new_score)
     
     return new_score
 
@@ -1,21 +1,48 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-from api.database.connection import engine
+from starlette.concurrency import run_in_threadpool
+from api.database.connection import engine, create_missing_indexes
 from api.models.models import Base
-from api.routers import auth, users, clubs, events, event_participation
+from api.middleware.ratelimit import RateLimitMiddleware
+from api.middleware.idempotency import IdempotencyMiddleware
+from api.middleware.compression import CompressionMiddleware
+from api.services import recommendations, push, jobs, outbox
+from api.routers import auth, users, clubs, events, event_participation, leaderboards, search, notifications, announcements, admin
 
 
 Base.metadata.create_all(bind=engine)
+create_missing_indexes(Base.metadata)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background work owned by each worker process
+    push.start()
+    jobs.start()
+    # Refreshes run as jobs; this only restarts the chain when results are stale
+    await run_in_threadpool(recommendations.ensure_scheduled)
+    outbox.start()
+    yield
+    outbox.stop()
+    jobs.stop()
+    push.stop()
 
 
 app = FastAPI(
     title="UniVibe API",
     description="API for university club management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
+# Innermost, so replays are still rate limited and stored responses are compressed per client
+app.add_middleware(IdempotencyMiddleware)
+# Added before CORS so that its headers reach 429 and compressed responses too
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,6 +57,11 @@ app.include_router(users.router)
 app.include_router(clubs.router)
 app.include_router(events.router)
 app.include_router(event_participation.router)
+app.include_router(leaderboards.router)
+app.include_router(search.router)
+app.include_router(notifications.router)
+app.include_router(announcements.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,266 @@
+"""
+Negotiated response compression.
+
+The encoding is picked from the request's Accept-Encoding, preferring zstd,
+then brotli, then gzip. gzip is always available. brotli and zstd are used
+when the `brotli` and `zstandard` packages are installed. Levels are set per
+encoding through COMPRESSION_*_LEVEL. The defaults favour speed, since every
+response is compressed on the fly.
+
+Only JSON and text bodies of at least COMPRESSION_MIN_SIZE bytes are
+compressed. Bodies sent in one piece are compressed in one go. From
+COMPRESSION_THREAD_SIZE bytes on, that happens in a worker thread so a
+multi-megabyte list does not stall the event loop. Streaming responses are
+compressed chunk by chunk as they are sent, with a flush at least every
+COMPRESSION_FLUSH_BYTES so clients can start parsing early.
+
+List endpoints often return exactly the same bytes again, for example when
+their data comes from a cache. Compressed bodies are therefore kept in an
+LRU keyed by encoding and a hash of the uncompressed body, up to
+COMPRESSION_CACHE_BYTES, and are sent again without compressing.
+
+`stats()` reports, per encoding, bytes in and out, cache hits and the CPU
+time spent compressing in this worker.
+"""
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from anyio import to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_THREAD_SIZE = int(os.environ.get("COMPRESSION_THREAD_SIZE", "262144"))
+COMPRESSION_FLUSH_BYTES = int(os.environ.get("COMPRESSION_FLUSH_BYTES", "65536"))
+COMPRESSION_CACHE_BYTES = int(os.environ.get("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.environ.get("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        # wbits 31 writes the gzip header and trailer
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+class _Zstd:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+# Most preferred first
+CODECS = OrderedDict()
+if zstandard is not None:
+    CODECS["zstd"] = (_Zstd, COMPRESSION_ZSTD_LEVEL)
+if brotli is not None:
+    CODECS["br"] = (_Brotli, COMPRESSION_BROTLI_LEVEL)
+CODECS["gzip"] = (_Gzip, COMPRESSION_GZIP_LEVEL)
+
+_lock = threading.Lock()
+_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_cache_bytes = 0
+_stats: Dict[str, Dict[str, float]] = {}
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The most preferred encoding we support with a non-zero q-value."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for name in CODECS:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+def _record(encoding: str, bytes_in: int, bytes_out: int, cpu: float, cache_hit: bool = False, response: bool = True):
+    with _lock:
+        stats = _stats.setdefault(encoding, {
+            "responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0, "cache_hits": 0
+        })
+        stats["responses"] += response
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_seconds"] += cpu
+        stats["cache_hits"] += cache_hit
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "encodings": {name: dict(values) for name, values in _stats.items()},
+            "cache_entries": len(_cache),
+            "cache_bytes": _cache_bytes,
+        }
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    """Compress a whole body, reusing the bytes from an earlier identical body."""
+    global _cache_bytes
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached is not None:
+        _record(encoding, len(body), len(cached), 0.0, cache_hit=True)
+        return cached
+
+    started = time.thread_time()
+    codec_class, level = CODECS[encoding]
+    codec = codec_class(level)
+    compressed = codec.compress(body) + codec.finish()
+    _record(encoding, len(body), len(compressed), time.thread_time() - started)
+
+    # Very large bodies would push everything else out
+    if len(compressed) <= COMPRESSION_CACHE_BYTES // 8:
+        with _lock:
+            if key not in _cache:
+                _cache[key] = compressed
+                _cache_bytes += len(compressed)
+                while _cache_bytes > COMPRESSION_CACHE_BYTES:
+                    _, evicted = _cache.popitem(last=False)
+                    _cache_bytes -= len(evicted)
+    return compressed
+
+def _compressible(status: int, headers: Headers) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    # Server-sent events must reach the client unbuffered
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+
+class _Responder:
+    def __init__(self, send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start = None
+        self.passthrough = False
+        self.codec = None
+        self.unflushed = 0
+
+    def _encoded_start(self, content_length: Optional[int]):
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        return self.start
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.codec is not None:
+            await self._stream(body, more_body)
+            return
+
+        if not _compressible(self.start["status"], Headers(raw=self.start["headers"])) or (
+            not more_body and len(body) < COMPRESSION_MIN_SIZE
+        ):
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        if not more_body:
+            if len(body) >= COMPRESSION_THREAD_SIZE:
+                compressed = await to_thread.run_sync(compress_body, self.encoding, body)
+            else:
+                compressed = compress_body(self.encoding, body)
+            await self.send(self._encoded_start(len(compressed)))
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        codec_class, level = CODECS[self.encoding]
+        self.codec = codec_class(level)
+        await self.send(self._encoded_start(None))
+        await self._stream(body, more_body)
+
+    async def _stream(self, body: bytes, more_body: bool):
+        started = time.thread_time()
+        out = self.codec.compress(body)
+        self.unflushed += len(body)
+        if not more_body:
+            out += self.codec.finish()
+        elif self.unflushed >= COMPRESSION_FLUSH_BYTES:
+            out += self.codec.flush()
+            self.unflushed = 0
+        _record(self.encoding, len(body), len(out), time.thread_time() - started, response=not more_body)
+        if out or not more_body:
+            await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not COMPRESSION_ENABLED or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _Responder(send, encoding))
@@ -0,0 +1,210 @@
+"""
+Idempotency-Key support for POST endpoints that create things.
+
+Mobile clients retry on flaky networks, and a retry of a create should not
+create twice. When a request to one of IDEMPOTENT_ROUTES carries an
+`Idempotency-Key` header, the first request with that key runs normally and
+its response is stored in the cache for IDEMPOTENCY_TTL seconds. Retries
+with the same key get the stored response, marked `Idempotent-Replayed:
+true`, without reaching the endpoint or the database.
+
+Keys are scoped to the user the bearer token belongs to, so a retry still
+finds its response after the client logs in again and gets a new token.
+Signup has no user yet, so its keys are shared by every caller. A request
+whose token does not resolve is passed on untouched, and the endpoint
+rejects it. Each stored key also records a fingerprint of the method, path,
+query and body, and reusing a key for a different request is a 422.
+
+While the first request is still running, its key holds an in-flight
+marker, taken atomically with the cache's `add`. A retry that arrives then
+waits up to IDEMPOTENCY_WAIT seconds for the result and gets a 409 if it is
+still not ready. The marker expires after IDEMPOTENCY_LOCK_TTL seconds, in
+case the worker dies mid-request. 5xx responses are not stored, so the
+client's next retry runs the request again. If the cache is unavailable,
+requests run without idempotency. Cache calls run in the threadpool, since
+the shared backends do file or network I/O.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from api.auth.utils import user_id_for_token
+from api.cache import CacheError, get_cache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TTL = float(os.environ.get("IDEMPOTENCY_LOCK_TTL", "60"))
+IDEMPOTENCY_WAIT = float(os.environ.get("IDEMPOTENCY_WAIT", "10"))
+# Larger responses are not stored; none of the routes below come close
+IDEMPOTENCY_MAX_BODY = int(os.environ.get("IDEMPOTENCY_MAX_BODY", "65536"))
+MAX_KEY_LENGTH = 255
+
+# (method, path, whether keys are scoped to the signed-in user)
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/auth/signup$"), False),
+    ("POST", re.compile(r"^/clubs/\d+/request-join$"), True),
+    ("POST", re.compile(r"^/event-participation$"), True),
+    ("POST", re.compile(r"^/events$"), True),
+]
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _route(scope):
+    return next((
+        route for route in IDEMPOTENT_ROUTES if scope["method"] == route[0] and route[1].match(scope["path"])
+    ), None)
+
+def _token(scope) -> Optional[str]:
+    authorization = _header(scope, b"authorization") or ""
+    return authorization[7:].strip() if authorization[:7].lower() == "bearer " else None
+
+def _cache_key(scope, owner: str, key: str) -> str:
+    raw = "\n".join([owner, scope["method"], scope["path"], key])
+    return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+def _fingerprint(scope, body: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+async def _send_json(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _replay(send, entry: dict):
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in entry["headers"]]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": entry["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": base64.b64decode(entry["body"])})
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        key = _header(scope, b"idempotency-key")
+        route = None if key is None else _route(scope)
+        if route is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        owner = "anonymous"
+        if route[2]:
+            user_id = await run_in_threadpool(user_id_for_token, _token(scope))
+            if user_id is None:
+                return await self.app(scope, receive, send)
+            owner = f"user:{user_id}"
+
+        # The body is part of the fingerprint, so read it all before deciding
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = _fingerprint(scope, body)
+        cache = get_cache("idempotency")
+        cache_key = _cache_key(scope, owner, key)
+
+        waited = 0.0
+        delay = 0.01
+        while True:
+            try:
+                claimed = await run_in_threadpool(
+                    cache.add, cache_key, {"fingerprint": fingerprint}, ttl=IDEMPOTENCY_LOCK_TTL
+                )
+                entry = None if claimed else await run_in_threadpool(cache.get, cache_key)
+            except CacheError as e:
+                logger.warning(f"Idempotency store unavailable, running request without it: {e}")
+                return await self._run(scope, body, receive, send, None, None, None)
+            if claimed:
+                return await self._run(scope, body, receive, send, cache, cache_key, fingerprint)
+
+            # None means the first request failed and released the key; the next add claims it
+            if entry is not None:
+                if entry["fingerprint"] != fingerprint:
+                    return await _send_json(send, 422, "Idempotency-Key was already used for a different request")
+                if "status" in entry:
+                    return await _replay(send, entry)
+            if waited >= IDEMPOTENCY_WAIT:
+                return await _send_json(send, 409, "A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = min(delay * 2, 0.25)
+
+    async def _run(self, scope, body: bytes, receive, send, cache, cache_key: Optional[str],
+                   fingerprint: Optional[str]):
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = None
+        headers: List[List[str]] = []
+        chunks = []
+        size = 0
+
+        async def capture_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers.extend(
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= IDEMPOTENCY_MAX_BODY:
+                    chunks.append(chunk)
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if cache is not None and status is not None and status < 500 and size <= IDEMPOTENCY_MAX_BODY:
+                try:
+                    await run_in_threadpool(cache.set, cache_key, {
+                        "fingerprint": fingerprint,
+                        "status": status,
+                        "headers": headers,
+                        "body": base64.b64encode(b"".join(chunks)).decode(),
+                    }, ttl=IDEMPOTENCY_TTL)
+                    stored = True
+                except CacheError:
+                    # The response has already been sent, so a store failure only costs the replay
+                    logger.exception("Could not store idempotent response")
+        finally:
+            if cache is not None and not stored:
+                # Let the next retry run the request instead of waiting for the marker to expire
+                try:
+                    await run_in_threadpool(cache.delete, cache_key)
+                except CacheError:
+                    logger.exception("Could not release idempotency key; it expires with the marker")
@@ -0,0 +1,287 @@
+"""
+Per-route token-bucket rate limiting.
+
+Every request is matched against RATE_LIMITS, a comma-separated list of
+rules like `POST /auth/login=10/60:ip`. Each rule gives a method (or `*`),
+a path, `requests/seconds`, and optionally the key to count by. A path
+matches itself and everything below it on a `/` boundary, so `/events`
+covers `/events/12` but not `/events-raw`; a path ending in `$` matches only
+itself. The most specific matching rule wins; `*=600/60` is the catch-all.
+A bucket holds up to `requests` tokens and refills at requests/seconds per
+second, so short bursts are allowed while the sustained rate is capped.
+
+Buckets are keyed by the rule and the caller: the user, when the bearer
+token (header or `?token=`, as the SSE stream uses) belongs to one,
+otherwise the client IP. A token that is not in the auth cache is first
+charged to the client IP and only then looked up, so made-up tokens neither
+get fresh buckets nor reach the database once the IP is over its limit.
+Rules ending in `:ip` always count by IP. Behind a reverse proxy such as App
+Service, set RATE_LIMIT_TRUST_FORWARDED=1 to take the client IP from the
+last X-Forwarded-For entry.
+
+The default backend keeps buckets in a dict in each worker, which costs a
+few microseconds per request, but the limits then apply per worker: with N
+gunicorn workers a client gets up to N times the configured rate.
+RATE_LIMIT_BACKEND=shared keeps them in a SQLite file
+(RATE_LIMIT_SHARED_PATH) that all the workers on the host update, so limits
+apply per host. That costs one small local write per request, done in the
+threadpool so a busy file never stalls the event loop; if the file stays
+locked for too long, the request is let through. The file outlives
+restarts, so buckets carry over between deploys.
+
+Refused requests get a 429 with Retry-After in seconds.
+"""
+import json
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from api.auth.utils import cached_user_id, user_id_for_token
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMITS = ",".join([
+    # Every attempt costs a bcrypt verify
+    "POST /auth/login=10/60:ip",
+    "POST /auth/signup=5/60:ip",
+    "GET /users/me/notifications$=60/60",
+    "*=600/60",
+])
+RATE_LIMITS = os.environ.get("RATE_LIMITS", DEFAULT_RATE_LIMITS)
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SHARED_PATH = os.environ.get(
+    "RATE_LIMIT_SHARED_PATH", os.path.join(tempfile.gettempdir(), "univibe-ratelimit.db")
+)
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+# Buckets kept in memory before full ones are dropped
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+class Rule(NamedTuple):
+    method: str
+    prefix: str
+    capacity: float
+    rate: float
+    by_ip: bool
+    exact: bool
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.prefix}{'$' if self.exact else ''}"
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.method != "*" and self.method != method:
+            return False
+        if not self.prefix or path == self.prefix:
+            return True
+        return not self.exact and path.startswith(self.prefix.rstrip("/") + "/")
+
+def parse_rules(spec: str) -> List[Rule]:
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        target, _, limit = item.rpartition("=")
+        limit, _, key = limit.partition(":")
+        requests, _, seconds = limit.partition("/")
+        method, _, prefix = target.strip().partition(" ")
+        if not prefix:
+            # Bare "*" or a bare path applies to every method
+            method, prefix = "*", ("" if method == "*" else method)
+        prefix = prefix.strip()
+        exact = prefix.endswith("$")
+        capacity = float(requests)
+        rules.append(Rule(
+            method.upper(), prefix.rstrip("$"), capacity, capacity / float(seconds or 1), key == "ip", exact
+        ))
+    # Longest path first, exact before prefix, and method-specific rules before "*" for the same path
+    rules.sort(key=lambda rule: (len(rule.prefix), rule.exact, rule.method != "*"), reverse=True)
+    return rules
+
+class MemoryBackend:
+    """Buckets in a dict. Only used from the event loop thread, so no lock is needed."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: Dict[str, List[float]] = {}
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """Take one token. Returns 0 if allowed, else the seconds until a token is available."""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._prune(now)
+            self.buckets[key] = [capacity - 1, now, capacity / rate]
+            return 0.0
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to refill is the same as no bucket
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items() if now - bucket[1] < bucket[2]
+        }
+        if len(self.buckets) >= self.max_keys:
+            logger.warning(f"Rate limiter tracking {len(self.buckets)} active keys, resetting")
+            self.buckets.clear()
+
+class SharedBackend:
+    """Buckets in a SQLite file shared by the workers on one host. Called from the threadpool."""
+
+    BUSY_TIMEOUT = 0.05
+    PRUNE_EVERY = 10000
+    blocking = True
+
+    def __init__(self, path: str = RATE_LIMIT_SHARED_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL, idle REAL)"
+            )
+        finally:
+            conn.close()
+        self.calls = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        self.calls += 1
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.calls % self.PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM buckets WHERE updated + idle < ?", (now,))
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                allowed = tokens >= 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, idle) VALUES (?, ?, ?, ?)",
+                    (key, tokens - 1 if allowed else tokens, now, capacity / rate)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            # Fail open rather than hold the request on a busy file
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return 0.0
+        return 0.0 if allowed else (1 - tokens) / rate
+
+def _backend():
+    if RATE_LIMIT_BACKEND == "shared":
+        return SharedBackend()
+    return MemoryBackend()
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            # The last entry was added by our proxy; earlier ones come from the client
+            ip = forwarded.rsplit(",", 1)[-1].strip()
+            return ip.split(":")[0] if ip.count(":") == 1 else ip
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _token(scope) -> Optional[str]:
+    authorization = _header(scope, b"authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    query = scope.get("query_string", b"")
+    if b"token=" in query:
+        for pair in query.decode("latin-1").split("&"):
+            name, _, value = pair.partition("=")
+            if name == "token" and value:
+                return value
+    return None
+
+async def _refuse(send, wait: float):
+    body = json.dumps({"detail": "Too many requests"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules: Optional[str] = None, backend=None):
+        self.app = app
+        self.rules = parse_rules(rules if rules is not None else RATE_LIMITS)
+        self.backend = backend if backend is not None else _backend()
+        # Route lookups are cached; paths with ids make this grow, so it is capped
+        self._matches: Dict[Tuple[str, str], Optional[Rule]] = {}
+
+    def _match(self, method: str, path: str) -> Optional[Rule]:
+        cache_key = (method, path)
+        if cache_key in self._matches:
+            return self._matches[cache_key]
+        rule = next((rule for rule in self.rules if rule.matches(method, path)), None)
+        if len(self._matches) > 10000:
+            self._matches.clear()
+        self._matches[cache_key] = rule
+        return rule
+
+    async def _take(self, key: str, rule: Rule) -> float:
+        if getattr(self.backend, "blocking", True):
+            return await run_in_threadpool(self.backend.take, key, rule.capacity, rule.rate, time.time())
+        return self.backend.take(key, rule.capacity, rule.rate, time.time())
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights carry no credentials and are answered before the app
+        if not RATE_LIMIT_ENABLED or scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        rule = self._match(scope["method"], scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        ip_key = f"{rule.name}|ip:{_client_ip(scope)}"
+        token = None if rule.by_ip else _token(scope)
+        # The auth cache can be a file or a server, so it is read off the event loop too
+        user_id = await run_in_threadpool(cached_user_id, token) if token else None
+        if token and user_id is None:
+            wait = await self._take(ip_key, rule)
+            if wait > 0:
+                return await _refuse(send, wait)
+            user_id = await run_in_threadpool(user_id_for_token, token)
+            if user_id is None:
+                # Already counted against the IP
+                return await self.app(scope, receive, send)
+
+        key = ip_key if user_id is None else f"{rule.name}|user:{user_id}"
+        wait = await self._take(key, rule)
+        if wait <= 0:
+            return await self.app(scope, receive, send)
+        await _refuse(send, wait)
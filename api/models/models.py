@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, Date, TIMESTAMP, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, Enum, Date, TIMESTAMP, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from api.database.connection import Base
@@ -25,6 +25,11 @@ class User(Base):
     about_me = Column(Text)
     interests = Column(JSON)
 
+    __table_args__ = (
+        Index('ft_users_search', 'username', 'first_name', 'last_name', 'bio',
+              mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
 class Club(Base):
     __tablename__ = 'clubs'
     club_id = Column(Integer, primary_key=True, index=True)
@@ -36,6 +41,34 @@ class Club(Base):
     leader = relationship("User")
     members = relationship("ClubMember", back_populates="club")
     join_requests = relationship("ClubJoinRequest", back_populates="club")
+    # Loaded in the same query as the club so card counts cost nothing extra
+    stats = relationship("ClubStats", uselist=False, lazy="joined", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index('ft_clubs_search', 'club_name', 'description',
+              mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+    @property
+    def member_count(self):
+        return self.stats.member_count if self.stats else 0
+
+    @property
+    def event_count(self):
+        return self.stats.event_count if self.stats else 0
+
+    @property
+    def upcoming_event_count(self):
+        return self.stats.upcoming_event_count if self.stats else 0
+
+class ClubStats(Base):
+    __tablename__ = 'club_stats'
+    club_id = Column(Integer, ForeignKey('clubs.club_id'), primary_key=True)
+    member_count = Column(Integer, default=0)
+    event_count = Column(Integer, default=0)
+    upcoming_event_count = Column(Integer, default=0)
+    # Day the upcoming count was last recomputed; events age out as days pass
+    upcoming_as_of = Column(Date)
 
 class Event(Base):
     __tablename__ = 'events'
@@ -48,6 +81,13 @@ class Event(Base):
     created_at = Column(TIMESTAMP, default=datetime.now)
     club = relationship("Club")
 
+    __table_args__ = (
+        Index('ft_events_search', 'event_name', 'event_description',
+              mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        # Serves date-range listings and the calendar, optionally per club
+        Index('ix_events_date_club', 'event_date', 'club_id'),
+    )
+
 class ClubMember(Base):
     __tablename__ = 'club_members'
     club_id = Column(Integer, ForeignKey('clubs.club_id'), primary_key=True)
@@ -58,6 +98,11 @@ class ClubMember(Base):
     user = relationship("User", back_populates="club_memberships")
     club = relationship("Club", back_populates="members")
 
+    # The primary key leads with club_id, so lookups by user need their own index
+    __table_args__ = (
+        Index('ix_club_members_user', 'user_id', 'club_id'),
+    )
+
 class ClubJoinRequest(Base):
     __tablename__ = 'club_join_requests'
     request_id = Column(Integer, primary_key=True, index=True)
@@ -82,4 +127,106 @@ class EventParticipation(Base):
     
     # Define relationships
     user = relationship("User")
-    event = relationship("Event") 
\ No newline at end of file
+    event = relationship("Event")
+
+class LeaderboardEntry(Base):
+    __tablename__ = 'leaderboard_entries'
+    # 'global', 'club:<club_id>' or 'semester:<year>-<spring|fall>'
+    scope = Column(String(50), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    total_score = Column(Integer, default=0)
+    updated_at = Column(TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+
+    user = relationship("User")
+
+    __table_args__ = (
+        Index('ix_leaderboard_scope_score', 'scope', 'total_score'),
+    )
+
+class Notification(Base):
+    __tablename__ = 'notifications'
+    notification_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'))
+    notification_type = Column(String(50), default='general')  # join_request, approval, rejection, score, event_reminder, general
+    reference_id = Column(Integer, nullable=True)  # Can store request_id, event_id, etc.
+    notification_text = Column(Text)
+    is_read = Column(Boolean, default=False)
+    notification_date = Column(TIMESTAMP, default=datetime.now)
+    created_at = Column(TIMESTAMP, default=datetime.now)
+
+    user = relationship("User")
+
+    __table_args__ = (
+        # Serves the per-user list, with or without the unread filter
+        Index('ix_notifications_user_read_date', 'user_id', 'is_read', 'notification_date'),
+    )
+
+class NotificationUnreadCount(Base):
+    __tablename__ = 'notification_unread_counts'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    unread_count = Column(Integer, default=0)
+    updated_at = Column(TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+
+class ClubRecommendation(Base):
+    __tablename__ = 'club_recommendations'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    # Best first; replaced for every user by each refresh
+    club_ids = Column(JSON)
+    computed_at = Column(TIMESTAMP, default=datetime.now)
+
+class ClubAnnouncement(Base):
+    __tablename__ = 'club_announcements'
+    announcement_id = Column(Integer, primary_key=True, index=True)
+    club_id = Column(Integer, ForeignKey('clubs.club_id'))
+    author_id = Column(Integer, ForeignKey('users.user_id'))
+    announcement_text = Column(Text)
+    created_at = Column(TIMESTAMP, default=datetime.now)
+
+    club = relationship("Club")
+    author = relationship("User")
+
+    __table_args__ = (
+        # Ids grow with time, so this serves both newest-first listing and unread counts
+        Index('ix_club_announcements_club', 'club_id', 'announcement_id'),
+    )
+
+class AnnouncementReadMarker(Base):
+    __tablename__ = 'announcement_read_markers'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    club_id = Column(Integer, ForeignKey('clubs.club_id'), primary_key=True)
+    # Every announcement of the club with an id up to read_through is read
+    read_through = Column(Integer, default=0)
+    # Ids above read_through that were read individually
+    read_ids = Column(JSON)
+    updated_at = Column(TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    job_id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(100))
+    # Set while the job is pending or running; enqueueing the same key again is a no-op
+    job_key = Column(String(191), unique=True, nullable=True)
+    payload = Column(JSON)
+    status = Column(Enum('pending', 'running', 'done', 'failed', name='job_status'), default='pending')
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_at = Column(TIMESTAMP, default=datetime.now)
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(TIMESTAMP, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.now)
+    updated_at = Column(TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+    outbox_id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String(100))
+    payload = Column(JSON)
+    attempts = Column(Integer, default=0)
+    claimed_by = Column(String(100), nullable=True)
+    claimed_until = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.now)
@@ -1,2 +1,2 @@
 # Routers package
-from api.routers import auth, users, clubs, events, event_participation
\ No newline at end of file
+from api.routers import auth, users, clubs, events, event_participation, leaderboards, search, notifications, announcements, admin
\ No newline at end of file
@@ -0,0 +1,76 @@
+import csv
+import os
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from api.database.connection import get_db
+from api.models.models import User
+from api.schemas.schemas import CompressionStatsResponse, UserImportResponse
+from api.auth.utils import get_current_admin
+from api.middleware import compression
+from api.services import exports, user_import
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+@router.get("/compression-stats", response_model=CompressionStatsResponse)
+async def get_compression_stats(current_user: User = Depends(get_current_admin)):
+    """Response compression savings and CPU cost in the worker that serves this request"""
+    current = compression.stats()
+    encodings = []
+    for name, values in current["encodings"].items():
+        encodings.append({
+            "encoding": name,
+            "responses": values["responses"],
+            "bytes_in": values["bytes_in"],
+            "bytes_out": values["bytes_out"],
+            "saved_bytes": values["bytes_in"] - values["bytes_out"],
+            "ratio": round(values["bytes_out"] / values["bytes_in"], 4) if values["bytes_in"] else 1.0,
+            "cpu_ms": round(values["cpu_seconds"] * 1000, 3),
+            "cache_hits": values["cache_hits"]
+        })
+    return {
+        "pid": os.getpid(),
+        "available_encodings": list(compression.CODECS),
+        "encodings": encodings,
+        "cache_entries": current["cache_entries"],
+        "cache_bytes": current["cache_bytes"]
+    }
+
+@router.get("/exports/{name}")
+async def export_table(
+    name: Literal["users", "club_members", "event_participation", "join_requests"],
+    format: Literal["csv", "ndjson"] = "csv",
+    since: Optional[datetime] = Query(None, description="Only rows changed at or after this time"),
+    gzip: bool = False,
+    current_user: User = Depends(get_current_admin)
+):
+    """Download a table as CSV or NDJSON, streamed in chunks"""
+    return StreamingResponse(
+        exports.iter_export(name, format, since, gzip),
+        media_type="application/gzip" if gzip else exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{exports.filename(name, format, gzip)}"'}
+    )
+
+@router.post("/users/import", response_model=UserImportResponse)
+async def import_users(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the file extension"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Create users in bulk from a CSV or NDJSON file. Rows that fail are reported and skipped."""
+    filename = (file.filename or "").lower()
+    fmt = format or ("ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        # Hashing and inserts take a while, so keep them off the event loop
+        return await run_in_threadpool(user_import.import_users, db, file.file, fmt)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the file: {e}")
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from api.database.connection import get_db
+from api.models.models import User, Club, ClubMember, ClubAnnouncement
+from api.schemas.schemas import AnnouncementCreate, AnnouncementResponse
+from api.auth.utils import get_current_user
+from api.services import announcements
+
+router = APIRouter(
+    tags=["announcements"]
+)
+
+@router.post("/clubs/{club_id}/announcements", response_model=AnnouncementResponse)
+async def create_announcement(
+    club_id: int,
+    announcement_data: AnnouncementCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Announce something to every member of a club. Only the club leader or admins can post."""
+    # Check if club exists
+    club = db.query(Club).filter(Club.club_id == club_id).first()
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+
+    # Check if user is the club leader or an admin
+    if club.leader_id != current_user.user_id and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=403,
+            detail="Only the club leader or admins can post announcements"
+        )
+
+    # Stored once for the club; members see it through their notification list
+    return announcements.post(db, club_id, current_user.user_id, announcement_data.announcement_text)
+
+@router.get("/clubs/{club_id}/announcements", response_model=List[AnnouncementResponse])
+async def get_club_announcements(
+    club_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Newest announcements of a club. Only members, the club leader and admins can read them."""
+    # Check if club exists
+    club = db.query(Club).filter(Club.club_id == club_id).first()
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+
+    is_member = db.query(ClubMember).filter(
+        ClubMember.club_id == club_id,
+        ClubMember.user_id == current_user.user_id
+    ).first() is not None
+    if not (is_member or club.leader_id == current_user.user_id or current_user.role == 'admin'):
+        raise HTTPException(status_code=403, detail="Only club members can read announcements")
+
+    return db.query(ClubAnnouncement).filter(
+        ClubAnnouncement.club_id == club_id
+    ).order_by(ClubAnnouncement.announcement_id.desc()).limit(limit).all()
+
+@router.put("/announcements/{announcement_id}/read", response_model=dict)
+async def mark_announcement_read(
+    announcement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark an announcement read for the current user."""
+    announcement = announcements.visible_to(db, current_user.user_id, announcement_id)
+    if not announcement:
+        raise HTTPException(status_code=404, detail="Announcement not found")
+
+    announcements.mark_read(db, current_user.user_id, announcement)
+    db.commit()
+    return {"message": "Announcement marked as read"}
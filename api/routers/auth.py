@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from api.database.connection import get_db
 from api.models.models import User
 from api.schemas.schemas import UserCreate, UserResponse, LoginCredentials, TokenRequest
-from api.auth.utils import get_password_hash, verify_password, generate_token
+from api.auth.utils import get_password_hash, verify_password, generate_token, user_for_token, forget_token, remember_token
+from api.services import indexing
 
 router = APIRouter(
     prefix="/auth",
@@ -33,6 +34,7 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
+    indexing.index_on_commit(db, "user", new_user)
     db.commit()
     db.refresh(new_user)
     
@@ -54,13 +56,15 @@ async def login(credentials: LoginCredentials, db: Session = Depends(get_db)):
         )
     
     new_token = generate_token()
+    forget_token(user.auth_token)
     user.auth_token = new_token
     db.commit()
+    remember_token(new_token, user.user_id)
     return {"auth_token": new_token}
 
 @router.post("/verify-token")
 async def verify_token(request: TokenRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.auth_token == request.token).first()
+    user = user_for_token(db, request.token)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session, joinedload
 from typing import List
+import os
 
 from api.database.connection import get_db
-from api.models.models import Club, ClubMember, User, ClubJoinRequest
+from api.models.models import Club, ClubMember, User, ClubJoinRequest, ClubStats
 from api.schemas.schemas import (
-    ClubResponse, ClubCreate, ClubMemberResponse, ClubMemberWithUserResponse, 
+    ClubResponse, ClubCreate, ClubUpdate, ClubMemberResponse, ClubMemberWithUserResponse, 
     UserResponse, JoinRequestCreate, JoinRequestResponse, JoinRequestWithUserResponse,
     JoinRequestAction
 )
 from api.auth.utils import get_current_user
+from api.cache import generations, get_cache
+from api.services import club_stats, deletion, feed, related, notifications, indexing
+from datetime import date
+
+# Cached club responses are also dropped as soon as the club or its counters change
+CLUB_CACHE_TTL = float(os.environ.get("CLUB_CACHE_TTL", "300"))
 
 router = APIRouter(
     tags=["clubs"]
@@ -18,15 +25,23 @@ router = APIRouter(
 @router.get("/clubs", response_model=List[ClubResponse])
 async def get_clubs(db: Session = Depends(get_db), 
                   current_user: User = Depends(get_current_user)):
+    club_stats.roll_upcoming(db)
     return db.query(Club).all()
 
 @router.get("/clubs/{club_id}", response_model=ClubResponse)
 async def get_club(club_id: int, db: Session = Depends(get_db), 
                  current_user: User = Depends(get_current_user)):
-    club = db.query(Club).filter(Club.club_id == club_id).first()
-    if not club:
-        raise HTTPException(status_code=404, detail="Club not found")
-    return club
+    club_stats.roll_upcoming(db)
+
+    def load():
+        club = db.query(Club).filter(Club.club_id == club_id).first()
+        if not club:
+            raise HTTPException(status_code=404, detail="Club not found")
+        return ClubResponse.model_validate(club).model_dump(mode="json")
+
+    return get_cache("responses").get_or_set(
+        f"club:{club_id}", load, ttl=CLUB_CACHE_TTL, tags=[f"club:{club_id}", "clubs"]
+    )
 
 @router.post("/clubs", response_model=ClubResponse)
 async def create_club(club_data: ClubCreate, db: Session = Depends(get_db), 
@@ -44,14 +59,58 @@ async def create_club(club_data: ClubCreate, db: Session = Depends(get_db),
         club_name=club_data.club_name,
         description=club_data.description,
         pic=club_data.pic,
-        leader_id=club_data.leader_id
+        leader_id=club_data.leader_id,
+        stats=ClubStats(
+            member_count=0,
+            event_count=0,
+            upcoming_event_count=0,
+            upcoming_as_of=date.today()
+        )
     )
     
     db.add(new_club)
+    indexing.index_on_commit(db, "club", new_club)
     db.commit()
     db.refresh(new_club)
     return new_club
 
+@router.put("/clubs/{club_id}", response_model=ClubResponse)
+async def update_club(club_id: int, club_data: ClubUpdate, db: Session = Depends(get_db),
+                      current_user: User = Depends(get_current_user)):
+    club = db.query(Club).filter(Club.club_id == club_id).first()
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+
+    # Only the club leader or an admin can edit the club
+    if club.leader_id != current_user.user_id and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the club leader or admins can update the club"
+        )
+
+    for key, value in club_data.model_dump(exclude_unset=True, exclude_none=True).items():
+        setattr(club, key, value)
+
+    # Refreshes search, suggestions and related clubs, and the cached club response
+    indexing.index_on_commit(db, "club", club)
+    generations.bump_on_commit(db, f"club:{club_id}")
+    db.commit()
+    db.refresh(club)
+    return club
+
+@router.get("/clubs/{club_id}/related", response_model=List[ClubResponse])
+async def get_related_clubs(club_id: int, limit: int = Query(5, ge=1, le=20),
+                          db: Session = Depends(get_db),
+                          current_user: User = Depends(get_current_user)):
+    """Clubs with the most similar name and description"""
+    club = db.query(Club).filter(Club.club_id == club_id).first()
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+
+    related_ids = related.related(db, "club", club_id, limit)
+    clubs = {other.club_id: other for other in db.query(Club).filter(Club.club_id.in_(related_ids))}
+    return [clubs[other_id] for other_id in related_ids if other_id in clubs]
+
 @router.get("/clubs/{club_id}/members", response_model=List[ClubMemberWithUserResponse])
 async def get_club_members(club_id: int, db: Session = Depends(get_db),
                          current_user: User = Depends(get_current_user)):
@@ -142,6 +201,16 @@ async def request_to_join_club(
     )
     
     db.add(new_request)
+    db.flush()
+
+    # Let the club leader know, in the same transaction
+    notifications.notify_on_commit(
+        db,
+        club.leader_id,
+        "join_request",
+        f"{current_user.username} has requested to join {club.club_name}",
+        reference_id=new_request.request_id
+    )
     db.commit()
     db.refresh(new_request)
     return new_request
@@ -221,6 +290,8 @@ async def process_join_request(
             user_id=join_request.user_id
         )
         db.add(new_membership)
+        club_stats.member_joined(db, join_request.club_id)
+        feed.invalidate_user_on_commit(db, join_request.user_id)
     
     elif action_data.action == 'reject':
         # Update request status
@@ -229,6 +300,14 @@ async def process_join_request(
     else:
         raise HTTPException(status_code=400, detail="Invalid action. Must be 'approve' or 'reject'")
     
+    # Let the requester know, in the same transaction
+    notifications.notify_on_commit(
+        db,
+        join_request.user_id,
+        "approval" if join_request.status == 'approved' else "rejection",
+        f"Your request to join {club.club_name} has been {join_request.status}",
+        reference_id=join_request.request_id
+    )
     db.commit()
     db.refresh(join_request)
     return join_request
@@ -278,6 +357,8 @@ async def join_club(club_id: int, db: Session = Depends(get_db),
     )
     
     db.add(new_membership)
+    club_stats.member_joined(db, club_id)
+    feed.invalidate_user_on_commit(db, current_user.user_id)
     db.commit()
     db.refresh(new_membership)
     return new_membership
@@ -301,5 +382,26 @@ async def leave_club(club_id: int, db: Session = Depends(get_db),
     
     # Delete membership
     db.delete(membership)
+    club_stats.member_left(db, club_id)
+    feed.invalidate_user_on_commit(db, current_user.user_id)
     db.commit()
-    return None 
\ No newline at end of file
+    return None
+
+@router.delete("/clubs/{club_id}", status_code=204)
+async def delete_club(club_id: int, db: Session = Depends(get_db),
+                      current_user: User = Depends(get_current_user)):
+    # Check if club exists
+    club = db.query(Club).filter(Club.club_id == club_id).first()
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+
+    # Only the club leader or an admin can delete the club
+    if club.leader_id != current_user.user_id and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the club leader or admins can delete the club"
+        )
+
+    # Deletes members, requests, events, announcements and their notifications too
+    deletion.delete_club(db, club)
+    return None
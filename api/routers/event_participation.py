@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import update, case, or_
+from typing import List, Dict
 from sqlalchemy.exc import SQLAlchemyError
 import traceback
+import csv
+import io
+from collections import defaultdict
 
-from api.database.connection import get_db
+from api.database.connection import get_db, SessionLocal
 from api.models.models import EventParticipation, Event, User
 from api.schemas.schemas import (
     EventParticipationCreate, 
     EventParticipationResponse, 
     EventParticipationWithUserResponse,
-    EventParticipationWithEventResponse
+    EventParticipationWithEventResponse,
+    ParticipationScoreBatch,
+    ParticipationScoreBatchResult
 )
 from api.auth.utils import get_current_user
+from api.services import leaderboard, notifications, singleflight
 
 router = APIRouter(
     tags=["event_participation"]
@@ -72,6 +79,9 @@ async def create_event_participation(
     
     try:
         db.add(new_participation)
+        leaderboard.record_score_change(
+            db, event, new_participation.user_id, None, new_participation.participation_score
+        )
         db.commit()
         db.refresh(new_participation)
         return new_participation
@@ -84,27 +94,24 @@ async def create_event_participation(
             detail=f"Error creating participation record: {str(e)}"
         )
 
-@router.get("/events/{event_id}/participants", response_model=List[EventParticipationWithUserResponse])
-async def get_event_participants(
-    event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get all participants for a specific event"""
-    # Check if event exists
-    event = db.query(Event).filter(Event.event_id == event_id).first()
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Event not found"
-        )
-    
+def _load_participants(event_id: int) -> List[dict]:
+    db = SessionLocal()
     try:
+        # Check if event exists
+        event = db.query(Event).filter(Event.event_id == event_id).first()
+        if not event:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Event not found"
+            )
+        
         participants = db.query(EventParticipation).filter(
             EventParticipation.event_id == event_id
+        ).options(
+            joinedload(EventParticipation.user)
         ).all()
         
-        return participants
+        return [EventParticipationWithUserResponse.model_validate(p).model_dump() for p in participants]
     except SQLAlchemyError as e:
         error_detail = f"Database error: {str(e)}\n{traceback.format_exc()}"
         print(error_detail)
@@ -112,6 +119,20 @@ async def get_event_participants(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching event participants: {str(e)}"
         )
+    finally:
+        db.close()
+
+@router.get("/events/{event_id}/participants", response_model=List[EventParticipationWithUserResponse])
+async def get_event_participants(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all participants for a specific event"""
+    # Hand the connection back while waiting, so a burst of waiters cannot starve the flight of one
+    db.close()
+    # Every signed-in user sees the same list, so identical concurrent requests share one query
+    return await singleflight.do(("participants", event_id), _load_participants, event_id)
 
 @router.get("/users/{user_id}/participations", response_model=List[EventParticipationWithEventResponse])
 async def get_user_event_participations(
@@ -180,6 +201,9 @@ async def delete_event_participation(
         )
     
     try:
+        leaderboard.record_score_change(
+            db, participation.event, participation.user_id, participation.participation_score, None
+        )
         db.delete(participation)
         db.commit()
         return None
@@ -218,7 +242,17 @@ async def update_participation_score(
         )
     
     try:
+        leaderboard.record_score_change(
+            db, participation.event, participation.user_id, participation.participation_score, score
+        )
         participation.participation_score = score
+        notifications.notify_on_commit(
+            db,
+            participation.user_id,
+            "score",
+            f"You received a score of {score} for event '{participation.event.event_name}'",
+            reference_id=participation.participation_id
+        )
         db.commit()
         db.refresh(participation)
         return participation
@@ -229,4 +263,161 @@ async def update_participation_score(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating participation score: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+def _apply_score_batch(db: Session, event: Event,
+                       participation_scores: Dict[int, int],
+                       user_scores: Dict[int, int]) -> ParticipationScoreBatchResult:
+    """
+    Apply a batch of scores for one event in a single transaction.
+    Target rows are resolved with one query and written with one UPDATE ... CASE,
+    so grading cost no longer grows with a round trip per participant.
+    Leaderboard deltas are queued as a job in the same transaction and applied
+    by a background worker.
+    """
+    # Resolve every targeted participation of this event in one query
+    filters = []
+    if participation_scores:
+        filters.append(EventParticipation.participation_id.in_(list(participation_scores)))
+    if user_scores:
+        filters.append(EventParticipation.user_id.in_(list(user_scores)))
+    if not filters:
+        return ParticipationScoreBatchResult(event_id=event.event_id, updated=0)
+
+    rows = db.query(
+        EventParticipation.participation_id,
+        EventParticipation.user_id,
+        EventParticipation.participation_score
+    ).filter(
+        EventParticipation.event_id == event.event_id,
+        or_(*filters)
+    ).all()
+
+    # participation_id keys win over user_id keys when both target the same row
+    new_scores = {}
+    owners = {}
+    found_users = set()
+    deltas = defaultdict(int)
+    for participation_id, user_id, old_score in rows:
+        if user_id in user_scores:
+            new_scores[participation_id] = user_scores[user_id]
+            found_users.add(user_id)
+        if participation_id in participation_scores:
+            new_scores[participation_id] = participation_scores[participation_id]
+        if participation_id in new_scores:
+            owners[participation_id] = user_id
+            leaderboard.add_score_delta(
+                deltas, event, user_id, new_scores[participation_id] - (old_score or 0)
+            )
+
+    result = ParticipationScoreBatchResult(
+        event_id=event.event_id,
+        updated=len(new_scores),
+        missing_participation_ids=sorted(
+            pid for pid in participation_scores if pid not in new_scores
+        ),
+        missing_user_ids=sorted(uid for uid in user_scores if uid not in found_users)
+    )
+    if not new_scores:
+        return result
+
+    try:
+        db.execute(
+            update(EventParticipation)
+            .where(EventParticipation.participation_id.in_(list(new_scores)))
+            .values(participation_score=case(new_scores, value=EventParticipation.participation_id))
+            .execution_options(synchronize_session=False)
+        )
+        leaderboard.enqueue_deltas(db, deltas)
+        # One notification per graded participant, written by the outbox relay in batches
+        for participation_id, score in new_scores.items():
+            notifications.notify_on_commit(
+                db,
+                owners[participation_id],
+                "score",
+                f"You received a score of {score} for event '{event.event_name}'",
+                reference_id=participation_id
+            )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        error_detail = f"Database error: {str(e)}\n{traceback.format_exc()}"
+        print(error_detail)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating participation scores: {str(e)}"
+        )
+    return result
+
+def _get_event_for_grading(event_id: int, db: Session, current_user: User) -> Event:
+    # Only admins can update participation scores
+    if current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can update participation scores"
+        )
+
+    event = db.query(Event).filter(Event.event_id == event_id).first()
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+    return event
+
+@router.put("/events/{event_id}/participation-scores", response_model=ParticipationScoreBatchResult)
+async def update_participation_scores_batch(
+    event_id: int,
+    batch: ParticipationScoreBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Grade many participants of an event at once.
+    Accepts {participation_id: score} and/or {user_id: score} maps.
+    """
+    event = _get_event_for_grading(event_id, db, current_user)
+    return _apply_score_batch(
+        db, event,
+        batch.participation_scores or {},
+        batch.user_scores or {}
+    )
+
+@router.put("/events/{event_id}/participation-scores/csv", response_model=ParticipationScoreBatchResult)
+async def update_participation_scores_csv(
+    event_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Grade an event from a CSV upload.
+    The header must contain `score` and either `participation_id` or `user_id`.
+    """
+    event = _get_event_for_grading(event_id, db, current_user)
+
+    content = (await file.read()).decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(content))
+    fields = set(reader.fieldnames or [])
+    if "score" not in fields or not fields & {"participation_id", "user_id"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV header must contain 'score' and 'participation_id' or 'user_id'"
+        )
+
+    participation_scores = {}
+    user_scores = {}
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            score = int(row["score"])
+            if row.get("participation_id"):
+                participation_scores[int(row["participation_id"])] = score
+            elif row.get("user_id"):
+                user_scores[int(row["user_id"])] = score
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid value on CSV line {line_number}"
+            )
+
+    return _apply_score_batch(db, event, participation_scores, user_scores)
@@ -1,23 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple
 from sqlalchemy.exc import SQLAlchemyError
+from datetime import date
+from collections import defaultdict
+from itertools import groupby
+import calendar
 import traceback
 
-from api.database.connection import get_db
-from api.models.models import Event, Club, User, ClubMember
-from api.schemas.schemas import EventResponse, EventCreate, EventResponseDebug
+from api.database.connection import get_db, SessionLocal
+from api.models.models import Event, EventParticipation, Club, User, ClubMember
+from api.schemas.schemas import EventResponse, EventCreate, EventUpdate, EventResponseDebug, CalendarResponse
 from api.auth.utils import get_current_user
+from api.services import club_stats, deletion, feed, leaderboard, related, indexing, reminders, singleflight, streaming
 
 router = APIRouter(
     tags=["events"]
 )
 
+def _filter_events(query, from_date: Optional[date], to_date: Optional[date], club_id: Optional[int]):
+    if from_date is not None:
+        query = query.filter(Event.event_date >= from_date)
+    if to_date is not None:
+        query = query.filter(Event.event_date <= to_date)
+    if club_id is not None:
+        query = query.filter(Event.club_id == club_id)
+    if from_date is not None or to_date is not None:
+        return query.order_by(Event.event_date, Event.event_id)
+    return query.order_by(Event.event_id)
+
 @router.get("/events", response_model=List[EventResponseDebug])
-async def get_events(db: Session = Depends(get_db), 
+async def get_events(from_date: Optional[date] = Query(None, alias="from"),
+                   to_date: Optional[date] = Query(None, alias="to"),
+                   club_id: Optional[int] = None,
+                   stream: Optional[Literal["json", "ndjson"]] = Query(None, description="Stream rows as a JSON array or NDJSON"),
+                   db: Session = Depends(get_db), 
                    current_user: User = Depends(get_current_user)):
+    """Get events, optionally limited to an inclusive date range and/or a club"""
+    if stream is not None:
+        return streaming.stream_query(
+            lambda session: _filter_events(session.query(Event), from_date, to_date, club_id),
+            streaming.serializer(EventResponseDebug),
+            stream
+        )
     try:
-        events = db.query(Event).all()
+        events = _filter_events(db.query(Event), from_date, to_date, club_id).all()
         # Check if any events have None in created_at
         for event in events:
             if event.created_at is None:
@@ -33,38 +61,103 @@ async def get_events(db: Session = Depends(get_db),
             detail=f"Error fetching events: {str(e)}"
         )
 
+def _raw_event(event: Event) -> dict:
+    return {
+        "event_id": event.event_id,
+        "event_name": event.event_name,
+        "event_description": event.event_description,
+        "event_date": str(event.event_date) if event.event_date else None,
+        "event_image": event.event_image,
+        "club_id": event.club_id,
+        "created_at": str(event.created_at) if event.created_at else None
+    }
+
 @router.get("/events-raw")
-async def get_events_raw(db: Session = Depends(get_db),
+async def get_events_raw(stream: Optional[Literal["json", "ndjson"]] = Query(None, description="Stream rows as a JSON array or NDJSON"),
+                       db: Session = Depends(get_db),
                        current_user: User = Depends(get_current_user)):
     """Fallback endpoint that returns events without model validation"""
+    if stream is not None:
+        # The JSON array keeps the {"events": [...]} shape; NDJSON is one event per line
+        return streaming.stream_query(
+            lambda session: session.query(Event).order_by(Event.event_id),
+            streaming.dict_serializer(_raw_event),
+            stream,
+            prefix='{"events": ',
+            suffix='}'
+        )
     try:
         events = db.query(Event).all()
         # Manually convert to dict to avoid pydantic validation
-        result = []
-        for event in events:
-            event_dict = {
-                "event_id": event.event_id,
-                "event_name": event.event_name,
-                "event_description": event.event_description,
-                "event_date": str(event.event_date) if event.event_date else None,
-                "event_image": event.event_image,
-                "club_id": event.club_id,
-                "created_at": str(event.created_at) if event.created_at else None
-            }
-            result.append(event_dict)
+        result = [_raw_event(event) for event in events]
         return {"events": result}
     except Exception as e:
         error_detail = f"Error in raw events: {str(e)}\n{traceback.format_exc()}"
         print(error_detail)
         return {"error": str(e), "traceback": str(traceback.format_exc())}
 
+@router.get("/events/calendar", response_model=CalendarResponse)
+async def get_events_calendar(year: int = Query(..., ge=1900, le=9999),
+                            month: int = Query(..., ge=1, le=12),
+                            club_id: Optional[int] = None,
+                            stubs_per_day: int = Query(3, ge=0, le=50),
+                            db: Session = Depends(get_db),
+                            current_user: User = Depends(get_current_user)):
+    """
+    Per-day event counts and compact event stubs for a month view.
+    A single indexed query fetches only the stub columns, which are then bucketed by day.
+    """
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+
+    query = db.query(Event.event_id, Event.event_name, Event.event_date, Event.club_id).filter(
+        Event.event_date >= first_day,
+        Event.event_date <= last_day
+    )
+    if club_id is not None:
+        query = query.filter(Event.club_id == club_id)
+    rows = query.order_by(Event.event_date, Event.event_id).all()
+
+    days = []
+    for day, day_rows in groupby(rows, key=lambda row: row.event_date):
+        day_rows = list(day_rows)
+        days.append({
+            "date": day,
+            "count": len(day_rows),
+            "events": [row._asdict() for row in day_rows[:stubs_per_day]]
+        })
+    return {"year": year, "month": month, "days": days}
+
+def _load_event(event_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        event = db.query(Event).filter(Event.event_id == event_id).first()
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return EventResponse.model_validate(event).model_dump()
+    finally:
+        db.close()
+
 @router.get("/events/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int, db: Session = Depends(get_db), 
+async def get_event(event_id: int, db: Session = Depends(get_db),
                   current_user: User = Depends(get_current_user)):
+    # Hand the connection back while waiting, so a burst of waiters cannot starve the flight of one
+    db.close()
+    # Every signed-in user sees the same event, so identical concurrent requests share one query
+    return await singleflight.do(("event", event_id), _load_event, event_id)
+
+@router.get("/events/{event_id}/related", response_model=List[EventResponse])
+async def get_related_events(event_id: int, limit: int = Query(5, ge=1, le=20),
+                           db: Session = Depends(get_db),
+                           current_user: User = Depends(get_current_user)):
+    """Events with the most similar name and description"""
     event = db.query(Event).filter(Event.event_id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    return event
+
+    related_ids = related.related(db, "event", event_id, limit)
+    events = {other.event_id: other for other in db.query(Event).filter(Event.event_id.in_(related_ids))}
+    return [events[other_id] for other_id in related_ids if other_id in events]
 
 @router.post("/events", response_model=EventResponse)
 async def create_event(event_data: EventCreate, db: Session = Depends(get_db), 
@@ -106,6 +199,85 @@ async def create_event(event_data: EventCreate, db: Session = Depends(get_db),
     )
     
     db.add(new_event)
+    club_stats.event_created(db, new_event.club_id, new_event.event_date)
+    indexing.index_on_commit(db, "event", new_event)
+    feed.invalidate_club_on_commit(db, new_event.club_id)
+    reminders.schedule(db, new_event)
     db.commit()
     db.refresh(new_event)
-    return new_event 
\ No newline at end of file
+    return new_event
+
+def _move_scores(db: Session, event: Event, old_date: Optional[date]):
+    """Move the event's scores to the semester leaderboard of its new date."""
+    old_scopes = set(leaderboard.scopes_for_event(event.club_id, old_date))
+    new_scopes = set(leaderboard.scopes_for_event(event.club_id, event.event_date))
+    if old_scopes == new_scopes:
+        return
+    deltas: Dict[Tuple[str, int], int] = defaultdict(int)
+    scored = db.query(
+        EventParticipation.user_id, func.sum(EventParticipation.participation_score)
+    ).filter(EventParticipation.event_id == event.event_id).group_by(EventParticipation.user_id)
+    for user_id, total in scored:
+        for scope in old_scopes - new_scopes:
+            deltas[(scope, user_id)] -= int(total or 0)
+        for scope in new_scopes - old_scopes:
+            deltas[(scope, user_id)] += int(total or 0)
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        leaderboard.apply_deltas(db, deltas)
+
+@router.put("/events/{event_id}", response_model=EventResponse)
+async def update_event(event_id: int, event_data: EventUpdate, db: Session = Depends(get_db),
+                       current_user: User = Depends(get_current_user)):
+    event = db.query(Event).filter(Event.event_id == event_id).first()
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+
+    # Only the leader of the event's club or an admin can edit it
+    club = db.query(Club).filter(Club.club_id == event.club_id).first()
+    if current_user.role != 'admin' and (club is None or club.leader_id != current_user.user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the club leader or admins can update the event"
+        )
+
+    old_date = event.event_date
+    for key, value in event_data.model_dump(exclude_unset=True, exclude_none=True).items():
+        setattr(event, key, value)
+
+    if event.event_date != old_date:
+        # Keeps upcoming counts and semester leaderboards in step; the old reminder job sees the new date and does nothing
+        club_stats.event_deleted(db, event.club_id, old_date)
+        club_stats.event_created(db, event.club_id, event.event_date)
+        _move_scores(db, event, old_date)
+        reminders.schedule(db, event)
+    indexing.index_on_commit(db, "event", event)
+    feed.invalidate_club_on_commit(db, event.club_id)
+    db.commit()
+    db.refresh(event)
+    return event
+
+@router.delete("/events/{event_id}", status_code=204)
+async def delete_event(event_id: int, db: Session = Depends(get_db),
+                       current_user: User = Depends(get_current_user)):
+    event = db.query(Event).filter(Event.event_id == event_id).first()
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+
+    # Only the leader of the event's club or an admin can delete it
+    club = db.query(Club).filter(Club.club_id == event.club_id).first()
+    if current_user.role != 'admin' and (club is None or club.leader_id != current_user.user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the club leader or admins can delete the event"
+        )
+
+    # Deletes participations and their notifications, keeping counters and leaderboards in step
+    deletion.delete_event(db, event)
+    return None
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from api.database.connection import get_db
+from api.models.models import User
+from api.schemas.schemas import LeaderboardEntryResponse, LeaderboardRankResponse
+from api.auth.utils import get_current_user
+from api.services import leaderboard
+
+router = APIRouter(
+    tags=["leaderboards"]
+)
+
+def _resolve_scope(club_id: Optional[int], semester: Optional[str]) -> str:
+    if club_id is not None and semester is not None:
+        raise HTTPException(status_code=400, detail="Use either club_id or semester, not both")
+    if club_id is not None:
+        return leaderboard.club_scope(club_id)
+    if semester is not None:
+        return leaderboard.semester_scope(semester)
+    return leaderboard.GLOBAL_SCOPE
+
+@router.get("/leaderboard", response_model=List[LeaderboardEntryResponse])
+async def get_leaderboard(
+    club_id: Optional[int] = None,
+    semester: Optional[str] = Query(None, description="e.g. 2025-fall or 2026-spring"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Top participants globally, for a club, or for a semester"""
+    return leaderboard.top(db, _resolve_scope(club_id, semester), limit)
+
+@router.get("/leaderboard/users/{user_id}", response_model=LeaderboardRankResponse)
+async def get_user_rank(
+    user_id: int,
+    club_id: Optional[int] = None,
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Rank and total score of a user in the requested leaderboard"""
+    scope = _resolve_scope(club_id, semester)
+    result = leaderboard.rank_of(db, scope, user_id)
+    if result is None:
+        return LeaderboardRankResponse(scope=scope, user_id=user_id)
+    rank, total_score = result
+    return LeaderboardRankResponse(scope=scope, user_id=user_id, rank=rank, total_score=total_score)
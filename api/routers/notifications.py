@@ -0,0 +1,172 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import asyncio
+import json
+import os
+
+from api.database.connection import get_db, SessionLocal
+from api.models.models import User, Notification
+from api.schemas.schemas import (
+    AnnouncementNotificationResponse, NotificationListItem, NotificationResponse, UnreadCountResponse
+)
+from api.auth.utils import get_current_user, optional_oauth2_scheme, user_for_token
+from api.services import push, unread_counts, announcements
+
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("SSE_KEEPALIVE_SECONDS", "15"))
+
+router = APIRouter(
+    tags=["notifications"]
+)
+
+@router.get("/users/me/notifications", response_model=List[NotificationListItem])
+async def get_my_notifications(
+    unread_only: bool = False,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the current user's notifications and club announcements, most recent first."""
+    query = db.query(Notification).filter(Notification.user_id == current_user.user_id)
+
+    # Apply unread filter if requested
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+
+    items: List[NotificationListItem] = [
+        NotificationResponse.model_validate(notification)
+        for notification in query.order_by(Notification.notification_date.desc()).limit(limit)
+    ]
+    # Announcements are stored once per club and merged in here
+    items.extend(
+        AnnouncementNotificationResponse(**announcement)
+        for announcement in announcements.list_for_user(db, current_user.user_id, limit, unread_only)
+    )
+    items.sort(key=lambda item: item.notification_date, reverse=True)
+    return items[:limit]
+
+@router.get("/users/me/notifications/unread-count", response_model=UnreadCountResponse)
+async def get_my_unread_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Number of unread notifications, for badges."""
+    return {
+        "unread_count": unread_counts.get(db, current_user.user_id)
+        + announcements.unread_count(db, current_user.user_id)
+    }
+
+@router.get("/users/me/notifications/stream")
+async def stream_my_notifications(
+    token: Optional[str] = Query(None),
+    header_token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """
+    Server-Sent Events stream of the current user's new notifications.
+    Browsers' EventSource cannot send headers, so the auth token may also be
+    passed as ?token=.
+    """
+    # Look the user up with a short-lived session so the stream does not hold a connection
+    db = SessionLocal()
+    try:
+        user = user_for_token(db, header_token or token)
+        user_id = user.user_id if user else None
+    finally:
+        db.close()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication token"
+        )
+
+    async def events():
+        queue = push.subscribe(user_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            push.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.put("/notifications/{notification_id}/read", response_model=NotificationResponse)
+async def mark_notification_read(
+    notification_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark one of the current user's notifications as read."""
+    notification = db.query(Notification).filter(
+        Notification.notification_id == notification_id,
+        Notification.user_id == current_user.user_id
+    ).first()
+
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+
+    if not notification.is_read:
+        # Conditional update so concurrent requests only decrement the counter once
+        marked = db.query(Notification).filter(
+            Notification.notification_id == notification_id,
+            Notification.is_read == False
+        ).update({"is_read": True}, synchronize_session=False)
+        unread_counts.adjust(db, current_user.user_id, -marked)
+    db.commit()
+    db.refresh(notification)
+    return notification
+
+@router.put("/users/me/notifications/read-all", response_model=dict)
+async def mark_all_notifications_read(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark all of the current user's notifications as read."""
+    result = db.query(Notification).filter(
+        Notification.user_id == current_user.user_id,
+        Notification.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
+    unread_counts.adjust(db, current_user.user_id, -result)
+    result += announcements.mark_all_read(db, current_user.user_id)
+
+    db.commit()
+    return {"message": f"Marked {result} notifications as read"}
+
+@router.delete("/notifications/{notification_id}", status_code=204)
+async def delete_notification(
+    notification_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete one of the current user's notifications."""
+    notification = db.query(Notification).filter(
+        Notification.notification_id == notification_id,
+        Notification.user_id == current_user.user_id
+    ).first()
+
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+
+    # Delete it as unread first, so a concurrent mark-read cannot also decrement the counter
+    deleted_unread = db.query(Notification).filter(
+        Notification.notification_id == notification_id,
+        Notification.is_read == False
+    ).delete(synchronize_session=False)
+    unread_counts.adjust(db, current_user.user_id, -deleted_unread)
+    if not deleted_unread:
+        db.query(Notification).filter(
+            Notification.notification_id == notification_id
+        ).delete(synchronize_session=False)
+    db.commit()
+    return None
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from api.database.connection import get_db
+from api.models.models import User
+from api.schemas.schemas import SearchResponse, SuggestionResponse
+from api.auth.utils import get_current_user
+from api.services import search as search_service, suggest as suggest_service
+
+router = APIRouter(
+    tags=["search"]
+)
+
+@router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[str] = Query(None, description="Comma separated subset of club,event,user"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ranked full-text search over clubs, events and users"""
+    kinds = search_service.KINDS
+    if types:
+        kinds = [kind.strip() for kind in types.split(",") if kind.strip()]
+        unknown = set(kinds) - set(search_service.KINDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+
+    total, results = search_service.search(db, q, kinds, limit, offset)
+    return SearchResponse(query=q, total=total, limit=limit, offset=offset, results=results)
+
+@router.get("/suggest", response_model=List[SuggestionResponse])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[str] = Query(None, description="Comma separated subset of user,club"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead lookup of users and clubs by name prefix"""
+    kinds = suggest_service.KINDS
+    if types:
+        kinds = [kind.strip() for kind in types.split(",") if kind.strip()]
+        unknown = set(kinds) - set(suggest_service.KINDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown suggestion types: {', '.join(sorted(unknown))}")
+
+    return suggest_service.suggest(db, q, kinds, limit)
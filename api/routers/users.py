@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Literal, Optional
 
 from api.database.connection import get_db
-from api.models.models import User, ClubMember
-from api.schemas.schemas import UserResponse, ClubMemberWithClubResponse, RoleAssignRequest, ProfilePictureUpdate, ProfileUpdate, CompleteProfileUpdate
+from api.models.models import User, ClubMember, Club, ClubStats
+from api.schemas.schemas import UserResponse, ClubMemberWithClubResponse, RoleAssignRequest, ProfilePictureUpdate, ProfileUpdate, CompleteProfileUpdate, FeedResponse, ClubResponse
 from api.auth.utils import get_current_user
+from api.services import feed, recommendations, indexing, streaming
 
 router = APIRouter(
     tags=["users"]
@@ -17,9 +18,16 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_all_users(db: Session = Depends(get_db),
+async def get_all_users(stream: Optional[Literal["json", "ndjson"]] = Query(None, description="Stream rows as a JSON array or NDJSON"),
+                      db: Session = Depends(get_db),
                       current_user: User = Depends(get_current_user)):
     """Get all users regardless of role"""
+    if stream is not None:
+        return streaming.stream_query(
+            lambda session: session.query(User).order_by(User.user_id),
+            streaming.serializer(UserResponse),
+            stream
+        )
     return db.query(User).all()
 
 @router.get("/students", response_model=List[UserResponse])
@@ -49,6 +57,44 @@ async def get_my_clubs(db: Session = Depends(get_db),
     
     return user_clubs
 
+@router.get("/users/me/feed", response_model=FeedResponse)
+async def get_my_feed(cursor: Optional[str] = None,
+                    limit: int = Query(20, ge=1, le=100),
+                    db: Session = Depends(get_db),
+                    current_user: User = Depends(get_current_user)):
+    """Upcoming events across all of the current user's clubs, soonest first"""
+    try:
+        return feed.get_feed(db, current_user.user_id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/users/me/recommended-clubs", response_model=List[ClubResponse])
+async def get_recommended_clubs(limit: int = Query(10, ge=1, le=20),
+                              db: Session = Depends(get_db),
+                              current_user: User = Depends(get_current_user)):
+    """Clubs the current user may want to join, from precomputed recommendations"""
+    club_ids = recommendations.for_user(db, current_user.user_id)[:limit]
+
+    if len(club_ids) < limit:
+        # New users and users without signal get the most popular clubs they haven't joined
+        excluded = set(club_ids) | {
+            club_id for (club_id,) in db.query(ClubMember.club_id).filter(
+                ClubMember.user_id == current_user.user_id
+            )
+        }
+        popular = db.query(ClubStats.club_id).order_by(ClubStats.member_count.desc()).limit(
+            limit + len(excluded)
+        )
+        for (club_id,) in popular:
+            if len(club_ids) >= limit:
+                break
+            if club_id not in excluded:
+                club_ids.append(club_id)
+                excluded.add(club_id)
+
+    clubs = {club.club_id: club for club in db.query(Club).filter(Club.club_id.in_(club_ids))}
+    return [clubs[club_id] for club_id in club_ids if club_id in clubs]
+
 @router.get("/users/{user_id}/clubs", response_model=List[ClubMemberWithClubResponse])
 async def get_user_clubs(user_id: int, db: Session = Depends(get_db),
                        current_user: User = Depends(get_current_user)):
@@ -148,6 +194,7 @@ async def update_profile(
         user.interests = profile_data.interests
     
     # Commit changes to the database
+    indexing.index_on_commit(db, "user", user)
     db.commit()
     db.refresh(user)
     
@@ -197,6 +244,7 @@ async def update_complete_profile(
         user.profile_picture = profile_data.profile_picture
     
     # Commit changes to the database
+    indexing.index_on_commit(db, "user", user)
     db.commit()
     db.refresh(user)
     
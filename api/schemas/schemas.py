@@ -1,6 +1,6 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 from datetime import datetime, date
-from typing import List, Optional, Literal, Union, Any
+from typing import Annotated, List, Optional, Literal, Union, Any, Dict
 
 # Pydantic schemas
 class UserCreate(BaseModel):
@@ -55,6 +55,11 @@ class ClubCreate(BaseModel):
     pic: Optional[str] = None
     leader_id: int
 
+class ClubUpdate(BaseModel):
+    club_name: Optional[str] = None
+    description: Optional[str] = None
+    pic: Optional[str] = None
+
 class ClubResponse(BaseModel):
     club_id: int
     club_name: str
@@ -62,6 +67,9 @@ class ClubResponse(BaseModel):
     pic: Optional[str] = None
     leader_id: int
     created_at: Optional[datetime] = None
+    member_count: int = 0
+    event_count: int = 0
+    upcoming_event_count: int = 0
 
     class Config:
          from_attributes = True
@@ -148,6 +156,12 @@ class EventCreate(BaseModel):
     event_image: Optional[str] = None
     club_id: int
 
+class EventUpdate(BaseModel):
+    event_name: Optional[str] = None
+    event_description: Optional[str] = None
+    event_date: Optional[date] = None
+    event_image: Optional[str] = None
+
 # Debug version that allows for more flexible date handling
 class EventResponseDebug(BaseModel):
     event_id: int
@@ -287,3 +301,154 @@ class EventParticipationWithEventResponse(BaseModel):
     
     class Config:
         from_attributes = True 
+
+
+# Batch grading: scores keyed by participation_id and/or user_id
+class ParticipationScoreBatch(BaseModel):
+    participation_scores: Optional[Dict[int, int]] = None
+    user_scores: Optional[Dict[int, int]] = None
+
+class ParticipationScoreBatchResult(BaseModel):
+    event_id: int
+    updated: int
+    missing_participation_ids: List[int] = []
+    missing_user_ids: List[int] = []
+
+
+# Leaderboard Schemas
+class LeaderboardEntryResponse(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    total_score: int
+
+class LeaderboardRankResponse(BaseModel):
+    scope: str
+    user_id: int
+    rank: Optional[int] = None
+    total_score: int = 0
+
+
+# Search Schemas
+class SearchResult(BaseModel):
+    kind: Literal['club', 'event', 'user']
+    id: int
+    title: str
+    snippet: Optional[str] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchResult]
+
+
+class SuggestionResponse(BaseModel):
+    kind: Literal['user', 'club']
+    id: int
+    label: str
+
+
+# Calendar Schemas
+class EventStub(BaseModel):
+    event_id: int
+    event_name: str
+    event_date: date
+    club_id: int
+
+class CalendarDay(BaseModel):
+    date: date
+    count: int
+    events: List[EventStub]
+
+class CalendarResponse(BaseModel):
+    year: int
+    month: int
+    days: List[CalendarDay]
+
+
+class FeedResponse(BaseModel):
+    events: List[EventResponse]
+    next_cursor: Optional[str] = None
+
+
+class NotificationResponse(BaseModel):
+    source: Literal['notification'] = 'notification'
+    notification_id: int
+    notification_type: str
+    reference_id: Optional[int] = None
+    notification_text: str
+    is_read: bool
+    notification_date: datetime
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# A club announcement merged into a member's notification list
+class AnnouncementNotificationResponse(BaseModel):
+    source: Literal['announcement'] = 'announcement'
+    announcement_id: int
+    club_id: int
+    notification_type: Literal['announcement'] = 'announcement'
+    notification_text: str
+    is_read: bool
+    notification_date: datetime
+    created_at: datetime
+
+NotificationListItem = Annotated[
+    Union[NotificationResponse, AnnouncementNotificationResponse], Field(discriminator="source")
+]
+
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+
+class AnnouncementCreate(BaseModel):
+    announcement_text: str
+
+class AnnouncementResponse(BaseModel):
+    announcement_id: int
+    club_id: int
+    author_id: Optional[int] = None
+    announcement_text: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CompressionEncodingStats(BaseModel):
+    encoding: str
+    responses: int
+    bytes_in: int
+    bytes_out: int
+    saved_bytes: int
+    ratio: float
+    cpu_ms: float
+    cache_hits: int
+
+class CompressionStatsResponse(BaseModel):
+    # Stats are kept per worker process
+    pid: int
+    available_encodings: List[str]
+    encodings: List[CompressionEncodingStats]
+    cache_entries: int
+    cache_bytes: int
+
+
+class UserImportError(BaseModel):
+    line: int
+    username: Optional[str] = None
+    error: str
+
+class UserImportResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[UserImportError]
@@ -0,0 +1,208 @@
+"""
+Club-wide announcements, stored once per club and merged into each member's
+notification stream when it is read.
+
+Posting writes one row regardless of club size. Each (user, club) pair has
+at most one read marker: a high-water mark `read_through` plus the ids above
+it that were read individually. Marking everything read moves the mark to
+the club's newest announcement and clears the exceptions. Marking one
+announcement read moves the mark past everything posted before the user
+joined, adds the announcement to the exceptions, then advances the mark over
+any run of read ids so the exception list stays short.
+
+Members only see announcements posted since they joined the club.
+
+The unread count behind the notification badge is cached per user for
+ANNOUNCEMENT_UNREAD_CACHE_TTL seconds, so badge polls cost one membership
+lookup and a cache read instead of a grouped count. The entry is tagged with
+each of the user's clubs and with the user: posting bumps the club's tag and
+marking read bumps the user's, once the change commits. The user's
+memberships and join times are part of the key, so joining or leaving a
+club starts a new entry.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, contains_eager
+
+from api.cache import generations, get_cache
+from api.models.models import AnnouncementReadMarker, Club, ClubAnnouncement, ClubMember
+
+ANNOUNCEMENT_UNREAD_CACHE_TTL = float(os.environ.get("ANNOUNCEMENT_UNREAD_CACHE_TTL", "300"))
+
+def club_tag(club_id: int) -> str:
+    return f"announcements:club:{club_id}"
+
+def user_tag(user_id: int) -> str:
+    return f"announcements:user:{user_id}"
+
+def _markers(db: Session, user_id: int) -> Dict[int, Tuple[int, Set[int]]]:
+    return {
+        marker.club_id: (marker.read_through or 0, set(marker.read_ids or []))
+        for marker in db.query(AnnouncementReadMarker).filter(AnnouncementReadMarker.user_id == user_id)
+    }
+
+def _visible(db: Session, user_id: int, *columns):
+    """Announcements of the user's clubs posted since they joined."""
+    query = db.query(*columns) if columns else db.query(ClubAnnouncement)
+    return query.select_from(ClubAnnouncement).join(
+        ClubMember,
+        and_(ClubMember.club_id == ClubAnnouncement.club_id, ClubMember.user_id == user_id)
+    ).filter(
+        or_(ClubMember.joined_at == None, ClubAnnouncement.created_at >= ClubMember.joined_at)
+    )
+
+def _unread_only(query, user_id: int):
+    """Drop announcements under the read mark. Exceptions above it still need filtering."""
+    return query.outerjoin(
+        AnnouncementReadMarker,
+        and_(
+            AnnouncementReadMarker.user_id == user_id,
+            AnnouncementReadMarker.club_id == ClubAnnouncement.club_id
+        )
+    ).filter(or_(
+        AnnouncementReadMarker.read_through == None,
+        ClubAnnouncement.announcement_id > AnnouncementReadMarker.read_through
+    ))
+
+def _is_read(announcement: ClubAnnouncement, markers: Dict[int, Tuple[int, Set[int]]]) -> bool:
+    read_through, read_ids = markers.get(announcement.club_id, (0, set()))
+    return announcement.announcement_id <= read_through or announcement.announcement_id in read_ids
+
+def as_notification(announcement: ClubAnnouncement, is_read: bool) -> dict:
+    """Shape an announcement like an AnnouncementNotificationResponse."""
+    return {
+        "source": "announcement",
+        "announcement_id": announcement.announcement_id,
+        "club_id": announcement.club_id,
+        "notification_type": "announcement",
+        "notification_text": f"{announcement.club.club_name}: {announcement.announcement_text}",
+        "is_read": is_read,
+        "notification_date": announcement.created_at,
+        "created_at": announcement.created_at
+    }
+
+def post(db: Session, club_id: int, author_id: int, text: str) -> ClubAnnouncement:
+    announcement = ClubAnnouncement(club_id=club_id, author_id=author_id, announcement_text=text)
+    db.add(announcement)
+    generations.bump_on_commit(db, club_tag(club_id))
+    db.commit()
+    db.refresh(announcement)
+    return announcement
+
+def visible_to(db: Session, user_id: int, announcement_id: int) -> Optional[ClubAnnouncement]:
+    return _visible(db, user_id).filter(ClubAnnouncement.announcement_id == announcement_id).first()
+
+def list_for_user(db: Session, user_id: int, limit: int, unread_only: bool = False) -> List[dict]:
+    """Newest announcements of the user's clubs, as notification dicts."""
+    markers = _markers(db, user_id)
+    query = _visible(db, user_id).join(Club, Club.club_id == ClubAnnouncement.club_id).options(
+        contains_eager(ClubAnnouncement.club)
+    )
+    extra = 0
+    if unread_only:
+        query = _unread_only(query, user_id)
+        # Exceptions are filtered below, so fetch enough rows to make up for them
+        extra = sum(len(read_ids) for _, read_ids in markers.values())
+
+    items = []
+    for announcement in query.order_by(ClubAnnouncement.announcement_id.desc()).limit(limit + extra):
+        is_read = _is_read(announcement, markers)
+        if unread_only and is_read:
+            continue
+        items.append(as_notification(announcement, is_read))
+    return items[:limit]
+
+def _unread_by_club(db: Session, user_id: int) -> Dict[int, int]:
+    markers = _markers(db, user_id)
+    counts = _unread_only(
+        _visible(db, user_id, ClubAnnouncement.club_id, func.count()), user_id
+    ).group_by(ClubAnnouncement.club_id)
+    return {
+        club_id: max(count - len(markers.get(club_id, (0, set()))[1]), 0)
+        for club_id, count in counts
+    }
+
+def unread_count(db: Session, user_id: int) -> int:
+    memberships = db.query(ClubMember.club_id, ClubMember.joined_at).filter(
+        ClubMember.user_id == user_id
+    ).order_by(ClubMember.club_id).all()
+    if not memberships:
+        return 0
+    raw = "|".join(f"{club_id}@{joined_at}" for club_id, joined_at in memberships)
+    key = f"unread:{user_id}:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return get_cache("announcements").get_or_set(
+        key,
+        lambda: sum(_unread_by_club(db, user_id).values()),
+        ttl=ANNOUNCEMENT_UNREAD_CACHE_TTL,
+        tags=[user_tag(user_id)] + [club_tag(club_id) for club_id, _ in memberships]
+    )
+
+def _save_marker(db: Session, user_id: int, club_id: int, read_through: int, read_ids: List[int]):
+    marker = db.query(AnnouncementReadMarker).filter(
+        AnnouncementReadMarker.user_id == user_id,
+        AnnouncementReadMarker.club_id == club_id
+    ).first()
+    if marker is not None:
+        marker.read_through = read_through
+        # Assign a new list so the JSON column is seen as changed
+        marker.read_ids = sorted(read_ids)
+        return
+    try:
+        with db.begin_nested():
+            db.add(AnnouncementReadMarker(
+                user_id=user_id, club_id=club_id, read_through=read_through, read_ids=sorted(read_ids)
+            ))
+    except IntegrityError:
+        # Created by a concurrent request, retry as an update
+        _save_marker(db, user_id, club_id, read_through, read_ids)
+
+def mark_read(db: Session, user_id: int, announcement: ClubAnnouncement):
+    """Mark one announcement read without committing."""
+    read_through, read_ids = _markers(db, user_id).get(announcement.club_id, (0, set()))
+    if announcement.announcement_id <= read_through or announcement.announcement_id in read_ids:
+        return
+    read_ids.add(announcement.announcement_id)
+
+    # Announcements from before the user joined were never shown, so they count
+    # as read. Ids grow with time, so the mark jumps past them in one step.
+    joined_at = db.query(ClubMember.joined_at).filter(
+        ClubMember.club_id == announcement.club_id,
+        ClubMember.user_id == user_id
+    ).scalar()
+    if joined_at is not None:
+        before_join = db.query(func.max(ClubAnnouncement.announcement_id)).filter(
+            ClubAnnouncement.club_id == announcement.club_id,
+            ClubAnnouncement.created_at < joined_at
+        ).scalar()
+        read_through = max(read_through, before_join or 0)
+        read_ids = {announcement_id for announcement_id in read_ids if announcement_id > read_through}
+
+    # Advance the mark over the run of read ids directly above it
+    following = db.query(ClubAnnouncement.announcement_id).filter(
+        ClubAnnouncement.club_id == announcement.club_id,
+        ClubAnnouncement.announcement_id > read_through
+    ).order_by(ClubAnnouncement.announcement_id).limit(len(read_ids) + 1)
+    for (announcement_id,) in following:
+        if announcement_id not in read_ids:
+            break
+        read_through = announcement_id
+        read_ids.discard(announcement_id)
+
+    _save_marker(db, user_id, announcement.club_id, read_through, list(read_ids))
+    generations.bump_on_commit(db, user_tag(user_id))
+
+def mark_all_read(db: Session, user_id: int) -> int:
+    """Mark every announcement of the user's clubs read without committing. Returns how many were unread."""
+    unread = _unread_by_club(db, user_id)
+    newest = _visible(db, user_id, ClubAnnouncement.club_id, func.max(ClubAnnouncement.announcement_id)).group_by(
+        ClubAnnouncement.club_id
+    )
+    for club_id, announcement_id in newest:
+        if unread.get(club_id):
+            _save_marker(db, user_id, club_id, announcement_id, [])
+    generations.bump_on_commit(db, user_tag(user_id))
+    return sum(unread.values())
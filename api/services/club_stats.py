@@ -0,0 +1,170 @@
+"""
+Materialized per-club counters stored in `club_stats`.
+
+Join, leave, approve, event creation and deletion adjust the counters in the
+same transaction as the change, so clubs can be listed with their counts from
+a single joined query. `upcoming_event_count` also depends on the calendar,
+so it is recomputed once per day by `roll_upcoming`. Every change bumps the
+club's cache tag once it commits, so cached club responses are refreshed.
+
+Run `python -m api.services.club_stats verify` to report drift and
+`python -m api.services.club_stats rebuild` to repair it.
+"""
+import argparse
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from api.cache import generations
+from api.models.models import ClubStats, ClubMember, Event, Club
+
+_rolled_on = None
+
+def _counts_for_club(db: Session, club_id: int, today: date) -> Tuple[int, int, int]:
+    member_count = db.query(func.count()).select_from(ClubMember).filter(
+        ClubMember.club_id == club_id
+    ).scalar()
+    event_count = db.query(func.count()).select_from(Event).filter(
+        Event.club_id == club_id
+    ).scalar()
+    upcoming_event_count = db.query(func.count()).select_from(Event).filter(
+        Event.club_id == club_id,
+        Event.event_date >= today
+    ).scalar()
+    return member_count, event_count, upcoming_event_count
+
+def adjust(db: Session, club_id: int, members: int = 0, events: int = 0, upcoming: int = 0):
+    """
+    Add deltas to a club's counters without committing.
+    Clubs created before the stats table existed get their row computed from
+    scratch instead, after flushing the caller's pending change.
+    """
+    generations.bump_on_commit(db, f"club:{club_id}")
+    result = db.execute(
+        update(ClubStats)
+        .where(ClubStats.club_id == club_id)
+        .values(
+            member_count=ClubStats.member_count + members,
+            event_count=ClubStats.event_count + events,
+            upcoming_event_count=ClubStats.upcoming_event_count + upcoming
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+
+    db.flush()
+    today = date.today()
+    member_count, event_count, upcoming_event_count = _counts_for_club(db, club_id, today)
+    db.add(ClubStats(
+        club_id=club_id,
+        member_count=member_count,
+        event_count=event_count,
+        upcoming_event_count=upcoming_event_count,
+        upcoming_as_of=today
+    ))
+
+def member_joined(db: Session, club_id: int):
+    adjust(db, club_id, members=1)
+
+def member_left(db: Session, club_id: int):
+    adjust(db, club_id, members=-1)
+
+def event_created(db: Session, club_id: int, event_date: Optional[date]):
+    adjust(db, club_id, events=1, upcoming=1 if event_date and event_date >= date.today() else 0)
+
+def event_deleted(db: Session, club_id: int, event_date: Optional[date]):
+    adjust(db, club_id, events=-1, upcoming=-1 if event_date and event_date >= date.today() else 0)
+
+def roll_upcoming(db: Session):
+    """
+    Recompute upcoming counts for rows not yet refreshed today.
+    The in-process guard makes this a no-op after the first call of the day,
+    and the WHERE clause keeps concurrent workers from redoing each other's work.
+    """
+    global _rolled_on
+    today = date.today()
+    if _rolled_on == today:
+        return
+
+    upcoming = select(func.count()).where(
+        Event.club_id == ClubStats.club_id,
+        Event.event_date >= today
+    ).scalar_subquery()
+    result = db.execute(
+        update(ClubStats)
+        .where((ClubStats.upcoming_as_of == None) | (ClubStats.upcoming_as_of < today))
+        .values(upcoming_event_count=upcoming, upcoming_as_of=today)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        generations.bump_on_commit(db, "clubs")
+    db.commit()
+    _rolled_on = today
+
+def compute(db: Session) -> Dict[int, Tuple[int, int, int]]:
+    """Expected (member_count, event_count, upcoming_event_count) for every club."""
+    today = date.today()
+    expected = {club_id: [0, 0, 0] for (club_id,) in db.query(Club.club_id)}
+
+    for club_id, count in db.query(ClubMember.club_id, func.count()).group_by(ClubMember.club_id):
+        if club_id in expected:
+            expected[club_id][0] = count
+    for club_id, count in db.query(Event.club_id, func.count()).group_by(Event.club_id):
+        if club_id in expected:
+            expected[club_id][1] = count
+    for club_id, count in db.query(Event.club_id, func.count()).filter(
+        Event.event_date >= today
+    ).group_by(Event.club_id):
+        if club_id in expected:
+            expected[club_id][2] = count
+
+    return {club_id: tuple(counts) for club_id, counts in expected.items()}
+
+def verify(db: Session) -> List[Tuple[int, Optional[Tuple[int, int, int]], Tuple[int, int, int]]]:
+    """Return (club_id, stored, expected) for every club whose counters drifted."""
+    stored = {
+        row.club_id: (row.member_count, row.event_count, row.upcoming_event_count)
+        for row in db.query(ClubStats)
+    }
+    return [
+        (club_id, stored.get(club_id), counts)
+        for club_id, counts in compute(db).items()
+        if stored.get(club_id) != counts
+    ]
+
+def rebuild(db: Session) -> int:
+    """Repair drifted rows and return how many were fixed."""
+    today = date.today()
+    drifted = verify(db)
+    for club_id, stored, (member_count, event_count, upcoming_event_count) in drifted:
+        db.merge(ClubStats(
+            club_id=club_id,
+            member_count=member_count,
+            event_count=event_count,
+            upcoming_event_count=upcoming_event_count,
+            upcoming_as_of=today
+        ))
+    db.commit()
+    return len(drifted)
+
+if __name__ == "__main__":
+    from api.database.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild club statistics")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "verify":
+            drifted = verify(db)
+            for club_id, stored, expected in drifted:
+                print(f"club {club_id}: stored {stored}, expected {expected}")
+            print(f"{len(drifted)} clubs drifted")
+        else:
+            print(f"Repaired {rebuild(db)} clubs")
+    finally:
+        db.close()
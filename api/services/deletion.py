@@ -0,0 +1,156 @@
+"""
+Set-based deletion of clubs and events with everything that hangs off them.
+
+The models declare no cascades, so removing only the club or event row would
+leave its memberships, join requests, participations and notifications
+behind. Here every dependent table is cleared with `DELETE ... WHERE` on a
+list of keys. The derived data is kept in step in the same transaction:
+leaderboard totals lose the deleted scores, unread counters lose the deleted
+unread notifications, the search index and feed caches are updated through
+the outbox, and cached club and leaderboard responses are invalidated
+through their cache tags.
+
+Rows are taken DELETE_CHUNK_SIZE at a time. For an ordinary club every
+table fits in one chunk, and the whole deletion is one transaction. For a
+very large club, each full chunk is committed on its own, so no statement
+or transaction holds locks on more than one chunk of rows. Each chunk
+carries its own leaderboard and counter adjustments, so the data is
+consistent after every commit. If a deletion is interrupted, running it
+again finishes it. The club or event row itself goes last, in the final
+transaction.
+"""
+import os
+from collections import defaultdict
+from typing import Iterator, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.cache import generations
+from api.models.models import (
+    AnnouncementReadMarker, Club, ClubAnnouncement, ClubJoinRequest, ClubMember, ClubStats,
+    Event, EventParticipation, LeaderboardEntry, Notification
+)
+from api.services import club_stats, feed, indexing, leaderboard, unread_counts
+
+DELETE_CHUNK_SIZE = int(os.environ.get("DELETE_CHUNK_SIZE", "2000"))
+# Notifications that point at a join request through reference_id
+JOIN_REQUEST_NOTIFICATION_TYPES = ("join_request", "approval", "rejection")
+
+def _chunks(db: Session, keys_query, chunk_size: int) -> Iterator[List]:
+    """
+    Yield lists of up to `chunk_size` keys until the query is exhausted. The
+    caller deletes each chunk, so the same query returns the next one. After a
+    full chunk the work so far is committed; a partial chunk is the last one
+    and is left for the caller's final commit.
+    """
+    while True:
+        keys = [key for (key,) in keys_query.limit(chunk_size)]
+        if keys:
+            yield keys
+        if len(keys) < chunk_size:
+            return
+        db.commit()
+
+def _delete_notifications(db: Session, *criteria):
+    unread = db.query(Notification.user_id, func.count()).filter(
+        *criteria, Notification.is_read == False
+    ).group_by(Notification.user_id).all()
+    db.query(Notification).filter(*criteria).delete(synchronize_session=False)
+    unread_counts.adjust_many(db, {user_id: -count for user_id, count in unread})
+
+def _delete_participations(db: Session, event_ids_query, include_club_scope: bool, chunk_size: int):
+    ids_query = db.query(EventParticipation.participation_id).filter(
+        EventParticipation.event_id.in_(event_ids_query)
+    ).order_by(EventParticipation.participation_id)
+    for participation_ids in _chunks(db, ids_query, chunk_size):
+        # Take the deleted scores off the leaderboards in the same transaction
+        deltas = defaultdict(int)
+        scored = db.query(
+            Event.club_id, Event.event_date, EventParticipation.user_id,
+            func.sum(EventParticipation.participation_score)
+        ).join(Event, Event.event_id == EventParticipation.event_id).filter(
+            EventParticipation.participation_id.in_(participation_ids)
+        ).group_by(Event.club_id, Event.event_date, EventParticipation.user_id)
+        for club_id, event_date, user_id, total in scored:
+            scopes = leaderboard.scopes_for_event(club_id if include_club_scope else None, event_date)
+            for scope in scopes:
+                deltas[(scope, user_id)] -= total or 0
+        leaderboard.apply_deltas(db, deltas)
+
+        _delete_notifications(
+            db,
+            Notification.notification_type == "score",
+            Notification.reference_id.in_(participation_ids)
+        )
+        db.query(EventParticipation).filter(
+            EventParticipation.participation_id.in_(participation_ids)
+        ).delete(synchronize_session=False)
+
+def delete_event(db: Session, event: Event, chunk_size: int = DELETE_CHUNK_SIZE):
+    """Delete an event with its participations, score notifications and reminders, then commit."""
+    event_id, club_id, event_date = event.event_id, event.club_id, event.event_date
+    _delete_participations(
+        db, db.query(Event.event_id).filter(Event.event_id == event_id), True, chunk_size
+    )
+    _delete_notifications(
+        db, Notification.notification_type == "event_reminder", Notification.reference_id == event_id
+    )
+    db.query(Event).filter(Event.event_id == event_id).delete(synchronize_session=False)
+    club_stats.event_deleted(db, club_id, event_date)
+    indexing.remove_on_commit(db, "event", event_id)
+    feed.invalidate_club_on_commit(db, club_id)
+    db.commit()
+
+def delete_club(db: Session, club: Club, chunk_size: int = DELETE_CHUNK_SIZE):
+    """Delete a club with its members, join requests, events, announcements and their notifications, then commit."""
+    club_id = club.club_id
+    club_event_ids = db.query(Event.event_id).filter(Event.club_id == club_id)
+
+    # The club's own leaderboard is dropped whole below, so only global and semester totals change
+    _delete_participations(db, club_event_ids, False, chunk_size)
+
+    for event_ids in _chunks(db, club_event_ids.order_by(Event.event_id), chunk_size):
+        _delete_notifications(
+            db, Notification.notification_type == "event_reminder", Notification.reference_id.in_(event_ids)
+        )
+        db.query(Event).filter(Event.event_id.in_(event_ids)).delete(synchronize_session=False)
+        for event_id in event_ids:
+            indexing.remove_on_commit(db, "event", event_id)
+
+    request_ids = db.query(ClubJoinRequest.request_id).filter(
+        ClubJoinRequest.club_id == club_id
+    ).order_by(ClubJoinRequest.request_id)
+    for ids in _chunks(db, request_ids, chunk_size):
+        _delete_notifications(
+            db,
+            Notification.notification_type.in_(JOIN_REQUEST_NOTIFICATION_TYPES),
+            Notification.reference_id.in_(ids)
+        )
+        db.query(ClubJoinRequest).filter(ClubJoinRequest.request_id.in_(ids)).delete(synchronize_session=False)
+
+    announcement_ids = db.query(ClubAnnouncement.announcement_id).filter(
+        ClubAnnouncement.club_id == club_id
+    ).order_by(ClubAnnouncement.announcement_id)
+    for ids in _chunks(db, announcement_ids, chunk_size):
+        db.query(ClubAnnouncement).filter(ClubAnnouncement.announcement_id.in_(ids)).delete(synchronize_session=False)
+
+    # Tables keyed by (club, user) are chunked by user
+    for model in (AnnouncementReadMarker, ClubMember):
+        user_ids = db.query(model.user_id).filter(model.club_id == club_id).order_by(model.user_id)
+        for ids in _chunks(db, user_ids, chunk_size):
+            db.query(model).filter(model.club_id == club_id, model.user_id.in_(ids)).delete(synchronize_session=False)
+
+    scope = leaderboard.club_scope(club_id)
+    entries = db.query(LeaderboardEntry.user_id).filter(LeaderboardEntry.scope == scope).order_by(LeaderboardEntry.user_id)
+    for ids in _chunks(db, entries, chunk_size):
+        db.query(LeaderboardEntry).filter(
+            LeaderboardEntry.scope == scope, LeaderboardEntry.user_id.in_(ids)
+        ).delete(synchronize_session=False)
+
+    db.query(ClubStats).filter(ClubStats.club_id == club_id).delete(synchronize_session=False)
+    db.query(Club).filter(Club.club_id == club_id).delete(synchronize_session=False)
+    indexing.remove_on_commit(db, "club", club_id)
+    generations.bump_on_commit(db, f"club:{club_id}", leaderboard.cache_tag(scope))
+    feed.invalidate_club_on_commit(db, club_id)
+    db.commit()
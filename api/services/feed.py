@@ -0,0 +1,137 @@
+"""
+Personalized upcoming-events feed.
+
+A feed page is computed from the user's club ids plus one keyset-paginated
+query over those clubs' upcoming events. Pages are kept in the shared cache
+under a key made of the user's club ids and a version number for the user
+and for each of those clubs. A club's version changes when one of its events
+is created, updated or deleted, and the user's when their memberships
+change, so a change makes every dependent page unreachable without finding
+and deleting them. Endpoints bump versions through the outbox once their
+change commits.
+Pages also expire after FEED_CACHE_TTL seconds, which bounds staleness from
+missed invalidations and from events ageing out of "upcoming".
+"""
+import base64
+import hashlib
+import logging
+import os
+import secrets
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from api.cache import CacheError, get_cache
+from api.models.models import ClubMember, Event
+from api.services import outbox
+from api.schemas.schemas import EventResponse
+
+logger = logging.getLogger(__name__)
+
+FEED_CACHE_TTL = float(os.environ.get("FEED_CACHE_TTL", "60"))
+# Versions outlive every page that was keyed on them
+FEED_VERSION_TTL = float(os.environ.get("FEED_VERSION_TTL", "86400"))
+
+def encode_cursor(event_date: date, event_id: int) -> str:
+    raw = f"{event_date.isoformat()}:{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Raises ValueError for malformed cursors."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    day, event_id = raw.split(":")
+    return date.fromisoformat(day), int(event_id)
+
+def _bump(key: str):
+    try:
+        get_cache("feed").incr(key, ttl=FEED_VERSION_TTL)
+    except CacheError as e:
+        logger.warning(f"Feed invalidation of {key} failed, pages expire within {FEED_CACHE_TTL}s: {e}")
+
+def invalidate_user(user_id: int):
+    """Call after the user's memberships change."""
+    _bump(f"user:{user_id}")
+
+def invalidate_club(club_id: int):
+    """Call after an event of the club is created, updated or deleted."""
+    _bump(f"club:{club_id}")
+
+def invalidate_user_on_commit(db: Session, user_id: int):
+    """Retire the user's pages once the caller's change commits."""
+    outbox.emit(db, "feed", {"user_id": user_id})
+
+def invalidate_club_on_commit(db: Session, club_id: int):
+    outbox.emit(db, "feed", {"club_id": club_id})
+
+# Broadcast, so a per-worker memory cache is bumped in every worker too
+@outbox.listener("feed", broadcast=True)
+def _invalidate_from_outbox(payloads):
+    for payload in payloads:
+        if payload.get("user_id") is not None:
+            invalidate_user(payload["user_id"])
+        if payload.get("club_id") is not None:
+            invalidate_club(payload["club_id"])
+
+def _versions(keys: List[str]) -> Dict[str, int]:
+    cache = get_cache("feed")
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Start from a random version, so a version that expired or was evicted
+        # never comes back with a number that old pages were keyed on
+        for key in missing:
+            try:
+                cache.add(key, secrets.randbits(48), ttl=FEED_VERSION_TTL)
+            except CacheError:
+                return {}
+        # Re-read, in case another request added or bumped it first
+        versions.update(cache.get_many(missing))
+    return versions if len(versions) == len(keys) else {}
+
+def _page_key(user_id: int, versions: Dict[str, int], cursor: Optional[str], limit: int) -> str:
+    parts = [f"{user_id}:{cursor}:{limit}"]
+    parts.extend(f"{key}={version}" for key, version in sorted(versions.items()))
+    return "page:" + hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+def get_feed(db: Session, user_id: int, cursor: Optional[str], limit: int) -> dict:
+    """Return {"events": [...], "next_cursor": ...} for the user's upcoming events."""
+    cache = get_cache("feed")
+    # Memberships are read every time, so the user's own joins show up at once
+    club_ids = {club_id for (club_id,) in db.query(ClubMember.club_id).filter(ClubMember.user_id == user_id)}
+    versions = _versions([f"user:{user_id}"] + [f"club:{club_id}" for club_id in club_ids])
+    page_key = None
+    if versions:
+        page_key = _page_key(user_id, versions, cursor, limit)
+        page = cache.get(page_key)
+        if page is not None:
+            return page
+
+    events = []
+    if club_ids:
+        query = db.query(Event).filter(
+            Event.club_id.in_(club_ids),
+            Event.event_date >= date.today()
+        )
+        if cursor:
+            after_date, after_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Event.event_date > after_date,
+                and_(Event.event_date == after_date, Event.event_id > after_id)
+            ))
+        events = query.order_by(Event.event_date, Event.event_id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].event_date, events[-1].event_id)
+
+    page = {
+        "events": [EventResponse.model_validate(event).model_dump(mode="json") for event in events],
+        "next_cursor": next_cursor
+    }
+    if page_key is not None:
+        cache.set(page_key, page, ttl=FEED_CACHE_TTL)
+    return page
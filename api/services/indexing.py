@@ -0,0 +1,61 @@
+"""
+Keeps the in-process search, suggestion and related-item indexes of every
+worker in step with committed changes.
+
+Endpoints call `index_on_commit()`, `index_many_on_commit()` or
+`remove_on_commit()` before their commit. The indexed fields travel in the
+outbox payload, so listeners in other workers update their indexes without
+querying the database.
+"""
+from types import SimpleNamespace
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from api.services import outbox, related, search, suggest
+
+_FIELDS = {
+    "club": ("club_id", "club_name", "description"),
+    "event": ("event_id", "event_name", "event_description"),
+    "user": ("user_id", "username", "first_name", "last_name", "bio"),
+}
+
+def index_on_commit(db: Session, kind: str, obj):
+    """Index or re-index `obj` (a Club, Event or User) once the caller's change commits. Flushes to get its id."""
+    db.flush()
+    document = {field: getattr(obj, field) for field in _FIELDS[kind]}
+    outbox.emit(db, "index", {"kind": kind, "op": "upsert", "document": document})
+
+def index_many_on_commit(db: Session, kind: str, documents: List[dict]):
+    """Like `index_on_commit()` for rows written with bulk inserts, given as dicts that include the id."""
+    for document in documents:
+        outbox.emit(db, "index", {
+            "kind": kind, "op": "upsert", "document": {field: document.get(field) for field in _FIELDS[kind]}
+        })
+
+def remove_on_commit(db: Session, kind: str, item_id: int):
+    outbox.emit(db, "index", {"kind": kind, "op": "remove", "id": item_id})
+
+@outbox.listener("index", broadcast=True)
+def _apply(payloads: List[dict]):
+    for payload in payloads:
+        kind = payload["kind"]
+        if payload["op"] == "remove":
+            search.remove(kind, payload["id"])
+            if kind in suggest.KINDS:
+                suggest.remove(kind, payload["id"])
+            if kind in ("club", "event"):
+                related.remove(kind, payload["id"])
+            continue
+
+        document = SimpleNamespace(**payload["document"])
+        if kind == "club":
+            search.index_club(document)
+            suggest.index_club(document)
+            related.index_club(document)
+        elif kind == "event":
+            search.index_event(document)
+            related.index_event(document)
+        else:
+            search.index_user(document)
+            suggest.index_user(document)
@@ -0,0 +1,234 @@
+"""
+Durable background jobs stored in the `jobs` table.
+
+`enqueue()` adds a job through the caller's session, so the job commits or
+rolls back together with the change that produced it. A job key makes
+enqueueing idempotent: while a job with the same key is pending or running,
+later enqueues are dropped. The key is released when the job finishes.
+
+Each process runs JOB_WORKERS threads. A worker claims a due job with a
+conditional UPDATE that also sets `locked_until`. If the worker dies, the
+claim expires after JOB_VISIBILITY_TIMEOUT seconds and another worker picks
+the job up. The handler runs in the worker's session. The job is marked done
+in the same commit, and only if the claim is still held. A handler that only
+touches the database therefore takes effect exactly once. Handlers with
+other side effects must tolerate running twice.
+
+A failed attempt is retried with exponential backoff, up to `max_attempts`,
+and then left as 'failed' with the last error. Finished jobs are purged
+after JOB_RETENTION_SECONDS.
+
+Run `python -m api.services.jobs status` for counts per status and
+`python -m api.services.jobs retry-failed` to queue failed jobs again.
+"""
+import argparse
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, event, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.database.connection import SessionLocal
+from api.models.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+JOB_VISIBILITY_TIMEOUT = float(os.environ.get("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_BACKOFF_BASE = float(os.environ.get("JOB_BACKOFF_BASE", "2"))
+JOB_BACKOFF_MAX = float(os.environ.get("JOB_BACKOFF_MAX", "600"))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "86400"))
+DEFAULT_MAX_ATTEMPTS = 5
+
+_handlers: Dict[str, Callable[[Session, dict], None]] = {}
+_wake = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+_purged_at: Optional[datetime] = None
+
+def handler(job_type: str):
+    """
+    Register `fn(db, payload)` as the handler for a job type.
+    Handlers must not commit; the worker commits their changes with the job status.
+    """
+    def register(fn):
+        _handlers[job_type] = fn
+        return fn
+    return register
+
+def _wake_workers(session):
+    _wake.set()
+
+def enqueue(db: Session, job_type: str, payload: dict, job_key: Optional[str] = None,
+            delay: float = 0, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+    """
+    Add a job without committing; it becomes visible with the caller's commit.
+    Returns False if a job with the same key is already pending or running.
+    """
+    job = Job(
+        job_type=job_type,
+        job_key=job_key,
+        payload=payload,
+        status='pending',
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.now() + timedelta(seconds=delay)
+    )
+    try:
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        return False
+    # Let this process's workers start right after the commit instead of at the next poll
+    if not event.contains(db, "after_commit", _wake_workers):
+        event.listen(db, "after_commit", _wake_workers)
+    return True
+
+def _backoff(attempts: int) -> float:
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+def _due(now: datetime):
+    return or_(
+        and_(Job.status == 'pending', Job.run_at <= now),
+        # Claimed by a worker that did not finish in time
+        and_(Job.status == 'running', Job.locked_until < now)
+    )
+
+def _claim(db: Session, token: str) -> Optional[Job]:
+    now = datetime.now()
+    candidates = [job_id for (job_id,) in db.query(Job.job_id).filter(_due(now)).order_by(
+        Job.run_at
+    ).limit(JOB_WORKERS * 2)]
+    for job_id in candidates:
+        claimed = db.execute(
+            update(Job)
+            .where(Job.job_id == job_id, _due(now))
+            .values(
+                status='running',
+                locked_by=token,
+                locked_until=now + timedelta(seconds=JOB_VISIBILITY_TIMEOUT),
+                attempts=Job.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.query(Job).filter(Job.job_id == job_id).first()
+    return None
+
+def _finish(db: Session, job_id: int, token: str, **values) -> bool:
+    return db.execute(
+        update(Job)
+        .where(Job.job_id == job_id, Job.locked_by == token)
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+def run_one(db: Session, worker_name: str = "cli") -> bool:
+    """Claim and run one due job. Returns False when nothing was due."""
+    token = f"{worker_name}:{uuid.uuid4().hex[:12]}"
+    job = _claim(db, token)
+    if job is None:
+        return False
+    job_id, job_type, payload, attempts, max_attempts = (
+        job.job_id, job.job_type, job.payload or {}, job.attempts, job.max_attempts
+    )
+
+    try:
+        fn = _handlers.get(job_type)
+        if fn is None:
+            raise LookupError(f"No handler registered for job type {job_type}")
+        fn(db, payload)
+        if _finish(db, job_id, token, status='done', job_key=None, last_error=None):
+            db.commit()
+        else:
+            # The claim expired and another worker owns the job now
+            db.rollback()
+            logger.warning(f"Job {job_id} lost its claim, discarding this attempt")
+    except Exception as e:
+        db.rollback()
+        if attempts >= max_attempts:
+            _finish(db, job_id, token, status='failed', job_key=None, last_error=str(e))
+            logger.error(f"Job {job_id} ({job_type}) failed after {attempts} attempts: {e}")
+        else:
+            _finish(db, job_id, token, status='pending', last_error=str(e),
+                    run_at=datetime.now() + timedelta(seconds=_backoff(attempts)))
+        db.commit()
+    return True
+
+def purge(db: Session) -> int:
+    """Delete jobs that finished more than JOB_RETENTION_SECONDS ago."""
+    global _purged_at
+    _purged_at = datetime.now()
+    cutoff = _purged_at - timedelta(seconds=JOB_RETENTION_SECONDS)
+    removed = db.query(Job).filter(
+        Job.status == 'done',
+        Job.updated_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+def _work(index: int):
+    name = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    db = SessionLocal()
+    try:
+        while not _stop.is_set():
+            try:
+                if run_one(db, name):
+                    continue
+                # One thread purges, at most once an hour
+                if index == 0 and (_purged_at is None or datetime.now() - _purged_at > timedelta(hours=1)):
+                    purge(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Job worker {name} error: {e}")
+            _wake.wait(JOB_POLL_INTERVAL)
+            _wake.clear()
+    finally:
+        db.close()
+
+def start():
+    if _threads:
+        return
+    _stop.clear()
+    for index in range(JOB_WORKERS):
+        thread = threading.Thread(target=_work, args=(index,), name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+def stop(timeout: float = 10.0):
+    """Let running jobs finish; anything unfinished is picked up again after its claim expires."""
+    _stop.set()
+    _wake.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the background job queue")
+    parser.add_argument("command", choices=["status", "retry-failed"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            for status, count in db.query(Job.status, func.count()).group_by(Job.status):
+                print(f"{status}: {count}")
+        else:
+            retried = db.query(Job).filter(Job.status == 'failed').update(
+                {"status": 'pending', "attempts": 0, "run_at": datetime.now()},
+                synchronize_session=False
+            )
+            db.commit()
+            print(f"Queued {retried} failed jobs again")
+    finally:
+        db.close()
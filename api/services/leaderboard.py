@@ -0,0 +1,238 @@
+"""
+Participation leaderboards kept as running totals in `leaderboard_entries`.
+
+Every score change through the event participation endpoints is applied as a
+delta to the global, club and semester scopes of the event. Single changes
+apply it inside the same transaction as the change itself. Batch grading
+enqueues the deltas as a background job in that transaction instead, which
+a job worker applies exactly once. Top-K and rank lookups then only touch
+the (scope, total_score) index instead of scanning all participations.
+
+A top-K query reads K index entries. A rank is one plus the number of
+entries with a higher total, a count over that part of the index, so it
+costs O(rank): a user near the bottom of the global board scans nearly all
+of it. Top-K lists and those counts are therefore cached, tagged with their
+scope, and every change to a scope bumps its tag once it commits. Counts are
+keyed by total, so every user with the same total shares one entry.
+
+Entries whose total drops to zero are deleted, so users without points are
+neither listed nor ranked, the same as after a rebuild.
+"""
+import argparse
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.cache import generations, get_cache
+from api.models.models import LeaderboardEntry, EventParticipation, Event, User
+from api.services import jobs
+
+GLOBAL_SCOPE = "global"
+LEADERBOARD_CACHE_TTL = float(os.environ.get("LEADERBOARD_CACHE_TTL", "300"))
+
+def cache_tag(scope: str) -> str:
+    return f"leaderboard:{scope}"
+
+def club_scope(club_id: int) -> str:
+    return f"club:{club_id}"
+
+def semester_of(event_date: date) -> str:
+    # Spring runs January to July, fall runs August to December
+    term = "spring" if event_date.month < 8 else "fall"
+    return f"{event_date.year}-{term}"
+
+def semester_scope(semester: str) -> str:
+    return f"semester:{semester}"
+
+def scopes_for_event(club_id: Optional[int], event_date: Optional[date]) -> List[str]:
+    scopes = [GLOBAL_SCOPE]
+    if club_id is not None:
+        scopes.append(club_scope(club_id))
+    if event_date is not None:
+        scopes.append(semester_scope(semester_of(event_date)))
+    return scopes
+
+def add_score_delta(deltas: Dict[Tuple[str, int], int], event: Event, user_id: int, delta: int):
+    """Accumulate a score delta for every scope the event contributes to."""
+    if not delta:
+        return
+    for scope in scopes_for_event(event.club_id, event.event_date):
+        deltas[(scope, user_id)] += delta
+
+def apply_deltas(db: Session, deltas: Dict[Tuple[str, int], int]):
+    """
+    Apply accumulated deltas with one lookup, one executemany UPDATE and one
+    multi-row INSERT. Nothing is committed; the caller's commit covers both the
+    score change and the leaderboard.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    scopes = {scope for scope, _ in deltas}
+    generations.bump_on_commit(db, *[cache_tag(scope) for scope in scopes])
+    user_ids = {user_id for _, user_id in deltas}
+    existing = set(db.query(LeaderboardEntry.scope, LeaderboardEntry.user_id).filter(
+        LeaderboardEntry.scope.in_(scopes),
+        LeaderboardEntry.user_id.in_(user_ids)
+    ).all())
+
+    updates = [
+        {"b_scope": scope, "b_user_id": user_id, "b_delta": delta}
+        for (scope, user_id), delta in deltas.items() if (scope, user_id) in existing
+    ]
+    inserts = [
+        {"scope": scope, "user_id": user_id, "total_score": delta}
+        for (scope, user_id), delta in deltas.items() if (scope, user_id) not in existing
+    ]
+
+    table = LeaderboardEntry.__table__
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.scope == bindparam("b_scope"), table.c.user_id == bindparam("b_user_id"))
+            .values(total_score=table.c.total_score + bindparam("b_delta")),
+            updates
+        )
+
+    if inserts:
+        try:
+            with db.begin_nested():
+                db.execute(insert(table), inserts)
+        except IntegrityError:
+            # Another request created some of these rows first, fall back to row by row
+            for row in inserts:
+                result = db.execute(
+                    update(table)
+                    .where(table.c.scope == row["scope"], table.c.user_id == row["user_id"])
+                    .values(total_score=table.c.total_score + row["total_score"])
+                )
+                if result.rowcount == 0:
+                    db.execute(insert(table), row)
+
+    # A user whose scores were all removed leaves the board, as a rebuild would leave them out
+    db.query(LeaderboardEntry).filter(
+        LeaderboardEntry.scope.in_(scopes),
+        LeaderboardEntry.user_id.in_(user_ids),
+        LeaderboardEntry.total_score == 0
+    ).delete(synchronize_session=False)
+
+def enqueue_deltas(db: Session, deltas: Dict[Tuple[str, int], int]):
+    """Queue deltas for a job worker, committed with the caller's transaction."""
+    rows = [[scope, user_id, delta] for (scope, user_id), delta in deltas.items() if delta]
+    if rows:
+        jobs.enqueue(db, "leaderboard.apply_deltas", {"deltas": rows})
+
+@jobs.handler("leaderboard.apply_deltas")
+def _apply_deltas_job(db: Session, payload: dict):
+    apply_deltas(db, {(scope, user_id): delta for scope, user_id, delta in payload["deltas"]})
+
+def record_score_change(db: Session, event: Event, user_id: int,
+                        old_score: Optional[int], new_score: Optional[int]):
+    """Apply a single participation score change (create, update or delete)."""
+    deltas = defaultdict(int)
+    add_score_delta(deltas, event, user_id, (new_score or 0) - (old_score or 0))
+    apply_deltas(db, deltas)
+
+def top(db: Session, scope: str, limit: int = 10):
+    return get_cache("leaderboard").get_or_set(
+        f"top:{scope}:{limit}", lambda: _query_top(db, scope, limit),
+        ttl=LEADERBOARD_CACHE_TTL, tags=[cache_tag(scope), "leaderboard"]
+    )
+
+def _query_top(db: Session, scope: str, limit: int):
+    rows = db.query(LeaderboardEntry.user_id, LeaderboardEntry.total_score, User.username,
+                    User.first_name, User.last_name).join(
+        User, User.user_id == LeaderboardEntry.user_id
+    ).filter(
+        LeaderboardEntry.scope == scope
+    ).order_by(
+        LeaderboardEntry.total_score.desc(), LeaderboardEntry.user_id
+    ).limit(limit).all()
+
+    # Competition ranking: equal totals share a rank
+    entries = []
+    for position, row in enumerate(rows, start=1):
+        if entries and entries[-1]["total_score"] == row.total_score:
+            rank = entries[-1]["rank"]
+        else:
+            rank = position
+        entries.append({
+            "rank": rank,
+            "user_id": row.user_id,
+            "username": row.username,
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "total_score": row.total_score,
+        })
+    return entries
+
+def rank_of(db: Session, scope: str, user_id: int):
+    """Return (rank, total_score) for a user, or None if they have no entry."""
+    total = db.query(LeaderboardEntry.total_score).filter(
+        LeaderboardEntry.scope == scope,
+        LeaderboardEntry.user_id == user_id
+    ).scalar()
+    if total is None:
+        return None
+    ahead = get_cache("leaderboard").get_or_set(
+        f"ahead:{scope}:{total}", lambda: _count_ahead(db, scope, total),
+        ttl=LEADERBOARD_CACHE_TTL, tags=[cache_tag(scope), "leaderboard"]
+    )
+    return ahead + 1, total
+
+def _count_ahead(db: Session, scope: str, total: int) -> int:
+    return db.query(func.count()).select_from(LeaderboardEntry).filter(
+        LeaderboardEntry.scope == scope,
+        LeaderboardEntry.total_score > total
+    ).scalar()
+
+def compute_totals(db: Session) -> Dict[Tuple[str, int], int]:
+    """Recompute every leaderboard total from event_participation."""
+    totals = defaultdict(int)
+    rows = db.query(
+        EventParticipation.user_id, Event.club_id, Event.event_date,
+        func.sum(EventParticipation.participation_score)
+    ).join(
+        Event, Event.event_id == EventParticipation.event_id
+    ).group_by(
+        EventParticipation.user_id, Event.club_id, Event.event_date
+    )
+    for user_id, club_id, event_date, score in rows:
+        if user_id is None or not score:
+            continue
+        for scope in scopes_for_event(club_id, event_date):
+            totals[(scope, user_id)] += int(score)
+    return totals
+
+def rebuild(db: Session) -> int:
+    """Replace the leaderboard table with freshly computed totals."""
+    totals = compute_totals(db)
+    db.query(LeaderboardEntry).delete(synchronize_session=False)
+    rows = [
+        {"scope": scope, "user_id": user_id, "total_score": total}
+        for (scope, user_id), total in totals.items() if total
+    ]
+    for start in range(0, len(rows), 1000):
+        db.execute(insert(LeaderboardEntry.__table__), rows[start:start + 1000])
+    generations.bump_on_commit(db, "leaderboard")
+    db.commit()
+    return len(rows)
+
+if __name__ == "__main__":
+    from api.database.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild participation leaderboards")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt leaderboards with {rebuild(db)} entries")
+    finally:
+        db.close()
@@ -0,0 +1,72 @@
+"""
+Notification writes, recorded through the transactional outbox.
+
+Endpoints that create notifications as part of a change call
+`notify_on_commit()` before their commit. The notification is stored as an
+outbox row in the caller's transaction (see api/services/outbox.py), so it
+exists exactly when the change does and never when the change rolls back.
+
+The outbox relay drains these rows in batches. Its consumer writes each batch
+as one multi-row INSERT and adjusts the recipients' unread counters in the
+same transaction that deletes the drained rows, so every notification is
+written, and counted, exactly once. After that commit, a listener pushes
+each row to the recipient's open notification streams (see
+api/services/push.py). Notifications usually appear within one relay poll of
+the change that produced them, and survive a worker crash in between.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from api.models.models import Notification
+from api.services import outbox, push, unread_counts
+
+def build(user_id: int, notification_type: str, text: str, reference_id: Optional[int] = None) -> dict:
+    now = datetime.now()
+    return {
+        "user_id": user_id,
+        "notification_type": notification_type,
+        "reference_id": reference_id,
+        "notification_text": text,
+        "is_read": False,
+        "notification_date": now,
+        "created_at": now,
+    }
+
+def insert_rows(db: Session, rows: List[dict]):
+    """Insert notification rows in one multi-row INSERT and bump unread counters, without committing."""
+    db.execute(insert(Notification.__table__), rows)
+    unread_counts.adjust_many(db, Counter(row["user_id"] for row in rows))
+
+def publish_rows(rows: List[dict]):
+    for row in rows:
+        push.publish(row["user_id"], row)
+
+def notify_on_commit(db: Session, user_id: int, notification_type: str, text: str,
+                     reference_id: Optional[int] = None):
+    """
+    Record the notification in the caller's transaction through the outbox.
+    It is written exactly once, and only if the caller's change commits.
+    """
+    row = build(user_id, notification_type, text, reference_id)
+    for column in ("notification_date", "created_at"):
+        row[column] = row[column].isoformat()
+    outbox.emit(db, "notification", row)
+
+def _from_outbox(payload: dict) -> dict:
+    row = dict(payload)
+    for column in ("notification_date", "created_at"):
+        row[column] = datetime.fromisoformat(row[column])
+    return row
+
+@outbox.consumer("notification")
+def _write_from_outbox(db: Session, payloads: List[dict]):
+    insert_rows(db, [_from_outbox(payload) for payload in payloads])
+
+@outbox.listener("notification")
+def _push_from_outbox(payloads: List[dict]):
+    # push.publish reaches the other workers itself, so this listener is not broadcast
+    publish_rows(payloads)
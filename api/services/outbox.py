@@ -0,0 +1,227 @@
+"""
+Transactional outbox for side effects of business changes.
+
+Endpoints call `emit()` before their commit. The side effect is recorded as
+an `outbox_events` row in the same transaction, so it exists exactly when
+the change does, and the request needs no second commit.
+
+A relay thread in every worker drains the table in batches. It claims up to
+OUTBOX_BATCH_SIZE rows with a conditional UPDATE and a claim timeout, so
+concurrent workers split the work and rows from a crashed worker are picked
+up again. Each batch is grouped by topic and handed to two kinds of
+subscriber:
+
+- `consumer(topic)` functions write to the database in the same transaction
+  that deletes the drained rows, so their effect happens exactly once.
+  Notification rows are written this way.
+- `listener(topic)` functions run after that commit. Most keep per-process
+  state such as caches and search indexes; with `broadcast=True` the batch
+  is also sent to the other workers through the relay, split into
+  messages that each fit in one relay datagram. They are best effort, and the caches they maintain also expire on their own.
+
+If a batch fails, its rows are retried one at a time. A row that still
+fails after OUTBOX_MAX_ATTEMPTS is logged and dropped.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, or_, update
+from sqlalchemy.orm import Session
+
+from api.database.connection import SessionLocal
+from api.models.models import OutboxEvent
+from api.services import relay
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_CLAIM_TIMEOUT = float(os.environ.get("OUTBOX_CLAIM_TIMEOUT", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5"))
+CHANNEL = "outbox"
+
+_consumers: Dict[str, List[Callable[[Session, List[dict]], None]]] = defaultdict(list)
+_listeners: Dict[str, List[Callable[[List[dict]], None]]] = defaultdict(list)
+_broadcast_topics = set()
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def consumer(topic: str):
+    """Register `fn(db, payloads)`, run inside the transaction that drains the rows. It must not commit."""
+    def register(fn):
+        _consumers[topic].append(fn)
+        return fn
+    return register
+
+def listener(topic: str, broadcast: bool = False):
+    """Register `fn(payloads)`, run after the drain commits, in every worker if `broadcast`."""
+    def register(fn):
+        _listeners[topic].append(fn)
+        if broadcast:
+            _broadcast_topics.add(topic)
+        return fn
+    return register
+
+def _wake_relay(session):
+    _wake.set()
+
+def emit(db: Session, topic: str, payload: dict):
+    """Record a side effect in the caller's transaction. Payloads must be JSON-serializable."""
+    db.add(OutboxEvent(topic=topic, payload=payload, attempts=0))
+    # Drain right after the commit instead of at the next poll
+    if not event.contains(db, "after_commit", _wake_relay):
+        event.listen(db, "after_commit", _wake_relay)
+
+def _claimable(now: datetime):
+    return or_(OutboxEvent.claimed_until == None, OutboxEvent.claimed_until < now)
+
+def _claim(db: Session, token: str) -> List[OutboxEvent]:
+    now = datetime.now()
+    candidates = [outbox_id for (outbox_id,) in db.query(OutboxEvent.outbox_id).filter(
+        _claimable(now)
+    ).order_by(OutboxEvent.outbox_id).limit(OUTBOX_BATCH_SIZE)]
+    if not candidates:
+        return []
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.outbox_id.in_(candidates), _claimable(now))
+        .values(
+            claimed_by=token,
+            claimed_until=now + timedelta(seconds=OUTBOX_CLAIM_TIMEOUT),
+            attempts=OutboxEvent.attempts + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return db.query(OutboxEvent).filter(OutboxEvent.claimed_by == token).order_by(OutboxEvent.outbox_id).all()
+
+def _by_topic(rows) -> "OrderedDict[str, List[dict]]":
+    grouped = OrderedDict()
+    for _, topic, payload in rows:
+        grouped.setdefault(topic, []).append(payload)
+    return grouped
+
+def _apply(db: Session, token: str, rows):
+    """Run consumers and delete the rows in one transaction, if the claim is still ours."""
+    for topic, payloads in _by_topic(rows).items():
+        for fn in _consumers.get(topic, ()):
+            fn(db, payloads)
+    deleted = db.query(OutboxEvent).filter(
+        OutboxEvent.outbox_id.in_([outbox_id for outbox_id, _, _ in rows]),
+        OutboxEvent.claimed_by == token
+    ).delete(synchronize_session=False)
+    if deleted != len(rows):
+        # The claim expired and another worker took over some of these rows
+        raise RuntimeError(f"Outbox claim lost for {len(rows) - deleted} rows")
+    db.commit()
+
+def _broadcast_chunks(topic: str, payloads: List[dict]):
+    """Split payloads into runs whose relay message fits in one datagram."""
+    # Room for the envelope around the payload list
+    budget = relay.RELAY_MAX_MESSAGE - len(json.dumps({"topic": topic, "payloads": [], "channel": CHANNEL})) - 16
+    chunk, size = [], 0
+    for payload in payloads:
+        encoded = len(json.dumps(payload, default=str).encode()) + 2
+        if encoded > budget:
+            logger.warning(f"Outbox {topic} payload of {encoded} bytes is too large to broadcast, skipped")
+            continue
+        if size + encoded > budget:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(payload)
+        size += encoded
+    if chunk:
+        yield chunk
+
+def _notify_listeners(grouped: "OrderedDict[str, List[dict]]", broadcast: bool):
+    for topic, payloads in grouped.items():
+        for fn in _listeners.get(topic, ()):
+            try:
+                fn(payloads)
+            except Exception as e:
+                logger.warning(f"Outbox listener for {topic} failed: {e}")
+        if broadcast and topic in _broadcast_topics:
+            for chunk in _broadcast_chunks(topic, payloads):
+                relay.publish(CHANNEL, {"topic": topic, "payloads": chunk})
+
+def drain(db: Session, worker_name: str = "cli") -> int:
+    """Process one batch. Returns the number of rows handled."""
+    token = f"{worker_name}:{uuid.uuid4().hex[:12]}"
+    claimed = _claim(db, token)
+    if not claimed:
+        return 0
+    # Plain tuples, since the ORM rows expire on rollback and vanish on delete
+    rows = [(row.outbox_id, row.topic, row.payload) for row in claimed]
+    attempts = {row.outbox_id: row.attempts for row in claimed}
+    try:
+        _apply(db, token, rows)
+        done = rows
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Outbox batch of {len(rows)} failed, retrying one by one: {e}")
+        done = []
+        for row in rows:
+            try:
+                _apply(db, token, [row])
+                done.append(row)
+            except Exception as e:
+                db.rollback()
+                outbox_id, topic, payload = row
+                if attempts[outbox_id] >= OUTBOX_MAX_ATTEMPTS:
+                    logger.error(f"Dropping outbox event {outbox_id} ({topic}) after "
+                                 f"{attempts[outbox_id]} attempts: {e} payload={json.dumps(payload)}")
+                    db.query(OutboxEvent).filter(OutboxEvent.outbox_id == outbox_id).delete()
+                    db.commit()
+    _notify_listeners(_by_topic(done), broadcast=True)
+    return len(rows)
+
+def _on_relay(message: dict):
+    # Runs on the event loop; index updates can be CPU heavy, so hand them to a thread
+    grouped = OrderedDict([(message["topic"], message["payloads"])])
+    _loop.run_in_executor(None, _notify_listeners, grouped, False)
+
+def _run():
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    db = SessionLocal()
+    try:
+        while not _stop.is_set():
+            try:
+                if drain(db, name) >= OUTBOX_BATCH_SIZE:
+                    continue
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Outbox relay error: {e}")
+            _wake.wait(OUTBOX_POLL_INTERVAL)
+            _wake.clear()
+    finally:
+        db.close()
+
+def start():
+    """Call from the running event loop during application startup, after relay.start()."""
+    global _thread, _loop
+    if _thread is not None and _thread.is_alive():
+        return
+    _loop = asyncio.get_running_loop()
+    relay.subscribe(CHANNEL, _on_relay)
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="outbox-relay", daemon=True)
+    _thread.start()
+
+def stop(timeout: float = 10.0):
+    """Finish the current batch; undrained rows are handled by the next worker to start."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
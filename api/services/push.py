@@ -0,0 +1,70 @@
+"""
+In-process pub/sub for pushing notifications to connected clients.
+
+Every open stream holds a small asyncio.Queue registered under its user id.
+`publish()` can be called from any thread (request handlers run in the
+threadpool, notifications are written by the outbox relay thread). It hands the
+message to the event loop, which puts it on the queues of that user's
+streams in this worker, and also forwards it to the other workers through
+the relay so clients connected there get it too.
+
+An idle connection costs one queue and one suspended generator. A stream
+whose queue is full (the client stopped reading) drops new messages. The
+client still finds them in `/users/me/notifications`.
+"""
+import asyncio
+import os
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from api.services import relay
+
+PUSH_QUEUE_SIZE = int(os.environ.get("PUSH_QUEUE_SIZE", "100"))
+CHANNEL = "push"
+
+_streams: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def subscribe(user_id: int) -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=PUSH_QUEUE_SIZE)
+    _streams[user_id].add(queue)
+    return queue
+
+def unsubscribe(user_id: int, queue: asyncio.Queue):
+    queues = _streams.get(user_id)
+    if queues is not None:
+        queues.discard(queue)
+        if not queues:
+            del _streams[user_id]
+
+def connection_count() -> int:
+    return sum(len(queues) for queues in _streams.values())
+
+def _deliver(user_id: int, message: dict):
+    for queue in list(_streams.get(user_id, ())):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+def _on_relay(message: dict):
+    _deliver(message["user_id"], message["payload"])
+
+def publish(user_id: int, message: dict):
+    """Deliver a message to every stream of the user, in any worker."""
+    if _loop is None:
+        return
+    relay.publish(CHANNEL, {"user_id": user_id, "payload": message})
+    _loop.call_soon_threadsafe(_deliver, user_id, message)
+
+def start():
+    """Call from the running event loop during application startup."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    relay.subscribe(CHANNEL, _on_relay)
+    relay.start()
+
+def stop():
+    global _loop
+    relay.stop()
+    _loop = None
@@ -0,0 +1,210 @@
+"""
+Collaborative-filtering club recommendations.
+
+Memberships form a sparse user x club matrix X. Item-item cosine similarity
+S = normalize(X^T X) gives each user a co-membership score X_u S for every
+club. It is blended with interest overlap: each club gets a tag profile
+made from its members' `User.interests` and the interest words in its name
+and description, and that profile is compared with the user's own
+interests.
+
+A `recommendations.refresh` job (see api/services/jobs.py) recomputes the
+top clubs for every user, in blocks of users so memory stays bounded, and
+stores them in `club_recommendations` in the job's transaction. Each run
+queues the next one RECOMMENDATIONS_REFRESH_SECONDS later, keyed by period,
+so one run per period happens across all workers and hosts. Workers queue
+a run at startup when the stored results are missing or stale, which also
+restarts the chain after a run fails for good. Requests read one row.
+Popular clubs for users without recommendations come from the maintained
+member counts.
+
+Run `python -m api.services.recommendations refresh` to recompute now.
+"""
+import argparse
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from api.database.connection import SessionLocal
+from api.models.models import Club, ClubMember, ClubRecommendation, User
+from api.services import jobs
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_REFRESH_SECONDS = float(os.environ.get("RECOMMENDATIONS_REFRESH_SECONDS", "3600"))
+TOP_N = 20
+# Weight of co-membership versus interest overlap in the blended score
+COMEMBERSHIP_WEIGHT = 0.7
+INTEREST_WEIGHT = 0.3
+BLOCK_SIZE = 2048
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+def _scale_rows(scores: np.ndarray) -> np.ndarray:
+    # Bring every user's scores to [0, 1] so the two signals blend fairly
+    peak = scores.max(axis=1, keepdims=True)
+    peak[peak <= 0] = 1.0
+    return scores / peak
+
+def compute(db: Session, top_n: int = TOP_N):
+    """Return ({user_id: [club_id, ...]}, popular club ids)."""
+    users = db.query(User.user_id, User.interests).all()
+    clubs = db.query(Club.club_id, Club.club_name, Club.description, Club.leader_id).all()
+    if not users or not clubs:
+        return {}, []
+
+    user_index = {user.user_id: row for row, user in enumerate(users)}
+    club_index = {club.club_id: column for column, club in enumerate(clubs)}
+    club_ids = np.array([club.club_id for club in clubs])
+
+    pairs = [
+        (user_index[user_id], club_index[club_id])
+        for user_id, club_id in db.query(ClubMember.user_id, ClubMember.club_id)
+        if user_id in user_index and club_id in club_index
+    ]
+    rows = np.array([row for row, _ in pairs], dtype=np.int64)
+    columns = np.array([column for _, column in pairs], dtype=np.int64)
+    X = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(users), len(clubs))
+    )
+
+    # Item-item cosine similarity from co-membership counts
+    co_membership = (X.T @ X).toarray()
+    norms = np.sqrt(np.diag(co_membership))
+    norms[norms == 0] = 1.0
+    similarity = co_membership / np.outer(norms, norms)
+    np.fill_diagonal(similarity, 0.0)
+
+    # Interest tags: users x tags, and clubs x tags from members plus descriptions
+    vocabulary = {}
+    tag_rows, tag_columns = [], []
+    for user in users:
+        for tag in {str(tag).strip().lower() for tag in (user.interests or []) if str(tag).strip()}:
+            tag_rows.append(user_index[user.user_id])
+            tag_columns.append(vocabulary.setdefault(tag, len(vocabulary)))
+    interests = sparse.csr_matrix(
+        (np.ones(len(tag_rows), dtype=np.float32), (tag_rows, tag_columns)),
+        shape=(len(users), max(len(vocabulary), 1))
+    )
+    text_rows, text_columns = [], []
+    for club in clubs:
+        words = set(_WORD_RE.findall(f"{club.club_name or ''} {club.description or ''}".lower()))
+        for tag in words & vocabulary.keys():
+            text_rows.append(club_index[club.club_id])
+            text_columns.append(vocabulary[tag])
+    club_text = sparse.csr_matrix(
+        (np.ones(len(text_rows), dtype=np.float32), (text_rows, text_columns)),
+        shape=(len(clubs), interests.shape[1])
+    )
+    club_tags = _normalize_rows(_normalize_rows(X.T @ interests) + club_text)
+    user_tags = _normalize_rows(interests)
+
+    # Clubs a user already belongs to or leads are never recommended
+    leader_columns = {}
+    for club in clubs:
+        if club.leader_id in user_index:
+            leader_columns.setdefault(user_index[club.leader_id], []).append(club_index[club.club_id])
+
+    popularity = np.asarray(X.sum(axis=0)).ravel()
+    popular = [int(club_id) for club_id in club_ids[np.argsort(-popularity, kind="stable")]]
+
+    recommendations = {}
+    n = min(top_n, len(clubs))
+    for start in range(0, len(users), BLOCK_SIZE):
+        block = slice(start, min(start + BLOCK_SIZE, len(users)))
+        memberships = X[block]
+        scores = COMEMBERSHIP_WEIGHT * _scale_rows(np.asarray(memberships @ similarity))
+        scores += INTEREST_WEIGHT * _scale_rows((user_tags[block] @ club_tags.T).toarray())
+        scores[memberships.toarray() > 0] = -np.inf
+        for row, leader_of in leader_columns.items():
+            if start <= row < block.stop:
+                scores[row - start, leader_of] = -np.inf
+
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for offset in range(top.shape[0]):
+            user_id = users[start + offset].user_id
+            recommendations[user_id] = [
+                int(club_ids[column])
+                for column, score in zip(top[offset], top_scores[offset]) if score > 0
+            ]
+
+    return recommendations, popular
+
+def refresh(db: Session) -> int:
+    """Replace every user's stored recommendations, without committing. Returns the number of users."""
+    recommendations, _ = compute(db)
+    now = datetime.now()
+    # Readers keep seeing the previous rows until this transaction commits
+    db.query(ClubRecommendation).delete(synchronize_session=False)
+    rows = [
+        {"user_id": user_id, "club_ids": club_ids, "computed_at": now}
+        for user_id, club_ids in recommendations.items()
+    ]
+    if rows:
+        db.execute(insert(ClubRecommendation.__table__), rows)
+    return len(rows)
+
+def for_user(db: Session, user_id: int) -> List[int]:
+    """Stored club ids for a user, empty for users added since the last refresh."""
+    club_ids = db.query(ClubRecommendation.club_ids).filter(ClubRecommendation.user_id == user_id).scalar()
+    return list(club_ids or [])
+
+def _job_key(run_at: float) -> str:
+    # Runs are keyed by their refresh period, so concurrent schedulers agree on one job per period
+    return f"recommendations.refresh:{int(run_at // RECOMMENDATIONS_REFRESH_SECONDS)}"
+
+def schedule(db: Session, delay: float = 0) -> bool:
+    """Enqueue a refresh without committing. Returns False if one is already queued for that period."""
+    return jobs.enqueue(
+        db, "recommendations.refresh", {}, job_key=_job_key(time.time() + delay), delay=delay, max_attempts=3
+    )
+
+@jobs.handler("recommendations.refresh")
+def _refresh_job(db: Session, payload: dict):
+    refresh(db)
+    # Queue the next run in this transaction, so the chain only continues if this run committed
+    schedule(db, RECOMMENDATIONS_REFRESH_SECONDS)
+
+def ensure_scheduled():
+    """Queue a refresh now if the stored recommendations are missing or older than one period."""
+    db = SessionLocal()
+    try:
+        computed_at = db.query(func.max(ClubRecommendation.computed_at)).scalar()
+        if computed_at is None or datetime.now() - computed_at > timedelta(seconds=RECOMMENDATIONS_REFRESH_SECONDS):
+            schedule(db)
+            db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Could not schedule club recommendations refresh")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Club recommendations")
+    parser.add_argument("command", choices=["refresh"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Stored recommendations for {refresh(db)} users")
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,263 @@
+"""
+Content-based "related clubs" and "related events".
+
+Each catalog (clubs, events) is turned into L2-normalized TF-IDF vectors over
+its name and description. Cosine similarity against the whole catalog is
+then a sparse matrix product, done in row blocks, and the top
+RELATED_NEIGHBOURS of each item are kept in memory.
+
+Vectors are rows of a CSR matrix kept in preallocated arrays. Creating an
+item appends a row and scores it against the catalog with one sparse
+product, using the current vocabulary and IDF weights, then inserts it into
+the neighbour lists it beats. Updating or removing an item marks its row
+dead instead of rebuilding the matrix; dead rows are compacted away once
+they are half of it. Each item also records which lists include it, so a
+removal only touches those lists, and recomputes them so they stay at
+RELATED_NEIGHBOURS entries. A full rebuild happens on first use and again
+after RELATED_INDEX_MAX_AGE seconds, which also refreshes IDF.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from api.models.models import Club, Event
+from api.services.search import tokenize
+
+RELATED_NEIGHBOURS = int(os.environ.get("RELATED_NEIGHBOURS", "10"))
+RELATED_INDEX_MAX_AGE = float(os.environ.get("RELATED_INDEX_MAX_AGE", "3600"))
+BLOCK_SIZE = 256
+
+class RelatedIndex:
+    """TF-IDF vectors and precomputed nearest neighbours for one catalog."""
+
+    def __init__(self, k: int = RELATED_NEIGHBOURS):
+        self.k = k
+        self._lock = threading.RLock()
+        self._vocabulary: Dict[str, int] = {}
+        self._idf = np.zeros(0)
+        # Rows of a CSR matrix in preallocated arrays that grow by doubling
+        self._data = np.zeros(0, dtype=np.float32)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._nnz = 0
+        self._ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        # item id -> [(-score, neighbour id)] kept sorted, best first
+        self._neighbours: Dict[int, List[Tuple[float, int]]] = {}
+        # item id -> ids whose neighbour lists include it
+        self._listed_by: Dict[int, Set[int]] = defaultdict(set)
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        counts = Counter(term for term in tokenize(text) if term in self._vocabulary)
+        columns = np.array([self._vocabulary[term] for term in counts], dtype=np.int32)
+        # Sublinear term frequency keeps long descriptions from dominating
+        values = np.array(
+            [(1 + math.log(count)) * self._idf[self._vocabulary[term]] for term, count in counts.items()],
+            dtype=np.float32
+        )
+        norm = np.linalg.norm(values)
+        if norm:
+            values /= norm
+        return columns, values
+
+    def _append_locked(self, item_id: int, columns: np.ndarray, values: np.ndarray) -> int:
+        row = len(self._ids)
+        if row + 1 >= len(self._indptr):
+            self._indptr = np.resize(self._indptr, max(2 * len(self._indptr), 16))
+            self._alive = np.resize(self._alive, len(self._indptr) - 1)
+        end = self._nnz + len(columns)
+        if end > len(self._data):
+            capacity = max(2 * len(self._data), end, 256)
+            self._data = np.resize(self._data, capacity)
+            self._indices = np.resize(self._indices, capacity)
+        self._data[self._nnz:end] = values
+        self._indices[self._nnz:end] = columns
+        self._nnz = end
+        self._indptr[row + 1] = end
+        self._alive[row] = True
+        self._ids.append(item_id)
+        self._rows[item_id] = row
+        return row
+
+    def _matrix(self) -> sparse.csr_matrix:
+        rows = len(self._ids)
+        return sparse.csr_matrix(
+            (self._data[:self._nnz], self._indices[:self._nnz], self._indptr[:rows + 1]),
+            shape=(rows, len(self._vocabulary))
+        )
+
+    def _scores(self, row: int) -> np.ndarray:
+        """Cosine similarity of one row against every live row, 0 for itself and removed rows."""
+        start, end = self._indptr[row], self._indptr[row + 1]
+        vector = np.zeros(len(self._vocabulary), dtype=np.float32)
+        vector[self._indices[start:end]] = self._data[start:end]
+        scores = self._matrix() @ vector
+        scores[~self._alive[:len(self._ids)]] = 0.0
+        scores[row] = 0.0
+        return scores
+
+    def _top(self, scores: np.ndarray) -> List[Tuple[float, int]]:
+        candidates = np.nonzero(scores > 0)[0]
+        if len(candidates) > self.k:
+            candidates = candidates[np.argpartition(-scores[candidates], self.k - 1)[:self.k]]
+        return sorted((-float(scores[row]), self._ids[row]) for row in candidates)[:self.k]
+
+    def _set_neighbours_locked(self, item_id: int, neighbours: List[Tuple[float, int]]):
+        for _, old_id in self._neighbours.get(item_id, ()):
+            self._listed_by[old_id].discard(item_id)
+        self._neighbours[item_id] = neighbours
+        for _, neighbour_id in neighbours:
+            self._listed_by[neighbour_id].add(item_id)
+
+    def _insert_neighbour_locked(self, item_id: int, neighbour_id: int, score: float):
+        neighbours = self._neighbours.setdefault(item_id, [])
+        if len(neighbours) >= self.k and -score >= neighbours[-1][0]:
+            return
+        bisect.insort(neighbours, (-score, neighbour_id))
+        self._listed_by[neighbour_id].add(item_id)
+        for _, dropped_id in neighbours[self.k:]:
+            self._listed_by[dropped_id].discard(item_id)
+        del neighbours[self.k:]
+
+    def build(self, documents: List[Tuple[int, str]]):
+        tokenized = [(item_id, tokenize(text)) for item_id, text in documents]
+        document_frequency = Counter(term for _, terms in tokenized for term in set(terms))
+        vocabulary = {term: column for column, term in enumerate(sorted(document_frequency))}
+        total = len(tokenized)
+        idf = np.zeros(len(vocabulary))
+        for term, column in vocabulary.items():
+            idf[column] = math.log((1 + total) / (1 + document_frequency[term])) + 1
+
+        with self._lock:
+            self.__init__(self.k)
+            self._vocabulary, self._idf = vocabulary, idf
+            for item_id, text in documents:
+                self._append_locked(item_id, *self._vectorize(text))
+            if not self._ids:
+                return
+
+            matrix = self._matrix()
+            for start in range(0, len(self._ids), BLOCK_SIZE):
+                block = (matrix[start:start + BLOCK_SIZE] @ matrix.T).toarray()
+                for offset in range(block.shape[0]):
+                    block[offset, start + offset] = 0.0
+                    self._set_neighbours_locked(self._ids[start + offset], self._top(block[offset]))
+
+    def _compact_locked(self):
+        """Drop removed rows once they make up half the matrix; neighbour lists are unaffected."""
+        live = [(item_id, row) for row, item_id in enumerate(self._ids) if self._alive[row]]
+        parts = [
+            (item_id, self._indices[self._indptr[row]:self._indptr[row + 1]].copy(),
+             self._data[self._indptr[row]:self._indptr[row + 1]].copy())
+            for item_id, row in live
+        ]
+        self._data = np.zeros(0, dtype=np.float32)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._nnz = 0
+        self._ids, self._rows = [], {}
+        for item_id, columns, values in parts:
+            self._append_locked(item_id, columns, values)
+
+    def _drop_locked(self, item_id: int) -> Set[int]:
+        """Tombstone an item and take it out of every list. Returns the ids whose lists lost it."""
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return set()
+        self._alive[row] = False
+        self._set_neighbours_locked(item_id, [])
+        del self._neighbours[item_id]
+        affected = self._listed_by.pop(item_id, set())
+        for other_id in affected:
+            neighbours = self._neighbours.get(other_id)
+            if neighbours is not None:
+                neighbours[:] = [entry for entry in neighbours if entry[1] != item_id]
+        if len(self._rows) * 2 < len(self._ids):
+            self._compact_locked()
+        return affected
+
+    def _backfill_locked(self, item_ids: Set[int]):
+        # Lists that lost an entry are recomputed, so they stay at k neighbours
+        for item_id in item_ids:
+            row = self._rows.get(item_id)
+            if row is not None:
+                self._set_neighbours_locked(item_id, self._top(self._scores(row)))
+
+    def upsert(self, item_id: int, text: str):
+        """Add or replace an item. Scores it against the catalog in one sparse product."""
+        with self._lock:
+            affected = self._drop_locked(item_id)
+            row = self._append_locked(item_id, *self._vectorize(text))
+            scores = self._scores(row)
+            self._set_neighbours_locked(item_id, self._top(scores))
+            for other_row in np.nonzero(scores > 0)[0]:
+                other_id = self._ids[other_row]
+                self._insert_neighbour_locked(other_id, item_id, float(scores[other_row]))
+            # The item may have re-entered those lists with a lower score than what it displaced
+            affected.discard(item_id)
+            self._backfill_locked(affected)
+
+    def remove(self, item_id: int):
+        with self._lock:
+            self._backfill_locked(self._drop_locked(item_id))
+
+    def related(self, item_id: int, limit: int) -> List[int]:
+        with self._lock:
+            return [neighbour_id for _, neighbour_id in self._neighbours.get(item_id, [])[:limit]]
+
+_indexes = {"club": RelatedIndex(), "event": RelatedIndex()}
+_loaded_at: Dict[str, float] = {}
+_load_lock = threading.Lock()
+
+def _club_text(club) -> str:
+    return f"{club.club_name or ''} {club.description or ''}"
+
+def _event_text(event) -> str:
+    return f"{event.event_name or ''} {event.event_description or ''}"
+
+def _ensure_loaded(db: Session, kind: str):
+    loaded_at = _loaded_at.get(kind)
+    if loaded_at is not None and time.monotonic() - loaded_at < RELATED_INDEX_MAX_AGE:
+        return
+    with _load_lock:
+        loaded_at = _loaded_at.get(kind)
+        if loaded_at is not None and time.monotonic() - loaded_at < RELATED_INDEX_MAX_AGE:
+            return
+        if kind == "club":
+            documents = [(club.club_id, _club_text(club))
+                         for club in db.query(Club.club_id, Club.club_name, Club.description)]
+        else:
+            documents = [(event.event_id, _event_text(event))
+                         for event in db.query(Event.event_id, Event.event_name, Event.event_description)]
+        index = RelatedIndex()
+        index.build(documents)
+        _indexes[kind] = index
+        _loaded_at[kind] = time.monotonic()
+
+# Write hooks, called by endpoints after they commit
+
+def index_club(club: Club):
+    if "club" in _loaded_at:
+        _indexes["club"].upsert(club.club_id, _club_text(club))
+
+def index_event(event: Event):
+    if "event" in _loaded_at:
+        _indexes["event"].upsert(event.event_id, _event_text(event))
+
+def remove(kind: str, item_id: int):
+    if kind in _loaded_at:
+        _indexes[kind].remove(item_id)
+
+def related(db: Session, kind: str, item_id: int, limit: int) -> List[int]:
+    _ensure_loaded(db, kind)
+    return _indexes[kind].related(item_id, limit)
@@ -0,0 +1,129 @@
+"""
+Cross-worker message relay for gunicorn workers on the same host.
+
+Each worker binds a unix datagram socket named after its pid in RELAY_DIR.
+`publish()` sends a small JSON message to every other socket in that
+directory. Each worker's event loop reads its own socket and dispatches the
+message to handlers registered for the message's channel. Sockets left
+behind by dead workers are removed the first time a send to them fails.
+
+Messages are fire-and-forget and limited to one datagram (RELAY_MAX_MESSAGE
+bytes). Receivers must treat them as hints ("something changed") and not as
+a durable log. Workers on other hosts are not reached; a multi-instance
+deployment needs a network broker in place of this module.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RELAY_DIR = os.environ.get("RELAY_DIR", os.path.join(tempfile.gettempdir(), "univibe-relay"))
+RELAY_MAX_MESSAGE = 60000
+# How long the list of peer sockets is reused before the directory is listed again
+PEER_LIST_MAX_AGE = 1.0
+
+_handlers: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+_lock = threading.Lock()
+_sock: Optional[socket.socket] = None
+_path: Optional[str] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_peers: List[str] = []
+_peers_at = 0.0
+
+def subscribe(channel: str, handler: Callable[[dict], None]):
+    """Call `handler(message)` on the event loop for messages from other workers."""
+    if handler not in _handlers[channel]:
+        _handlers[channel].append(handler)
+
+def _dispatch(message: dict):
+    for handler in _handlers.get(message.get("channel"), ()):
+        try:
+            handler(message)
+        except Exception as e:
+            logger.warning(f"Relay handler for {message.get('channel')} failed: {e}")
+
+def _on_readable():
+    while True:
+        try:
+            data = _sock.recv(RELAY_MAX_MESSAGE)
+        except OSError:
+            # Nothing left to read, or the socket was closed
+            return
+        try:
+            message = json.loads(data)
+        except ValueError:
+            continue
+        _dispatch(message)
+
+def _peer_paths() -> List[str]:
+    global _peers, _peers_at
+    now = time.monotonic()
+    if now - _peers_at > PEER_LIST_MAX_AGE:
+        try:
+            names = os.listdir(RELAY_DIR)
+        except FileNotFoundError:
+            names = []
+        _peers = [os.path.join(RELAY_DIR, name) for name in names
+                  if name.endswith(".sock") and os.path.join(RELAY_DIR, name) != _path]
+        _peers_at = now
+    return _peers
+
+def publish(channel: str, message: dict):
+    """Send a message to every other worker. Safe to call from any thread."""
+    if _sock is None:
+        return
+    data = json.dumps({**message, "channel": channel}, default=str).encode()
+    if len(data) > RELAY_MAX_MESSAGE:
+        logger.warning(f"Relay message on {channel} is too large ({len(data)} bytes), not sent")
+        return
+    with _lock:
+        for path in _peer_paths():
+            try:
+                _sock.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket of a worker that has exited
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Relay peer {path} is not keeping up, message dropped")
+            except OSError as e:
+                logger.warning(f"Relay send to {path} failed: {e}")
+
+def start():
+    """Bind this worker's socket and start reading it. Call from the running event loop."""
+    global _sock, _path, _loop
+    if _sock is not None:
+        return
+    os.makedirs(RELAY_DIR, exist_ok=True)
+    path = os.path.join(RELAY_DIR, f"{os.getpid()}.sock")
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    sock.setblocking(False)
+    _sock, _path = sock, path
+    _loop = asyncio.get_running_loop()
+    _loop.add_reader(sock.fileno(), _on_readable)
+
+def stop():
+    global _sock, _path, _loop
+    if _sock is None:
+        return
+    if _loop is not None:
+        _loop.remove_reader(_sock.fileno())
+    _sock.close()
+    try:
+        os.unlink(_path)
+    except OSError:
+        pass
+    _sock, _path, _loop = None, None, None
@@ -0,0 +1,85 @@
+"""
+Event reminders, sent as `event_reminder` notifications.
+
+Creating an event schedules one `events.remind` job (see
+api/services/jobs.py) for EVENT_REMINDER_HOUR o'clock,
+EVENT_REMINDER_DAYS_BEFORE days before the event. The job notifies everyone
+registered for the event at that time through `notify_on_commit`. The
+notifications are committed with the job itself, so each participant is
+reminded exactly once, and they reach open notification streams like any
+other notification. A job whose event was deleted, or moved to another day,
+does nothing.
+
+Events whose reminder time has already passed when they are created get no
+reminder. Run `python -m api.services.reminders backfill` to schedule
+reminders for upcoming events created before reminders existed.
+"""
+import argparse
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy.orm import Session
+
+from api.models.models import Event, EventParticipation
+from api.services import jobs, notifications
+
+EVENT_REMINDER_DAYS_BEFORE = int(os.environ.get("EVENT_REMINDER_DAYS_BEFORE", "1"))
+EVENT_REMINDER_HOUR = int(os.environ.get("EVENT_REMINDER_HOUR", "9"))
+
+def reminder_time(event_date: date) -> datetime:
+    return datetime.combine(event_date - timedelta(days=EVENT_REMINDER_DAYS_BEFORE), time(EVENT_REMINDER_HOUR))
+
+def schedule(db: Session, event: Event) -> bool:
+    """Enqueue the event's reminder without committing. Returns False if it gets none."""
+    if event.event_date is None:
+        return False
+    delay = (reminder_time(event.event_date) - datetime.now()).total_seconds()
+    if delay <= 0:
+        return False
+    # The job refers to the event by id
+    db.flush()
+    event_date = event.event_date.isoformat()
+    return jobs.enqueue(
+        db, "events.remind", {"event_id": event.event_id, "event_date": event_date},
+        job_key=f"events.remind:{event.event_id}:{event_date}", delay=delay
+    )
+
+@jobs.handler("events.remind")
+def _remind(db: Session, payload: dict):
+    event = db.query(Event.event_id, Event.event_name, Event.event_date).filter(
+        Event.event_id == payload["event_id"]
+    ).first()
+    if event is None or event.event_date is None or event.event_date.isoformat() != payload["event_date"]:
+        return
+    user_ids = [user_id for (user_id,) in db.query(EventParticipation.user_id).filter(
+        EventParticipation.event_id == event.event_id
+    ).distinct()]
+    for user_id in user_ids:
+        notifications.notify_on_commit(
+            db,
+            user_id,
+            "event_reminder",
+            f"Reminder: '{event.event_name}' is on {event.event_date.isoformat()}",
+            reference_id=event.event_id
+        )
+
+def backfill(db: Session) -> int:
+    """Schedule reminders for upcoming events that do not have one yet."""
+    scheduled = 0
+    for event in db.query(Event).filter(Event.event_date >= date.today()):
+        scheduled += schedule(db, event)
+    db.commit()
+    return scheduled
+
+if __name__ == "__main__":
+    from api.database.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Event reminders")
+    parser.add_argument("command", choices=["backfill"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Scheduled {backfill(db)} reminders")
+    finally:
+        db.close()
@@ -0,0 +1,243 @@
+"""
+Full-text search over clubs, events and users.
+
+On MySQL the FULLTEXT indexes declared on the models are queried with
+MATCH ... AGAINST, so the database keeps them current on every write. Other
+backends use an in-process inverted index ranked with BM25. It is loaded
+from the database on first use, updated by the write endpoints of this
+worker, and reloaded after SEARCH_INDEX_MAX_AGE seconds so writes handled by
+other workers show up too. Writes that arrive while a reload is reading the
+database are queued and replayed onto the new index before it is swapped in.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from api.models.models import Club, Event, User
+
+KINDS = ("club", "event", "user")
+
+SEARCH_INDEX_MAX_AGE = float(os.environ.get("SEARCH_INDEX_MAX_AGE", "300"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with".split()
+)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+def _document_fields(kind: str, obj) -> Tuple[str, str]:
+    """(title, body) text used for both indexing and result display."""
+    if kind == "club":
+        return obj.club_name or "", obj.description or ""
+    if kind == "event":
+        return obj.event_name or "", obj.event_description or ""
+    name = " ".join(part for part in (obj.first_name, obj.last_name) if part)
+    return f"{name} {obj.username or ''}".strip(), obj.bio or ""
+
+class InvertedIndex:
+    """BM25-ranked inverted index keyed by (kind, id)."""
+
+    k1 = 1.2
+    b = 0.75
+    # Title terms count this many times so name matches outrank body matches
+    title_weight = 2
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)
+        self._doc_terms: Dict[Tuple[str, int], Dict[str, int]] = {}
+        self._doc_lengths: Dict[Tuple[str, int], int] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def upsert(self, kind: str, doc_id: int, title: str, body: str):
+        terms = defaultdict(int)
+        for token in tokenize(title):
+            terms[token] += self.title_weight
+        for token in tokenize(body):
+            terms[token] += 1
+
+        key = (kind, doc_id)
+        with self._lock:
+            self._remove_locked(key)
+            if not terms:
+                return
+            for term, frequency in terms.items():
+                self._postings[term][key] = frequency
+            self._doc_terms[key] = dict(terms)
+            length = sum(terms.values())
+            self._doc_lengths[key] = length
+            self._total_length += length
+
+    def remove(self, kind: str, doc_id: int):
+        with self._lock:
+            self._remove_locked((kind, doc_id))
+
+    def _remove_locked(self, key):
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(key)
+
+    def search(self, query: str, kinds: Iterable[str]) -> List[Tuple[float, str, int]]:
+        """Return (score, kind, id) for every matching document, best first."""
+        kinds = set(kinds)
+        scores = defaultdict(float)
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    if key[0] not in kinds:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[key] / average_length)
+                    scores[key] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = [(score, kind, doc_id) for (kind, doc_id), score in scores.items()]
+        ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+        return ranked
+
+_index = InvertedIndex()
+_loaded_at: Optional[float] = None
+_load_lock = threading.Lock()
+# Writes made while a reload reads the database, replayed onto the new index before it replaces the old one
+_pending: Optional[List[Tuple[str, tuple]]] = None
+_writes_lock = threading.Lock()
+
+# Indexed columns per kind, matching the FULLTEXT indexes on the models
+_SEARCH_COLUMNS = {
+    "club": (Club.club_id, (Club.club_name, Club.description)),
+    "event": (Event.event_id, (Event.event_name, Event.event_description)),
+    "user": (User.user_id, (User.username, User.first_name, User.last_name, User.bio)),
+}
+
+def _ensure_loaded(db: Session):
+    global _index, _loaded_at, _pending
+    if _loaded_at is not None and time.monotonic() - _loaded_at < SEARCH_INDEX_MAX_AGE:
+        return
+    with _load_lock:
+        if _loaded_at is not None and time.monotonic() - _loaded_at < SEARCH_INDEX_MAX_AGE:
+            return
+        with _writes_lock:
+            _pending = []
+        try:
+            index = InvertedIndex()
+            for kind, (id_column, columns) in _SEARCH_COLUMNS.items():
+                for row in db.query(id_column, *columns):
+                    index.upsert(kind, row[0], *_document_fields(kind, row))
+            with _writes_lock:
+                # Replaying is harmless for writes the queries already saw
+                for operation, args in _pending:
+                    getattr(index, operation)(*args)
+                _index = index
+                _loaded_at = time.monotonic()
+        finally:
+            with _writes_lock:
+                _pending = None
+
+def _uses_fulltext(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+# Write hooks, called by endpoints after they commit
+
+def _write(operation: str, *args):
+    with _writes_lock:
+        if _pending is not None:
+            _pending.append((operation, args))
+        if _loaded_at is not None:
+            getattr(_index, operation)(*args)
+
+def index_club(club: Club):
+    _write("upsert", "club", club.club_id, *_document_fields("club", club))
+
+def index_event(event: Event):
+    _write("upsert", "event", event.event_id, *_document_fields("event", event))
+
+def index_user(user: User):
+    _write("upsert", "user", user.user_id, *_document_fields("user", user))
+
+def remove(kind: str, doc_id: int):
+    _write("remove", kind, doc_id)
+
+# Queries
+
+def _fulltext_ranked(db: Session, query: str, kinds: Iterable[str], limit: int) -> Tuple[int, List[Tuple[float, str, int]]]:
+    total = 0
+    ranked = []
+    for kind in kinds:
+        id_column, columns = _SEARCH_COLUMNS[kind]
+        relevance = match(*columns, against=query).in_natural_language_mode()
+        total += db.query(id_column).filter(relevance > 0).count()
+        rows = db.query(id_column, relevance.label("score")).filter(
+            relevance > 0
+        ).order_by(relevance.desc()).limit(limit).all()
+        ranked.extend((float(score), kind, doc_id) for doc_id, score in rows)
+    ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+    return total, ranked
+
+def search(db: Session, query: str, kinds: Iterable[str] = KINDS, limit: int = 20, offset: int = 0):
+    """
+    Return (total, page) where page is a list of dicts with kind, id, title,
+    snippet and score, ordered by relevance.
+    """
+    kinds = [kind for kind in KINDS if kind in set(kinds)]
+    if not tokenize(query) or not kinds:
+        return 0, []
+
+    if _uses_fulltext(db):
+        total, ranked = _fulltext_ranked(db, query, kinds, offset + limit)
+    else:
+        _ensure_loaded(db)
+        ranked = _index.search(query, kinds)
+        total = len(ranked)
+    page = ranked[offset:offset + limit]
+
+    # Load display fields for the page only, one query per kind
+    wanted = defaultdict(list)
+    for _, kind, doc_id in page:
+        wanted[kind].append(doc_id)
+    objects = {}
+    for kind, ids in wanted.items():
+        id_column, columns = _SEARCH_COLUMNS[kind]
+        for row in db.query(id_column, *columns).filter(id_column.in_(ids)):
+            objects[(kind, row[0])] = row
+
+    results = []
+    for score, kind, doc_id in page:
+        obj = objects.get((kind, doc_id))
+        if obj is None:
+            continue
+        title, body = _document_fields(kind, obj)
+        results.append({
+            "kind": kind,
+            "id": doc_id,
+            "title": title,
+            "snippet": body[:160] if body else None,
+            "score": round(score, 4),
+        })
+    return total, results
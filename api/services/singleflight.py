@@ -0,0 +1,42 @@
+"""
+Single-flight execution of identical concurrent reads.
+
+When many clients ask for the same thing at once, such as a popular event
+right after it is posted, `do(key, fn, *args)` runs `fn` once in the
+threadpool and hands its result, or its exception, to every request that
+asked for the same key while it ran. Requests after it finishes start a new
+flight; nothing is cached.
+
+`fn` opens its own session and returns plain data, since the result is
+shared by requests that each have their own session. Callers should close
+their request's session before waiting: a burst of waiters each holding a
+pooled connection can leave none for the flight itself. The key must include
+everything that changes the result for the caller: the endpoint, its
+parameters and the caller's visibility. Flights are per worker, so a burst
+spread over N workers costs at most N executions.
+
+The flight runs as its own task, so a client that disconnects cancels only
+its own wait, not the query the other requests are waiting for.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+_flights: Dict[Hashable, "asyncio.Future"] = {}
+
+def _land(key: Hashable, flight: "asyncio.Future"):
+    if _flights.get(key) is flight:
+        del _flights[key]
+    # Mark the exception as retrieved even if every waiter went away
+    if not flight.cancelled():
+        flight.exception()
+
+async def do(key: Hashable, fn: Callable[..., Any], *args) -> Any:
+    """Return `fn(*args)`, sharing one execution with concurrent calls for the same key."""
+    flight = _flights.get(key)
+    if flight is None:
+        flight = asyncio.ensure_future(run_in_threadpool(fn, *args))
+        _flights[key] = flight
+        flight.add_done_callback(lambda done: _land(key, done))
+    return await asyncio.shield(flight)
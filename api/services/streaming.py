@@ -0,0 +1,83 @@
+"""
+Streamed list responses with flat memory use.
+
+`stream_query()` runs a query in its own session with `yield_per`, which
+also asks the driver for a server-side cursor. Rows are serialized in
+batches of STREAM_BATCH_SIZE and sent as they are produced, either as one
+JSON array or as NDJSON (one object per line). Only one batch is held at a
+time, whatever the size of the table.
+
+The generator is synchronous, so Starlette runs it in its threadpool, and
+the request's own session is not used because it may be closed before
+the body is sent. The status code is sent before the first row, so an error
+halfway through can only cut the body short. It is logged, and clients see
+invalid JSON or a missing final line.
+"""
+import json
+import logging
+import os
+from typing import Callable, Iterator
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session
+
+from api.database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "500"))
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+def serializer(model: type) -> Callable[[object], str]:
+    """Serialize ORM rows through a response model, so the same fields are exposed as without streaming."""
+    def serialize(row) -> str:
+        return model.model_validate(row).model_dump_json()
+    return serialize
+
+def _default(value):
+    return str(value)
+
+def dict_serializer(to_dict: Callable[[object], dict]) -> Callable[[object], str]:
+    def serialize(row) -> str:
+        return json.dumps(to_dict(row), default=_default)
+    return serialize
+
+def iter_query(build: Callable[[Session], Query], serialize: Callable[[object], str], fmt: str,
+               prefix: str = "", suffix: str = "", batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yield the serialized rows of `build(db)` in chunks. `prefix` and `suffix`
+    wrap a JSON array, e.g. '{"events": ' and '}'.
+    """
+    db = SessionLocal()
+    try:
+        separator = "\n" if fmt == "ndjson" else ","
+        if fmt == "json":
+            yield (prefix + "[").encode()
+        first = True
+        chunk = []
+        for row in build(db).yield_per(batch_size):
+            chunk.append(serialize(row))
+            if len(chunk) >= batch_size:
+                yield _join(chunk, separator, fmt, first)
+                first = False
+                # Only strings are kept, so the session's weakly referenced rows can be freed
+                chunk = []
+        if chunk:
+            yield _join(chunk, separator, fmt, first)
+        if fmt == "json":
+            yield ("]" + suffix).encode()
+    except Exception as e:
+        logger.error(f"Streaming response failed, body is truncated: {e}")
+        raise
+    finally:
+        db.close()
+
+def _join(chunk, separator: str, fmt: str, first: bool) -> bytes:
+    body = separator.join(chunk)
+    if fmt == "ndjson":
+        return (body + "\n").encode()
+    return (body if first else "," + body).encode()
+
+def stream_query(build: Callable[[Session], Query], serialize: Callable[[object], str], fmt: str,
+                 prefix: str = "", suffix: str = "") -> StreamingResponse:
+    return StreamingResponse(iter_query(build, serialize, fmt, prefix, suffix), media_type=MEDIA_TYPES[fmt])
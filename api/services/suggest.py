@@ -0,0 +1,143 @@
+"""
+In-memory prefix index for as-you-type lookups of users and clubs.
+
+Every user is indexed under their username, first name, last name and full
+name, and every club under its name and each word of it. The terms are kept
+in one sorted list, so a lookup is a binary search followed by a short scan.
+Like the search index, it is loaded on first use, updated by this worker's
+write endpoints, and reloaded after SUGGEST_INDEX_MAX_AGE seconds.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from api.models.models import Club, User
+
+KINDS = ("user", "club")
+
+SUGGEST_INDEX_MAX_AGE = float(os.environ.get("SUGGEST_INDEX_MAX_AGE", "300"))
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+def _clean_terms(terms: Iterable[Optional[str]]) -> List[str]:
+    return sorted({_normalize(term) for term in terms} - {""})
+
+def _user_entry(user) -> Tuple[str, List[str]]:
+    full_name = " ".join(part for part in (user.first_name, user.last_name) if part)
+    label = f"{full_name} (@{user.username})" if full_name else f"@{user.username}"
+    terms = [user.username, user.first_name, user.last_name, full_name]
+    return label, terms
+
+def _club_entry(club) -> Tuple[str, List[str]]:
+    name = club.club_name or ""
+    return name, [name] + name.split()
+
+class PrefixIndex:
+    """Sorted (term, kind, id) tuples with bisect-based prefix scans."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, str, int]] = []
+        self._entries: Dict[Tuple[str, int], Tuple[str, List[str]]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, items: Iterable[Tuple[str, int, str, Iterable[str]]]):
+        """Bulk load (kind, id, label, terms) with one sort instead of one insort per term."""
+        keys = []
+        entries = {}
+        for kind, item_id, label, terms in items:
+            terms = _clean_terms(terms)
+            entries[(kind, item_id)] = (label, terms)
+            keys.extend((term, kind, item_id) for term in terms)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+
+    def upsert(self, kind: str, item_id: int, label: str, terms: Iterable[str]):
+        terms = _clean_terms(terms)
+        with self._lock:
+            self._remove_locked(kind, item_id)
+            for term in terms:
+                bisect.insort(self._keys, (term, kind, item_id))
+            self._entries[(kind, item_id)] = (label, terms)
+
+    def remove(self, kind: str, item_id: int):
+        with self._lock:
+            self._remove_locked(kind, item_id)
+
+    def _remove_locked(self, kind: str, item_id: int):
+        entry = self._entries.pop((kind, item_id), None)
+        if entry is None:
+            return
+        for term in entry[1]:
+            key = (term, kind, item_id)
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def lookup(self, prefix: str, kinds: Iterable[str], limit: int) -> List[dict]:
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        kinds = set(kinds)
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                term, kind, item_id = self._keys[position]
+                if not term.startswith(prefix):
+                    break
+                position += 1
+                if kind not in kinds or (kind, item_id) in seen:
+                    continue
+                seen.add((kind, item_id))
+                results.append({"kind": kind, "id": item_id, "label": self._entries[(kind, item_id)][0]})
+        return results
+
+_index = PrefixIndex()
+_loaded_at: Optional[float] = None
+_load_lock = threading.Lock()
+
+def _ensure_loaded(db: Session):
+    global _index, _loaded_at
+    if _loaded_at is not None and time.monotonic() - _loaded_at < SUGGEST_INDEX_MAX_AGE:
+        return
+    with _load_lock:
+        if _loaded_at is not None and time.monotonic() - _loaded_at < SUGGEST_INDEX_MAX_AGE:
+            return
+        users = db.query(User.user_id, User.username, User.first_name, User.last_name)
+        clubs = db.query(Club.club_id, Club.club_name)
+        index = PrefixIndex()
+        index.load(
+            [("user", user.user_id, *_user_entry(user)) for user in users]
+            + [("club", club.club_id, *_club_entry(club)) for club in clubs]
+        )
+        _index = index
+        _loaded_at = time.monotonic()
+
+# Write hooks, called by endpoints after they commit
+
+def index_user(user: User):
+    if _loaded_at is not None:
+        _index.upsert("user", user.user_id, *_user_entry(user))
+
+def index_club(club: Club):
+    if _loaded_at is not None:
+        _index.upsert("club", club.club_id, *_club_entry(club))
+
+def remove(kind: str, item_id: int):
+    if _loaded_at is not None:
+        _index.remove(kind, item_id)
+
+def suggest(db: Session, prefix: str, kinds: Iterable[str] = KINDS, limit: int = 10) -> List[dict]:
+    _ensure_loaded(db)
+    return _index.lookup(prefix, kinds, limit)
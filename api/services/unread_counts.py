@@ -0,0 +1,129 @@
+"""
+Per-user unread notification counters stored in `notification_unread_counts`.
+
+Notification inserts, mark read, mark all read and delete adjust the counter
+in the same transaction as the change, so the badge endpoint reads a single
+row. Users without a row yet (their notifications predate the table) get
+one computed from `notifications` the first time it is needed.
+
+Run `python -m api.services.unread_counts verify` to report drift and
+`python -m api.services.unread_counts rebuild` to repair it.
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.models.models import Notification, NotificationUnreadCount
+
+def _count_unread(db: Session, user_id: int) -> int:
+    return db.query(func.count()).select_from(Notification).filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False
+    ).scalar()
+
+def _insert_computed(db: Session, user_ids) -> None:
+    table = NotificationUnreadCount.__table__
+    for user_id in user_ids:
+        try:
+            with db.begin_nested():
+                db.execute(insert(table), {"user_id": user_id, "unread_count": _count_unread(db, user_id)})
+        except IntegrityError:
+            # Created concurrently, and that count already includes our flushed rows
+            pass
+
+def adjust_many(db: Session, deltas: Dict[int, int]):
+    """
+    Add deltas to users' counters without committing.
+    Users without a row get it computed from scratch instead, after flushing
+    the caller's pending change.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    existing = {
+        user_id for (user_id,) in db.query(NotificationUnreadCount.user_id).filter(
+            NotificationUnreadCount.user_id.in_(list(deltas))
+        )
+    }
+    table = NotificationUnreadCount.__table__
+    updates = [
+        {"b_user_id": user_id, "b_delta": delta}
+        for user_id, delta in deltas.items() if user_id in existing
+    ]
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.user_id == bindparam("b_user_id"))
+            .values(unread_count=table.c.unread_count + bindparam("b_delta")),
+            updates
+        )
+
+    missing = [user_id for user_id in deltas if user_id not in existing]
+    if missing:
+        db.flush()
+        _insert_computed(db, missing)
+
+def adjust(db: Session, user_id: int, delta: int):
+    adjust_many(db, {user_id: delta})
+
+def get(db: Session, user_id: int) -> int:
+    row = db.query(NotificationUnreadCount.unread_count).filter(
+        NotificationUnreadCount.user_id == user_id
+    ).first()
+    if row is not None:
+        return row.unread_count
+
+    _insert_computed(db, [user_id])
+    db.commit()
+    return db.query(NotificationUnreadCount.unread_count).filter(
+        NotificationUnreadCount.user_id == user_id
+    ).scalar()
+
+def compute(db: Session) -> Dict[int, int]:
+    """Expected unread count for every user that has a counter row or unread notifications."""
+    expected = {user_id: 0 for (user_id,) in db.query(NotificationUnreadCount.user_id)}
+    for user_id, count in db.query(Notification.user_id, func.count()).filter(
+        Notification.is_read == False
+    ).group_by(Notification.user_id):
+        expected[user_id] = count
+    return expected
+
+def verify(db: Session) -> List[Tuple[int, Optional[int], int]]:
+    """Return (user_id, stored, expected) for every user whose counter drifted."""
+    stored = {row.user_id: row.unread_count for row in db.query(NotificationUnreadCount)}
+    return [
+        (user_id, stored.get(user_id), count)
+        for user_id, count in compute(db).items()
+        if stored.get(user_id) != count
+    ]
+
+def rebuild(db: Session) -> int:
+    """Repair drifted rows and return how many were fixed."""
+    drifted = verify(db)
+    for user_id, stored, count in drifted:
+        db.merge(NotificationUnreadCount(user_id=user_id, unread_count=count))
+    db.commit()
+    return len(drifted)
+
+if __name__ == "__main__":
+    from api.database.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild unread notification counters")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "verify":
+            drifted = verify(db)
+            for user_id, stored, expected in drifted:
+                print(f"user {user_id}: stored {stored}, expected {expected}")
+            print(f"{len(drifted)} users drifted")
+        else:
+            print(f"Repaired {rebuild(db)} users")
+    finally:
+        db.close()
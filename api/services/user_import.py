@@ -0,0 +1,204 @@
+"""
+Bulk user import from CSV or NDJSON, for onboarding a new intake.
+
+Rows are read in batches of IMPORT_BATCH_SIZE. Each row is validated with the
+signup schema, and `role` defaults to student. CSV `interests` can be a JSON
+list or values separated by semicolons. Per batch:
+
+- one query finds the usernames and emails that already exist, and
+  duplicates within the file are caught as rows are read;
+- passwords are hashed across a process pool (IMPORT_HASH_WORKERS, all cores
+  by default), since bcrypt dominates the cost of an import;
+- the users are written with one multi-row insert and queued for the search
+  indexes, then the batch commits.
+
+A row that fails is reported with its line number and does not stop the
+import. If a batch insert loses a race with a concurrent signup, that batch
+is inserted row by row so only the conflicting rows fail. Imported users
+have no auth token until they log in.
+
+    python -m api.services.user_import intake.csv
+"""
+import argparse
+import codecs
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.auth.utils import get_password_hash
+from api.database.connection import SessionLocal
+from api.models.models import User
+from api.schemas.schemas import UserCreate
+from api.services import indexing
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", str(os.cpu_count() or 1)))
+FORMATS = ("csv", "ndjson")
+
+def _clean_csv_row(row: dict) -> dict:
+    # Empty cells mean "not given", as a missing key would in NDJSON
+    row = {key: value for key, value in row.items() if key and value not in (None, "")}
+    interests = row.get("interests")
+    if interests is not None:
+        if interests.lstrip().startswith("["):
+            row["interests"] = json.loads(interests)
+        else:
+            row["interests"] = [item.strip() for item in interests.split(";") if item.strip()]
+    return row
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line number, row, None), or (line number, None, error) for unreadable lines."""
+    text = codecs.getreader("utf-8-sig")(stream)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            try:
+                yield reader.line_num, _clean_csv_row(row), None
+            except ValueError as e:
+                yield reader.line_num, None, f"Invalid interests: {e}"
+        return
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_num, None, "Expected a JSON object"
+            continue
+        yield line_num, row, None
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+
+class _Import:
+    def __init__(self, db: Session, pool: ProcessPoolExecutor):
+        self.db = db
+        self.pool = pool
+        self.created = 0
+        self.total = 0
+        self.errors: List[dict] = []
+        self.seen_usernames = set()
+        self.seen_emails = set()
+
+    def error(self, line: int, row: Optional[dict], message: str):
+        self.errors.append({"line": line, "username": (row or {}).get("username"), "error": message})
+
+    def add_batch(self, batch: List[Tuple[int, UserCreate]]):
+        usernames = [user.username for _, user in batch]
+        emails = [user.email for _, user in batch]
+        taken_usernames, taken_emails = set(), set()
+        # Check if any username or email already exists, for the whole batch at once
+        for username, email in self.db.query(User.username, User.email).filter(
+            or_(User.username.in_(usernames), User.email.in_(emails))
+        ):
+            taken_usernames.add(username)
+            taken_emails.add(email)
+
+        accepted = []
+        for line, user in batch:
+            if user.username in taken_usernames or user.email in taken_emails:
+                self.error(line, {"username": user.username}, "Username or email already exists")
+            else:
+                accepted.append((line, user))
+        if not accepted:
+            return
+
+        passwords = [user.password for _, user in accepted]
+        chunksize = max(1, len(passwords) // (IMPORT_HASH_WORKERS * 4))
+        hashes = list(self.pool.map(get_password_hash, passwords, chunksize=chunksize))
+        rows = [
+            {**user.model_dump(exclude={'password'}), "password_hash": password_hash, "auth_token": None}
+            for (_, user), password_hash in zip(accepted, hashes)
+        ]
+
+        try:
+            with self.db.begin_nested():
+                self.db.execute(insert(User.__table__), rows)
+            inserted = rows
+        except IntegrityError:
+            # A concurrent signup took one of the names; find out which rows still fit
+            inserted = []
+            for (line, user), row in zip(accepted, rows):
+                try:
+                    with self.db.begin_nested():
+                        self.db.execute(insert(User.__table__), row)
+                    inserted.append(row)
+                except IntegrityError:
+                    self.error(line, row, "Username or email already exists")
+
+        if inserted:
+            documents = [
+                {"user_id": user_id, "username": username, "first_name": first_name,
+                 "last_name": last_name, "bio": bio}
+                for user_id, username, first_name, last_name, bio in self.db.query(
+                    User.user_id, User.username, User.first_name, User.last_name, User.bio
+                ).filter(User.username.in_([row["username"] for row in inserted]))
+            ]
+            indexing.index_many_on_commit(self.db, "user", documents)
+        self.db.commit()
+        self.created += len(inserted)
+
+    def run(self, rows: Iterator[Tuple[int, Optional[dict], Optional[str]]], batch_size: int):
+        batch = []
+        for line, row, error in rows:
+            self.total += 1
+            if error is not None:
+                self.error(line, row, error)
+                continue
+            row.setdefault("role", "student")
+            try:
+                user = UserCreate.model_validate(row)
+            except ValidationError as e:
+                self.error(line, row, _validation_message(e))
+                continue
+            # Check if the username or email appeared earlier in the file
+            if user.username in self.seen_usernames or user.email in self.seen_emails:
+                self.error(line, row, "Duplicate username or email in file")
+                continue
+            self.seen_usernames.add(user.username)
+            self.seen_emails.add(user.email)
+            batch.append((line, user))
+            if len(batch) >= batch_size:
+                self.add_batch(batch)
+                batch = []
+        if batch:
+            self.add_batch(batch)
+
+def import_users(db: Session, stream: IO[bytes], fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import users from a CSV or NDJSON byte stream. Commits after each batch."""
+    # forkserver children start clean instead of inheriting this process's threads and locks.
+    # Like spawn, it imports the main module, so scripts calling this need a __main__ guard.
+    context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS, mp_context=context) as pool:
+        job = _Import(db, pool)
+        job.run(read_rows(stream, fmt), batch_size)
+    errors = sorted(job.errors, key=lambda item: item["line"])
+    return {"total": job.total, "created": job.created, "failed": len(errors), "errors": errors}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import users from a CSV or NDJSON file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            result = import_users(db, stream, fmt)
+    finally:
+        db.close()
+    for item in result["errors"]:
+        print(f"line {item['line']}: {item['username'] or '-'}: {item['error']}")
+    print(f"Created {result['created']} of {result['total']} users, {result['failed']} failed")
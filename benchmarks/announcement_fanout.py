@@ -0,0 +1,106 @@
+"""
+Compare club announcements (fan-out on read) with one notification row per
+member (fan-out on write).
+
+    DATABASE_URL=sqlite:////tmp/fanout.db python benchmarks/announcement_fanout.py --members 10000
+
+Point DATABASE_URL at a scratch database: the script creates the schema
+and fills it with a synthetic club. For each approach it reports the rows
+written and the time to post one message. It then reports the latency of
+the notification list and the unread count for a sample of members.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import insert
+
+from api.database.connection import SessionLocal, engine
+from api.models.models import Base, Club, ClubMember, Notification, User
+from api.services import announcements, notifications
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (f"p50 {statistics.median(samples) * 1000:.2f}ms "
+            f"p99 {samples[max(int(len(samples) * 0.99) - 1, 0)] * 1000:.2f}ms")
+
+def setup(db, members: int):
+    run = int(time.time())
+    db.execute(insert(User.__table__), [
+        {"username": f"fanout{run}_{i}", "email": f"fanout{run}_{i}@example.com",
+         "password_hash": "x", "role": "student"}
+        for i in range(members + 1)
+    ])
+    user_ids = [user_id for (user_id,) in db.query(User.user_id).filter(
+        User.username.like(f"fanout{run}_%")
+    ).order_by(User.user_id)]
+    club = Club(club_name=f"Fan-out {run}", description="benchmark", leader_id=user_ids[0])
+    db.add(club)
+    db.flush()
+    joined_at = datetime.now() - timedelta(days=1)
+    db.execute(insert(ClubMember.__table__), [
+        {"club_id": club.club_id, "user_id": user_id, "joined_at": joined_at} for user_id in user_ids[1:]
+    ])
+    db.commit()
+    return club.club_id, user_ids
+
+def main(args):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        club_id, user_ids = setup(db, args.members)
+        leader_id, member_ids = user_ids[0], user_ids[1:]
+        sample = member_ids[::max(len(member_ids) // args.sample, 1)][:args.sample]
+
+        print(f"club with {len(member_ids)} members, {args.messages} messages each way")
+
+        # Fan-out on write: one notification per member per message
+        write_times = []
+        for i in range(args.messages):
+            rows = [notifications.build(user_id, "general", f"write fan-out {i}") for user_id in member_ids]
+            started = time.perf_counter()
+            notifications.insert_rows(db, rows)
+            db.commit()
+            write_times.append(time.perf_counter() - started)
+        print(f"fan-out on write: {len(member_ids) * args.messages} rows, {percentiles(write_times)} per message")
+
+        # Fan-out on read: one announcement per message
+        post_times = []
+        for i in range(args.messages):
+            _, elapsed = timed(announcements.post, db, club_id, leader_id, f"announcement {i}")
+            post_times.append(elapsed)
+        print(f"fan-out on read:  {args.messages} rows, {percentiles(post_times)} per message")
+
+        # Read side, per member
+        list_notifications, list_announcements, count_announcements = [], [], []
+        for user_id in sample:
+            _, elapsed = timed(lambda: db.query(Notification).filter(
+                Notification.user_id == user_id
+            ).order_by(Notification.notification_date.desc()).limit(50).all())
+            list_notifications.append(elapsed)
+            _, elapsed = timed(announcements.list_for_user, db, user_id, 50)
+            list_announcements.append(elapsed)
+            _, elapsed = timed(announcements.unread_count, db, user_id)
+            count_announcements.append(elapsed)
+        print(f"list, notification rows:  {percentiles(list_notifications)}")
+        print(f"list, announcements:      {percentiles(list_announcements)}")
+        print(f"unread count, announcements: {percentiles(count_announcements)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Announcement fan-out benchmark")
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=200, help="members to time reads for")
+    main(parser.parse_args())
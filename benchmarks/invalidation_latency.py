@@ -0,0 +1,127 @@
+"""
+Measure how fast a cache tag bump reaches other worker processes, and what
+the generation check costs on every tagged read.
+
+    python benchmarks/invalidation_latency.py --readers 4 --bumps 2000
+
+Uses a scratch generation table, so it can run next to a live API. Reader
+processes poll the generation of one tag, as a tagged cache read would,
+and record when they first see each new value. The writer bumps the tag and
+records when it did. Propagation latency is the difference, on the shared
+monotonic clock. With --poll 0 the readers spin, which shows the latency of
+the table itself; a positive --poll models workers that only look between
+requests. The script also times a generation read, a bump, and a tagged
+cache hit against the memory backend.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api.cache.base import Cache
+from api.cache.generations import SharedMemoryGenerations
+from api.cache.memory import MemoryBackend
+
+TAG = "club:1"
+
+def percentiles(samples, unit=1e6, label="us"):
+    samples = sorted(samples)
+    return (f"p50 {statistics.median(samples) * unit:.1f}{label} "
+            f"p99 {samples[max(int(len(samples) * 0.99) - 1, 0)] * unit:.1f}{label} "
+            f"max {samples[-1] * unit:.1f}{label}")
+
+def reader(path, bumps, poll, ready, results):
+    table = SharedMemoryGenerations(path)
+    seen = {}
+    last = table.current([TAG])[TAG]
+    ready.release()
+    while len(seen) < bumps:
+        generation = table.current([TAG])[TAG]
+        if generation != last:
+            now = time.monotonic()
+            # A slow poll can skip generations; they were all seen by now
+            for missed in range(last + 1, generation + 1):
+                seen[missed] = now
+            last = generation
+        elif poll:
+            time.sleep(poll)
+    results.put(seen)
+
+def measure_propagation(path, args):
+    table = SharedMemoryGenerations(path)
+    context = multiprocessing.get_context("fork")
+    ready = context.Semaphore(0)
+    results = context.Queue()
+    start = table.current([TAG])[TAG]
+    processes = [
+        context.Process(target=reader, args=(path, args.bumps, args.poll, ready, results))
+        for _ in range(args.readers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+
+    bumped_at = {}
+    for generation in range(start + 1, start + args.bumps + 1):
+        bumped_at[generation] = time.monotonic()
+        table.bump([TAG])
+        time.sleep(args.interval)
+
+    latencies = []
+    for _ in processes:
+        seen = results.get()
+        latencies.extend(
+            max(seen[generation] - at, 0) for generation, at in bumped_at.items() if generation in seen
+        )
+    for process in processes:
+        process.join()
+    print(f"propagation to {args.readers} readers, {args.bumps} bumps from generation {start}: "
+          f"{percentiles(latencies)}")
+
+def measure_costs(path, samples=100000):
+    table = SharedMemoryGenerations(path)
+    started = time.perf_counter()
+    for _ in range(samples):
+        table.current([TAG])
+    read = (time.perf_counter() - started) / samples
+    started = time.perf_counter()
+    for _ in range(samples // 10):
+        table.bump(["benchmark:other"])
+    bump = (time.perf_counter() - started) / (samples // 10)
+    print(f"generation read {read * 1e9:.0f}ns, bump {bump * 1e6:.2f}us")
+
+def measure_tagged_hit(samples=100000):
+    cache = Cache(MemoryBackend(), "benchmark")
+    value = {"club_id": 1, "club_name": "Chess", "member_count": 120}
+    cache.set("plain", value)
+    cache.set("tagged", value, tags=cache.snapshot([TAG, "clubs"]))
+    for key in ("plain", "tagged"):
+        started = time.perf_counter()
+        for _ in range(samples):
+            cache.get(key)
+        print(f"{key} memory cache hit {(time.perf_counter() - started) / samples * 1e6:.2f}us")
+
+def main(args):
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "generations")
+        # Tagged cache reads go through the process-wide table; point it at the scratch file
+        from api.cache import generations
+        generations._generations = SharedMemoryGenerations(path)
+
+        measure_costs(path)
+        measure_tagged_hit()
+        measure_propagation(path, args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache invalidation propagation benchmark")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--bumps", type=int, default=2000)
+    parser.add_argument("--interval", type=float, default=0.001, help="seconds between bumps")
+    parser.add_argument("--poll", type=float, default=0.0, help="seconds readers sleep between checks")
+    main(parser.parse_args())
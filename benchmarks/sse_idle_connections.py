@@ -0,0 +1,120 @@
+"""
+Hold many idle connections open on the notification stream and measure what
+they cost the server.
+
+Run the API first, for example
+    gunicorn -w 4 -k uvicorn.workers.UvicornWorker api.main:app
+then
+    python benchmarks/sse_idle_connections.py --token <auth_token> \
+        --connections 10000 --hold 60 --pid <worker pid> [--pid ...]
+
+Every connection uses plain asyncio sockets, so the client can hold many
+thousands of them. Raise `ulimit -n` on both sides first. The script reports
+the connect rate, the server RSS per connection (read from /proc for the
+given pids), how many streams were still alive after the hold period, and
+the delivery latency of any notifications that arrived while holding.
+Create some notifications for the user during the hold (approve a join
+request, grade an event) to measure delivery.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+def rss_kb(pids):
+    total = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+    return total
+
+class Stream:
+    def __init__(self):
+        self.alive = False
+        self.keepalives = 0
+        self.latencies = []
+
+async def open_stream(host, port, token, stream):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"GET /users/me/notifications/stream?token={token} HTTP/1.1\r\n"
+        f"Host: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status = await reader.readline()
+    if b" 200 " not in status:
+        raise RuntimeError(status.decode().strip())
+    await reader.readuntil(b"\r\n\r\n")
+    stream.alive = True
+    return reader, writer
+
+async def read_stream(reader, stream):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b": keepalive"):
+                stream.keepalives += 1
+            elif line.startswith(b"data: "):
+                payload = json.loads(line[6:])
+                created = datetime.fromisoformat(payload["created_at"])
+                stream.latencies.append((datetime.now() - created).total_seconds())
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    stream.alive = False
+
+async def main(args):
+    baseline = rss_kb(args.pid) if args.pid else None
+    streams = [Stream() for _ in range(args.connections)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def connect(stream):
+        async with semaphore:
+            return await open_stream(args.host, args.port, args.token, stream)
+
+    started = time.perf_counter()
+    opened = await asyncio.gather(*(connect(stream) for stream in streams), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = [result for result in opened if isinstance(result, Exception)]
+    print(f"opened {len(streams) - len(failures)}/{len(streams)} streams in {elapsed:.1f}s "
+          f"({(len(streams) - len(failures)) / elapsed:.0f}/s)")
+    if failures:
+        print(f"first failure: {failures[0]!r}")
+
+    connected = [(result, stream) for result, stream in zip(opened, streams) if not isinstance(result, Exception)]
+    readers = [asyncio.create_task(read_stream(reader, stream)) for (reader, _), stream in connected]
+    if baseline is not None and connected:
+        await asyncio.sleep(1)
+        grown = rss_kb(args.pid) - baseline
+        print(f"server RSS grew by {grown / 1024:.1f} MiB, {grown * 1024 / len(connected):.0f} bytes per connection")
+
+    await asyncio.sleep(args.hold)
+    alive = sum(stream.alive for _, stream in connected)
+    keepalives = sum(stream.keepalives for _, stream in connected)
+    print(f"{alive}/{len(connected)} streams alive after {args.hold}s idle, {keepalives} keepalives received")
+
+    latencies = sorted(latency for _, stream in connected for latency in stream.latencies)
+    if latencies:
+        print(f"{len(latencies)} notifications delivered, latency p50 {statistics.median(latencies) * 1000:.0f}ms "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f}ms")
+
+    for task in readers:
+        task.cancel()
+    for (_, writer), _ in connected:
+        writer.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Idle notification stream benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=200, help="connections opened at a time")
+    parser.add_argument("--hold", type=float, default=60)
+    parser.add_argument("--pid", type=int, action="append", default=[], help="server worker pid to sample RSS from")
+    asyncio.run(main(parser.parse_args()))